@@ -0,0 +1,131 @@
+"""
+Benchmark of the booking latency during a spike of availability reads.
+
+Many threads send anonymous GET /api/rooms_available/ requests for
+different times, like kiosks refreshing, and wait for the Retry-After
+delay when they are shed, while a few threads book reservations. It
+prints the latency of the bookings and the served and shed availability
+reads, without limits and with the ADMISSION_LIMITS given on the command
+line. Run it with:
+
+    python -m benchmarks.bench_admission --readers 48 --writers 4
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from .common import seed, temporary_app
+
+
+def read(app, stop, day, index):
+    """
+    Send availability requests until stop is set, waiting Retry-After when shed.
+
+    Returns:
+        tuple: The number of served and shed requests.
+    """
+    served = shed = 0
+    path = f"/api/rooms_available/?date={day}&time={8 + index % 10:02}:00"
+    with app.test_client() as client:
+        while not stop.is_set():
+            response = client.get(path)
+            served += response.status_code == 200
+            if response.status_code == 503:
+                shed += 1
+                stop.wait(float(response.headers["Retry-After"]))
+    return served, shed
+
+
+def book(app, index, requests):
+    """
+    Book one slot per day for the user and the room of a thread.
+
+    Returns:
+        list: The latencies of the created reservations.
+    """
+    latencies = []
+    with app.test_client() as client:
+        for day in range(requests):
+            start = time.perf_counter()
+            response = client.post(
+                f"/api/users/{index + 1}/reservations/",
+                json={
+                    "date": (date.today() + timedelta(days=day + 1)).isoformat(),
+                    "start-time": "10:00",
+                    "end-time": "11:00",
+                    "roomId": index + 1,
+                },
+                headers={"Api-key": f"token{index}"},
+            )
+            if response.status_code == 201:
+                latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run(name, args, **config):
+    """
+    Run the spike once and print the latencies and the reads.
+    """
+    with temporary_app(**config) as app:
+        seed(app, users=args.writers, rooms=max(args.writers, args.rooms))
+        day = (date.today() + timedelta(days=30)).isoformat()
+        stop = threading.Event()
+        with ThreadPoolExecutor(args.readers + args.writers) as executor:
+            readers = [
+                executor.submit(read, app, stop, day, index)
+                for index in range(args.readers)
+            ]
+            start = time.perf_counter()
+            writers = [
+                executor.submit(book, app, index, args.requests)
+                for index in range(args.writers)
+            ]
+            latencies = sorted(
+                latency for writer in writers for latency in writer.result()
+            )
+            elapsed = time.perf_counter() - start
+            stop.set()
+            served = sum(reader.result()[0] for reader in readers)
+            shed = sum(reader.result()[1] for reader in readers)
+
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<18} bookings: {len(latencies)} median "
+        f"{statistics.median(latencies) * 1000:7.1f} ms p95 {p95 * 1000:7.1f} ms | "
+        f"reads: {served / elapsed:7.1f}/s served, {shed / elapsed:7.1f}/s shed"
+    )
+
+
+def main():
+    """
+    Parse the arguments and run the spike without and with admission control.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=48)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=25)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--read-concurrency", type=int, default=4)
+    parser.add_argument("--read-queue", type=int, default=8)
+    args = parser.parse_args()
+
+    run("no limits", args)
+    run(
+        "admission control",
+        args,
+        ADMISSION_LIMITS={
+            "availability": {
+                "concurrency": args.read_concurrency,
+                "queue": args.read_queue,
+            },
+            "writes": {"concurrency": args.writers, "queue": 64},
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Benchmark of the concurrency limit of the WSGI and ASGI serving modes.
+
+Slow clients open connections and send their request headers a byte at a
+time, like kiosks on a poor network, while a fast client measures the
+latency of GET /api/rooms_available/. The WSGI server has a fixed pool of
+threads, like a production worker, each one held by a slow client until
+its request is complete; the ASGI server (uvicorn with src.asgi) only
+keeps a coroutine per slow client. Then concurrent requests taking
+--delay seconds each are sent to both servers, which reports how many of
+them ran in the application at once. Run it with:
+
+    python -m benchmarks.bench_asgi --slow-clients 100 1000 2000 --concurrent 10
+"""
+
+import argparse
+import asyncio
+import http.client
+import logging
+import resource
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import uvicorn
+from werkzeug.serving import BaseWSGIServer
+
+from src.asgi import create_asgi_app
+
+from .common import seed, temporary_app
+
+PATH = (
+    "/api/rooms_available/?date="
+    + (date.today() + timedelta(days=30)).isoformat()
+    + "&time=10:00"
+)
+
+
+class InFlight:
+    """
+    WSGI middleware delaying the requests and counting those in flight.
+
+    Attributes:
+        app (callable): The WSGI application.
+        delay (float): The delay of every request in seconds.
+        current (int): The number of requests in flight.
+        peak (int): The highest number of requests in flight.
+    """
+
+    def __init__(self, app, delay):
+        self.app = app
+        self.delay = delay
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        try:
+            time.sleep(self.delay)
+            return self.app(environ, start_response)
+        finally:
+            with self._lock:
+                self.current -= 1
+
+
+class ThreadPoolWSGIServer(BaseWSGIServer):
+    """
+    WSGI server handling the connections with a fixed pool of threads.
+    """
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:  # pylint: disable=broad-except
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def free_port():
+    """
+    Get a free TCP port on localhost.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_wsgi(app, port, threads):
+    """
+    Start the WSGI server in a thread and return a function stopping it.
+    """
+    server = ThreadPoolWSGIServer("127.0.0.1", port, app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+        server.pool.shutdown(wait=False, cancel_futures=True)
+
+    return stop
+
+
+def start_asgi(app, port):
+    """
+    Start uvicorn in a thread and return a function stopping it.
+    """
+    config = uvicorn.Config(
+        create_asgi_app(app),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        backlog=4096,
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+
+    return stop
+
+
+async def slow_clients(port, count, stop):
+    """
+    Keep count connections sending their request headers slowly until stop is set.
+    """
+
+    async def slow_client():
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            return
+        writer.write(f"GET {PATH} HTTP/1.1\r\nHost: localhost\r\n".encode())
+        try:
+            while not stop.is_set():
+                await asyncio.sleep(1)
+                writer.write(b"X")
+                await writer.drain()
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(slow_client() for _ in range(count)))
+
+
+def measure(port, requests, timeout):
+    """
+    Send sequential requests and return the latencies of the successful ones.
+    """
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            connection.request("GET", PATH)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status == 200:
+                latencies.append(time.perf_counter() - start)
+        except OSError:
+            pass
+    return latencies
+
+
+def start(mode, app, port, args):
+    """
+    Start a server of the given mode and return a function stopping it.
+    """
+    if mode == "WSGI":
+        return start_wsgi(app, port, args.threads)
+    return start_asgi(app, port)
+
+
+def run(mode, app, count, args):
+    """
+    Run the fast client against a server of the given mode holding count slow clients.
+    """
+    port = free_port()
+    stop_server = start(mode, app, port, args)
+
+    stop = threading.Event()
+    loop = asyncio.new_event_loop()
+    holder = threading.Thread(
+        target=loop.run_until_complete,
+        args=(slow_clients(port, count, stop),),
+        daemon=True,
+    )
+    holder.start()
+    time.sleep(2)
+    threads = threading.active_count()
+    latencies = measure(port, args.requests, args.timeout)
+    stop.set()
+    holder.join()
+    loop.close()
+    stop_server()
+
+    median = f"{statistics.median(latencies) * 1000:.1f} ms" if latencies else "-"
+    print(
+        f"{mode:<5} {count:>6} slow clients: {len(latencies):>4}/{args.requests} "
+        f"requests served, median {median}, {threads} threads"
+    )
+
+
+def run_concurrent(mode, app, args):
+    """
+    Send concurrent slow requests to a server of the given mode and count those in flight.
+    """
+    in_flight = InFlight(app.wsgi_app, args.delay)
+    app.wsgi_app = in_flight
+    port = free_port()
+    stop_server = start(mode, app, port, args)
+    try:
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrent) as pool:
+            served = sum(
+                len(latencies)
+                for latencies in pool.map(
+                    lambda _: measure(port, 1, args.timeout + args.delay * args.concurrent),
+                    range(args.concurrent),
+                )
+            )
+        elapsed = time.perf_counter() - start_time
+    finally:
+        stop_server()
+        app.wsgi_app = in_flight.app
+
+    print(
+        f"{mode:<5} {args.concurrent:>6} requests of {args.delay * 1000:.0f} ms: "
+        f"{served} served in {elapsed:.2f} s, at most {in_flight.peak} in flight"
+    )
+
+
+def main():
+    """
+    Parse the arguments and run both modes for every number of slow clients.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--slow-clients", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    parser.add_argument("--concurrent", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    # Every slow client needs a socket on both ends
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    with temporary_app() as app:
+        seed(app, rooms=10)
+        for count in args.slow_clients:
+            for mode in ("WSGI", "ASGI"):
+                run(mode, app, count, args)
+        for mode in ("WSGI", "ASGI"):
+            run_concurrent(mode, app, args)
+
+
+if __name__ == "__main__":
+    main()
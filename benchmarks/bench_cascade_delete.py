@@ -0,0 +1,103 @@
+"""
+Benchmark of the deletion of a user with many reservations.
+
+It compares the ORM cascade, which loads every reservation into the
+session and deletes them one statement at a time, with the single DELETE
+statement of UserId.delete, where the database cascades through the
+ON DELETE CASCADE foreign keys. Run it with:
+
+    python -m benchmarks.bench_cascade_delete --reservations 100000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from src import db
+from src.models import Reservation, User, to_minutes
+
+from .common import report, seed, temporary_app
+
+
+def insert_reservations(count):
+    """
+    Insert reservations of one hour, one after the other, for the first user and room.
+
+    Args:
+        count (int): The number of reservations.
+
+    Returns:
+        None
+    """
+    start = datetime(2030, 1, 1)
+    rows = []
+    for index in range(count):
+        start_time = start + timedelta(hours=index)
+        end_time = start_time + timedelta(minutes=59)
+        rows.append(
+            {
+                "room_id": 1,
+                "user_id": 1,
+                "start_time": start_time,
+                "end_time": end_time,
+                "start_minute": to_minutes(start_time),
+                "end_minute": to_minutes(end_time),
+            }
+        )
+    db.session.execute(Reservation.__table__.insert(), rows)
+    db.session.commit()
+
+
+def delete_with_orm_cascade():
+    """
+    Delete the user the way the ORM cascade does it, loading every reservation.
+
+    Returns:
+        None
+    """
+    user = db.session.get(User, 1)
+    # Loaded collections are cascaded by the ORM one row at a time,
+    # as all of them were before passive deletes
+    len(user.reservations)
+    len(user.api_keys)
+    len(user.waitlist_entries)
+    db.session.delete(user)
+    db.session.commit()
+
+
+def delete_with_database_cascade():
+    """
+    Delete the user with a single statement, as UserId.delete does.
+
+    Returns:
+        None
+    """
+    User.query.filter_by(id=1).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def main():
+    """
+    Parse the arguments and time both deletions on the same data.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reservations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for name, delete in (
+        ("ORM cascade", delete_with_orm_cascade),
+        ("database cascade", delete_with_database_cascade),
+    ):
+        with temporary_app() as app:
+            seed(app)
+            with app.app_context():
+                insert_reservations(args.reservations)
+                start = time.perf_counter()
+                delete()
+                elapsed = time.perf_counter() - start
+                assert Reservation.query.count() == 0
+        report(f"{name} ({args.reservations} reservations)", 1, elapsed)
+
+
+if __name__ == "__main__":
+    main()
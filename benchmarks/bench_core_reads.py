@@ -0,0 +1,133 @@
+"""
+Benchmark of the GET endpoints on the ORM and on the Core read layer.
+
+For each endpoint, it times the data access done by the resource: the
+API key lookup, the query and the serialization. The ORM runs are the
+former code of the resources, the Core runs use reads.py. The CPU time
+is measured, and every run starts with a fresh session, like a request.
+Run it with:
+
+    python -m benchmarks.bench_core_reads --requests 2000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from src import db, reads
+from src.models import ApiKey, Reservation, User
+
+from .common import report, seed, temporary_app
+
+KEY_HASH = ApiKey.key_hash("token0")
+
+
+def orm_user():
+    """
+    Read a user the way UserId.get did.
+    """
+    api_key_user = ApiKey.query.filter_by(key=KEY_HASH).first().user
+    user = User.query.filter_by(id=api_key_user.id).first()
+    return user.serialize()
+
+
+def core_user():
+    """
+    Read a user the way UserId.get does.
+    """
+    api_key_user = reads.api_key_user(KEY_HASH)
+    return reads.get_user(api_key_user.id)
+
+
+def orm_reservation():
+    """
+    Read a reservation the way ReservationId.get did.
+    """
+    assert ApiKey.query.filter_by(key=KEY_HASH).first().user is not None
+    reservation = Reservation.query.filter_by(id=1).first()
+    assert reservation.is_active(datetime.now())
+    return reservation.serialize()
+
+
+def core_reservation():
+    """
+    Read a reservation the way ReservationId.get does.
+    """
+    assert reads.api_key_user(KEY_HASH) is not None
+    return reads.get_reservation(1, datetime.now())[1]
+
+
+def orm_reservations():
+    """
+    List the reservations of a user the way ReservationCollection.get did.
+    """
+    api_key_user = ApiKey.query.filter_by(key=KEY_HASH).first().user
+    now = datetime.now()
+    return [r.serialize() for r in api_key_user.reservations if r.is_active(now)]
+
+
+def core_reservations():
+    """
+    List the reservations of a user the way ReservationCollection.get does.
+    """
+    api_key_user = reads.api_key_user(KEY_HASH)
+    return reads.list_reservations(api_key_user.id, datetime.now())
+
+
+def insert_reservations(count):
+    """
+    Insert reservations of one hour for the first user and room.
+
+    Args:
+        count (int): The number of reservations.
+
+    Returns:
+        None
+    """
+    start = datetime.now().replace(minute=0, second=0, microsecond=0)
+    for index in range(count):
+        start_time = start + timedelta(days=1, hours=index)
+        db.session.add(
+            Reservation(
+                room_id=1,
+                user_id=1,
+                start_time=start_time,
+                end_time=start_time + timedelta(minutes=59),
+            )
+        )
+    db.session.commit()
+
+
+def main():
+    """
+    Parse the arguments and time both read paths of every endpoint.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--reservations", type=int, default=20)
+    args = parser.parse_args()
+
+    with temporary_app() as app:
+        seed(app)
+        with app.app_context():
+            insert_reservations(args.reservations)
+            for endpoint, orm, core in (
+                ("user", orm_user, core_user),
+                ("reservation", orm_reservation, core_reservation),
+                ("reservations", orm_reservations, core_reservations),
+            ):
+                orm_result = orm()
+                db.session.remove()
+                assert core() == orm_result
+                db.session.remove()
+                for name, read in (("ORM", orm), ("Core", core)):
+                    start = time.process_time()
+                    for _ in range(args.requests):
+                        read()
+                        db.session.remove()
+                    elapsed = time.process_time() - start
+                    report(f"{name} {endpoint} (CPU)", args.requests, elapsed)
+
+
+if __name__ == "__main__":
+    main()
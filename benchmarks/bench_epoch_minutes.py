@@ -0,0 +1,144 @@
+"""
+Benchmark of the overlap check on the datetime and the epoch minute columns.
+
+The datetimes are stored by SQLite as text, so the former overlap check
+compared strings in a three-way OR, which the unique index on (room_id,
+start_time, end_time) can only partly use. The current check compares
+the integer start_minute and end_minute columns with the (room_id,
+end_minute, start_minute) index. Both checks run on the same reservation
+table. Run it with:
+
+    python -m benchmarks.bench_epoch_minutes --reservations 1000000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from src import db
+from src.models import Reservation, to_minutes
+
+from .common import report, seed, temporary_app
+
+START = datetime(2030, 1, 1)
+
+
+def insert_reservations(count, rooms):
+    """
+    Insert reservations of one hour, one after the other in every room.
+
+    Args:
+        count (int): The number of reservations.
+        rooms (int): The number of rooms.
+
+    Returns:
+        None
+    """
+    for first in range(0, count, 50_000):
+        rows = []
+        for index in range(first, min(first + 50_000, count)):
+            start_time = START + timedelta(hours=index // rooms)
+            end_time = start_time + timedelta(minutes=59)
+            rows.append(
+                {
+                    "room_id": index % rooms + 1,
+                    "user_id": 1,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "start_minute": to_minutes(start_time),
+                    "end_minute": to_minutes(end_time),
+                }
+            )
+        db.session.execute(Reservation.__table__.insert(), rows)
+    db.session.commit()
+
+
+def datetime_overlap(room_id, start_time, end_time):
+    """
+    Check for an overlapping reservation with the former datetime comparisons.
+
+    Returns:
+        bool: True if the slot is taken.
+    """
+    return (
+        Reservation.query.filter(
+            (Reservation.room_id == room_id)
+            & (
+                (
+                    (Reservation.start_time >= start_time)
+                    & (Reservation.start_time <= end_time)
+                )
+                | (
+                    (Reservation.end_time >= start_time)
+                    & (Reservation.end_time <= end_time)
+                )
+                | (
+                    (Reservation.start_time <= start_time)
+                    & (Reservation.end_time >= end_time)
+                )
+            )
+        ).first()
+        is not None
+    )
+
+
+def minute_overlap(room_id, start_time, end_time):
+    """
+    Check for an overlapping reservation with the epoch minute comparisons.
+
+    Returns:
+        bool: True if the slot is taken.
+    """
+    return (
+        Reservation.query.filter(
+            Reservation.room_id == room_id,
+            Reservation.end_minute >= to_minutes(start_time),
+            Reservation.start_minute <= to_minutes(end_time),
+        ).first()
+        is not None
+    )
+
+
+def main():
+    """
+    Parse the arguments and time both overlap checks on the same slots.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reservations", type=int, default=1_000_000)
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--checks", type=int, default=2_000)
+    args = parser.parse_args()
+
+    hours = args.reservations // args.rooms
+    generator = random.Random(0)
+    slots = []
+    for _ in range(args.checks):
+        start_time = START + timedelta(minutes=generator.randrange(hours * 60))
+        slots.append(
+            (
+                generator.randrange(args.rooms) + 1,
+                start_time,
+                start_time + timedelta(minutes=30),
+            )
+        )
+
+    with temporary_app() as app:
+        seed(app, rooms=args.rooms)
+        with app.app_context():
+            insert_reservations(args.reservations, args.rooms)
+            results = {}
+            for name, check in (
+                ("datetime overlap check", datetime_overlap),
+                ("epoch minute overlap check", minute_overlap),
+            ):
+                start = time.perf_counter()
+                results[name] = [check(*slot) for slot in slots]
+                elapsed = time.perf_counter() - start
+                report(f"{name} ({args.reservations} rows)", args.checks, elapsed)
+            first, second = results.values()
+            assert first == second
+
+
+if __name__ == "__main__":
+    main()
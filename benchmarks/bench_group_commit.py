@@ -0,0 +1,91 @@
+"""
+Benchmark of the reservation writes with and without the write pipeline.
+
+Every thread books, for its own user and room, one slot per day, so no
+request conflicts and all of them commit a write. Run it with:
+
+    python -m benchmarks.bench_group_commit --threads 32 --requests 50
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from .common import report, seed, temporary_app
+
+
+def book(app, index, requests):
+    """
+    Book one slot per day for the user and the room of a thread.
+
+    Args:
+        app (Flask): The application.
+        index (int): The index of the thread.
+        requests (int): The number of reservations to create.
+
+    Returns:
+        int: The number of created reservations.
+    """
+    created = 0
+    with app.test_client() as client:
+        for day in range(requests):
+            response = client.post(
+                f"/api/users/{index + 1}/reservations/",
+                json={
+                    "date": (date.today() + timedelta(days=day + 1)).isoformat(),
+                    "start-time": "10:00",
+                    "end-time": "11:00",
+                    "roomId": index + 1,
+                },
+                headers={"Api-key": f"token{index}"},
+            )
+            created += response.status_code == 201
+    return created
+
+
+def run(threads, requests, **config):
+    """
+    Run the benchmark once and print its throughput.
+
+    Args:
+        threads (int): The number of concurrent clients.
+        requests (int): The number of reservations created by each client.
+        **config: Configuration values of the application.
+
+    Returns:
+        None
+    """
+    with temporary_app(**config) as app:
+        seed(app, users=threads, rooms=threads)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            created = sum(
+                executor.map(lambda index: book(app, index, requests), range(threads))
+            )
+        elapsed = time.perf_counter() - start
+    name = "pipeline" if config.get("WRITE_PIPELINE_ENABLED") else "commit per request"
+    report(f"{name} ({threads} threads)", created, elapsed)
+
+
+def main():
+    """
+    Parse the arguments and run the benchmark with and without the pipeline.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--window-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    run(args.threads, args.requests, WRITE_PIPELINE_ENABLED=False)
+    run(
+        args.threads,
+        args.requests,
+        WRITE_PIPELINE_ENABLED=True,
+        WRITE_PIPELINE_WINDOW_MS=args.window_ms,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark of the memory and start time of the gunicorn workers.
+
+It starts gunicorn with gunicorn.conf.py twice on the same database:
+with the application preloaded, warmed up and frozen in the master (the
+default), and with GUNICORN_PRELOAD=0, where every worker loads it. For
+each run it prints the time until all the workers answered, and the
+private (unshared) memory of each worker after serving some requests,
+read from /proc/<pid>/smaps_rollup. Run it with:
+
+    python -m benchmarks.bench_prefork --workers 4
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import date, timedelta
+
+from .common import seed, temporary_app
+
+PATH = (
+    "/api/rooms_available/?date="
+    + (date.today() + timedelta(days=30)).isoformat()
+    + "&time=10:00"
+)
+
+
+def free_port():
+    """
+    Get a free TCP port on localhost.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def private_memory(pid):
+    """
+    Get the private memory of a process in KiB.
+    """
+    total = 0
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as smaps:
+        for line in smaps:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total
+
+
+def children(pid):
+    """
+    Get the child processes of a process.
+    """
+    with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as tasks:
+        return [int(child) for child in tasks.read().split()]
+
+
+def run(name, database_uri, args, preload):
+    """
+    Start gunicorn, wait for its workers, load them and print their memory.
+    """
+    port = free_port()
+    env = dict(
+        os.environ,
+        FLASK_SQLALCHEMY_DATABASE_URI=database_uri,
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_PRELOAD="1" if preload else "0",
+    )
+    start = time.perf_counter()
+    master = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "src.wsgi:application"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}{PATH}"
+        answered = set()
+        while len(answered) < args.workers and time.perf_counter() - start < 60:
+            try:
+                with urllib.request.urlopen(url, timeout=5) as response:
+                    response.read()
+                answered = set(children(master.pid))
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.05)
+        ready = time.perf_counter() - start
+
+        for _ in range(args.requests):
+            with urllib.request.urlopen(url, timeout=5) as response:
+                response.read()
+        workers = children(master.pid)
+        memory = [private_memory(pid) for pid in workers]
+        print(
+            f"{name:<12} ready in {ready:6.2f} s, private memory per worker "
+            f"{sum(memory) / len(memory) / 1024:6.1f} MiB "
+            f"(master {private_memory(master.pid) / 1024:.1f} MiB)"
+        )
+    finally:
+        master.terminate()
+        master.wait()
+
+
+def main():
+    """
+    Parse the arguments and run gunicorn with and without preloading.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with temporary_app() as app:
+        seed(app, rooms=10)
+        database_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+        run("preloaded", database_uri, args, preload=True)
+        run("per worker", database_uri, args, preload=False)
+
+
+if __name__ == "__main__":
+    main()
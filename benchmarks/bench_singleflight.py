@@ -0,0 +1,75 @@
+"""
+Benchmark of the coalescing of identical availability requests.
+
+A kiosk fleet refresh is simulated by waves of identical concurrent
+GET /api/rooms_available/ requests, sent by a pool of threads, with and
+without singleflight. It prints the throughput and the number of scans
+run for each mode. Run it with:
+
+    python -m benchmarks.bench_singleflight --threads 32 --waves 20
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from src import singleflight
+
+from .common import report, seed, temporary_app
+
+PATH = (
+    "/api/rooms_available/?date="
+    + (date.today() + timedelta(days=30)).isoformat()
+    + "&time=10:00"
+)
+
+
+def run(enabled, args):
+    """
+    Send the waves of requests and report the throughput and the scans.
+    """
+    with temporary_app(SINGLEFLIGHT_ENABLED=enabled) as app:
+        seed(app, rooms=args.rooms)
+        client = app.test_client()
+        client.get(PATH)
+        barrier = threading.Barrier(args.threads)
+
+        def kiosk(_):
+            for _ in range(args.waves):
+                barrier.wait()
+                assert client.get(PATH).status_code == 200
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(kiosk, range(args.threads)))
+        elapsed = time.perf_counter() - start
+
+        requests = args.threads * args.waves
+        name = "singleflight" if enabled else "no coalescing"
+        report(name, requests, elapsed)
+        if enabled:
+            counters = singleflight.stats(app)["rooms_available"]
+            # The warm-up request is counted as well
+            print(f"{'':<40} {counters['computed'] - 1:>8} scans, {counters['coalesced']} coalesced")
+        else:
+            print(f"{'':<40} {requests:>8} scans")
+
+
+def main():
+    """
+    Parse the arguments and run both modes.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--waves", type=int, default=20)
+    parser.add_argument("--rooms", type=int, default=200)
+    args = parser.parse_args()
+
+    run(False, args)
+    run(True, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+This module contains the helpers shared by the benchmarks.
+
+The benchmarks run against a temporary SQLite database, created and
+seeded by the helpers, so they never touch the instance database.
+
+Functions:
+- temporary_app(**config): Context manager yielding an application on a temporary database.
+- seed(app, users, rooms): Creates users with known API keys and rooms.
+- report(name, operations, elapsed): Prints the throughput of a benchmark run.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+from src import db
+from src.app_factory import create_api_app
+from src.models import ApiKey, Room, User
+
+
+@contextmanager
+def temporary_app(**config):
+    """
+    Context manager yielding an application on a temporary database.
+
+    Args:
+        **config: Configuration values overriding the defaults.
+
+    Yields:
+        Flask: The application, with its tables created.
+    """
+    db_fd, db_fname = tempfile.mkstemp(suffix=".db")
+    app = create_api_app(
+        {"SQLALCHEMY_DATABASE_URI": "sqlite:///" + db_fname, "TESTING": True, **config}
+    )
+    with app.app_context():
+        db.create_all()
+    try:
+        yield app
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        os.close(db_fd)
+        os.unlink(db_fname)
+
+
+def seed(app, users=1, rooms=1):
+    """
+    Create users with known API keys and rooms.
+
+    The API key of the user with id i + 1 is f"token{i}", and every room
+    accepts reservations of up to 3 hours.
+
+    Args:
+        app (Flask): The application to seed.
+        users (int): The number of users to create.
+        rooms (int): The number of rooms to create.
+
+    Returns:
+        None
+    """
+    with app.app_context():
+        for index in range(users):
+            user = User(username=f"user{index}", email=f"user{index}@example.com")
+            db.session.add(ApiKey(key=ApiKey.key_hash(f"token{index}"), user=user))
+        for index in range(rooms):
+            db.session.add(Room(room_name=f"Room {index}", capacity=10, max_time=180))
+        db.session.commit()
+
+
+def report(name, operations, elapsed):
+    """
+    Print the throughput of a benchmark run.
+
+    Args:
+        name (str): The name of the run.
+        operations (int): The number of operations done.
+        elapsed (float): The duration of the run in seconds.
+
+    Returns:
+        None
+    """
+    print(
+        f"{name:<40} {operations:>8} ops {elapsed:>8.3f} s "
+        f"{operations / elapsed:>10.1f} ops/s"
+    )
@@ -0,0 +1,494 @@
+"""
+Load test of the API over HTTP, with a realistic mix of traffic.
+
+The requests are sent with the client package (src/client/api), like the
+users of the command line client. The operations are drawn from a mix of
+availability polls, bookings, edits, cancellations and reservation
+listings, and the rooms of the bookings from a Zipf distribution: the
+room of rank k is booked in proportion to 1 / k ** ZIPF, so a few rooms
+get most of the bookings and their conflicts, like in registration week.
+
+The arrivals are open-loop: they follow a Poisson process at the offered
+rate, whatever the response times, and the latency of a request is counted
+from its planned arrival. A saturated server therefore shows growing
+latencies and a throughput below the offered rate, instead of slowing
+down the generator. Every --interval seconds it prints the offered rate,
+the throughput, the latency percentiles and the rates of errors (status
+codes 5xx and failed connections) and 409 conflicts. Several rates can be
+given to step the load up and find the saturation point.
+
+It runs against a server already serving the API:
+
+    python -m benchmarks.loadtest --url http://localhost:8000/api --rate 50 100 200
+
+or, with --serve, against a threaded development server on a temporary
+database, seeded by the tool:
+
+    python -m benchmarks.loadtest --serve --rate 25 50 100 --duration 20
+"""
+
+import argparse
+import bisect
+import collections
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from requests.adapters import HTTPAdapter
+from werkzeug.serving import make_server
+
+from src.client.api import availabilityClient, reservationClient, userClient
+from src.client.api.availabilityClient import AvailabilityClient
+from src.client.api.reservationClient import ReservationClient
+from src.client.api.userClient import UserClient
+
+from .common import seed, temporary_app
+
+OPERATIONS = ("availability", "book", "edit", "cancel", "list")
+DEFAULT_MIX = "availability=50,book=20,edit=10,cancel=5,list=15"
+# The opening hours of the rooms, every booking lasts one hour
+HOURS = range(8, 18)
+
+_local = threading.local()
+
+
+def parse_mix(text):
+    """
+    Parse an operation mix like "availability=50,book=20".
+
+    Args:
+        text (str): The weights of the operations, separated by commas.
+
+    Returns:
+        dict: The weight of every operation, 0 for the missing ones.
+    """
+    mix = dict.fromkeys(OPERATIONS, 0.0)
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in mix:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class Zipf:
+    """
+    Draws ranks from a Zipf distribution.
+
+    Attributes:
+        items (list): The items, the first one being the most popular.
+
+    Methods:
+        draw(rng): Draws an item.
+    """
+
+    def __init__(self, items, exponent):
+        self.items = list(items)
+        weights = [1 / rank**exponent for rank in range(1, len(self.items) + 1)]
+        self._cumulative = list(itertools.accumulate(weights))
+
+    def draw(self, rng):
+        """
+        Draw an item, the item of rank k with a probability proportional to 1 / k ** exponent.
+
+        Args:
+            rng (Random): The random generator.
+
+        Returns:
+            The item.
+        """
+        point = rng.random() * self._cumulative[-1]
+        return self.items[bisect.bisect_left(self._cumulative, point)]
+
+
+def _record_response(response, *_args, **_kwargs):
+    """
+    Response hook of the client session, keeping the last response of the thread.
+    """
+    _local.response = response
+
+
+def configure_client(url, connections):
+    """
+    Point the client package at a server, with one shared connection pool.
+
+    Args:
+        url (str): The base URL of the API, like http://localhost:5000/api.
+        connections (int): The size of the connection pool.
+
+    Returns:
+        None
+    """
+    session = availabilityClient.session
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.hooks["response"].append(_record_response)
+    for module in (availabilityClient, reservationClient, userClient):
+        module.API_URL = url.rstrip("/")
+        module.session = session
+
+
+def call(func, *args):
+    """
+    Call a method of the client and get the response it received.
+
+    Returns:
+        Response: The last HTTP response of the call.
+    """
+    _local.response = None
+    func(*args)
+    return _local.response
+
+
+class Traffic:
+    """
+    The users, rooms and reservations of the load test, and its operations.
+
+    Attributes:
+        users (list): The (user_id, api_key) pairs.
+        rooms (Zipf): The room ids by popularity.
+        days (int): The number of days ahead for the bookings and polls.
+
+    Methods:
+        run(operation, rng): Sends the requests of an operation.
+    """
+
+    def __init__(self, users, rooms, days):
+        self.users = users
+        self.rooms = rooms
+        self.days = days
+        # Reservations created by the test, as (user, reservation_id)
+        self._reservations = []
+        self._lock = threading.Lock()
+
+    def _slot(self, rng):
+        day = date.today() + timedelta(days=rng.randint(1, self.days))
+        hour = rng.choice(HOURS)
+        return day.isoformat(), f"{hour:02}:00", f"{hour + 1:02}:00"
+
+    def _take(self, rng, remove):
+        with self._lock:
+            if not self._reservations:
+                return None
+            index = rng.randrange(len(self._reservations))
+            if remove:
+                # Swap with the last one, to remove in constant time
+                self._reservations[index], self._reservations[-1] = (
+                    self._reservations[-1],
+                    self._reservations[index],
+                )
+                return self._reservations.pop()
+            return self._reservations[index]
+
+    def run(self, operation, rng):
+        """
+        Send the requests of an operation.
+
+        Edits and cancellations pick a reservation created by the test, and
+        are sent as bookings while there is none.
+
+        Args:
+            operation (str): One of OPERATIONS.
+            rng (Random): The random generator.
+
+        Returns:
+            tuple: The operation really sent, and the Response.
+        """
+        if operation in ("edit", "cancel"):
+            taken = self._take(rng, remove=operation == "cancel")
+            if taken is None:
+                operation = "book"
+        if operation == "availability":
+            day, start, _end = self._slot(rng)
+            return operation, call(AvailabilityClient.get_available_rooms, day, start)
+        if operation == "list":
+            user_id, api_key = rng.choice(self.users)
+            return operation, call(ReservationClient.get_reservations, user_id, api_key)
+        if operation == "book":
+            user = rng.choice(self.users)
+            day, start, end = self._slot(rng)
+            response = call(
+                ReservationClient.create_reservation,
+                user[0],
+                self.rooms.draw(rng),
+                day,
+                start,
+                end,
+                user[1],
+            )
+            if response is not None and response.status_code == 201:
+                with self._lock:
+                    self._reservations.append((user, response.headers["reservation_id"]))
+            return operation, response
+        (user_id, api_key), reservation_id = taken
+        if operation == "cancel":
+            return operation, call(
+                ReservationClient.delete_reservation, user_id, reservation_id, api_key
+            )
+        day, start, end = self._slot(rng)
+        return operation, call(
+            ReservationClient.put_reservation,
+            user_id,
+            reservation_id,
+            api_key,
+            day,
+            start,
+            end,
+        )
+
+
+class Recorder:
+    """
+    Aggregates the results of the requests by interval and by operation.
+
+    Methods:
+        add(operation, status, latency): Records a finished request.
+        flush(offered, elapsed): Gets and resets the results of the interval.
+        summary(): Gets the results of every operation over the whole run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._interval = []
+        self._operations = collections.defaultdict(list)
+
+    def add(self, operation, status, latency):
+        """
+        Record a finished request.
+
+        Args:
+            operation (str): The operation.
+            status (int): The status code, None for a failed connection.
+            latency (float): The seconds from the planned arrival to the response.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._interval.append((status, latency))
+            self._operations[operation].append((status, latency))
+
+    def flush(self, elapsed):
+        """
+        Get and reset the results of the interval.
+
+        Args:
+            elapsed (float): The duration of the interval in seconds.
+
+        Returns:
+            dict: The statistics of the interval, see statistics().
+        """
+        with self._lock:
+            results, self._interval = self._interval, []
+        return statistics(results, elapsed)
+
+    def summary(self, elapsed):
+        """
+        Get the results of every operation over the whole run.
+
+        Args:
+            elapsed (float): The duration of the run in seconds.
+
+        Returns:
+            dict: The statistics of every operation.
+        """
+        with self._lock:
+            return {
+                operation: statistics(results, elapsed)
+                for operation, results in sorted(self._operations.items())
+            }
+
+
+def statistics(results, elapsed):
+    """
+    Compute the throughput, latency percentiles and error rates of requests.
+
+    Args:
+        results (list): The (status, latency) pairs of the requests.
+        elapsed (float): The duration in seconds.
+
+    Returns:
+        dict: The count, the throughput per second, the p50, p95 and p99
+        latencies in milliseconds and the error and conflict rates.
+    """
+    latencies = sorted(latency for _status, latency in results)
+    count = len(results)
+
+    def percentile(rank):
+        if not latencies:
+            return 0.0
+        return latencies[min(count - 1, int(count * rank))] * 1000
+
+    errors = sum(1 for status, _latency in results if status is None or status >= 500)
+    conflicts = sum(1 for status, _latency in results if status == 409)
+    return {
+        "count": count,
+        "throughput": count / elapsed if elapsed else 0.0,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "errors": errors / count if count else 0.0,
+        "conflicts": conflicts / count if count else 0.0,
+    }
+
+
+def format_statistics(name, stats):
+    """
+    Format statistics as one line of the report.
+    """
+    return (
+        f"{name:<16} {stats['throughput']:8.1f}/s  p50 {stats['p50']:8.1f} ms  "
+        f"p95 {stats['p95']:8.1f} ms  p99 {stats['p99']:8.1f} ms  "
+        f"errors {stats['errors']:6.1%}  409 {stats['conflicts']:6.1%}"
+    )
+
+
+def run_step(traffic, recorder, mix, rate, args, seed_value):
+    """
+    Send open-loop arrivals at a rate for the duration of a step.
+
+    Args:
+        traffic (Traffic): The operations.
+        recorder (Recorder): Records the results.
+        mix (dict): The weights of the operations.
+        rate (float): The offered requests per second.
+        args (Namespace): The options of the command.
+        seed_value (int): The seed of the random generators of the step.
+
+    Returns:
+        None
+    """
+    arrivals = random.Random(seed_value)
+    operations = list(mix)
+    weights = list(mix.values())
+    sequence = itertools.count(seed_value * 1_000_000)
+
+    def send(operation, planned):
+        rng = random.Random(next(sequence))
+        try:
+            operation, response = traffic.run(operation, rng)
+            status = response.status_code if response is not None else None
+        except Exception:  # pylint: disable=broad-except
+            status = None
+        recorder.add(operation, status, time.perf_counter() - planned)
+
+    with ThreadPoolExecutor(args.max_in_flight) as executor:
+        start = time.perf_counter()
+        planned = start
+        report_at = start + args.interval
+        end = start + args.duration
+        while True:
+            planned += arrivals.expovariate(rate)
+            while report_at <= min(planned, end):
+                stats = recorder.flush(args.interval)
+                print(format_statistics(f"  {rate:g}/s t={report_at - start:4.0f}s", stats))
+                report_at += args.interval
+            if planned >= end:
+                break
+            delay = planned - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            operation = arrivals.choices(operations, weights)[0]
+            executor.submit(send, operation, planned)
+
+
+def discover_rooms(days):
+    """
+    Get the ids of the rooms of the server, from an availability poll.
+
+    Returns:
+        list: The room ids.
+    """
+    day = (date.today() + timedelta(days=days + 7)).isoformat()
+    response = call(AvailabilityClient.get_available_rooms, day, "08:00")
+    return [room["id"] for room in response.json()["available_rooms"]]
+
+
+def create_users(count):
+    """
+    Create users over HTTP.
+
+    Returns:
+        list: The (user_id, api_key) pairs.
+    """
+    prefix = f"load{int(time.time())}"
+    users = []
+    for index in range(count):
+        created = UserClient.create_user(f"{prefix}_{index}", f"{prefix}_{index}@example.com")
+        if not isinstance(created, dict):
+            raise SystemExit(f"Cannot create the users: {created}")
+        users.append((created["user_id"], created["api_key"]))
+    return users
+
+
+def load_test(args, mix):
+    """
+    Run the steps of the load test against the configured server.
+    """
+    users = create_users(args.users)
+    room_ids = discover_rooms(args.days)
+    if not room_ids:
+        raise SystemExit("The server has no rooms.")
+    # The popularity of the rooms does not follow their ids
+    random.Random(args.seed).shuffle(room_ids)
+    traffic = Traffic(users, Zipf(room_ids, args.zipf), args.days)
+    print(
+        f"{len(users)} users, {len(room_ids)} rooms, Zipf exponent {args.zipf}, "
+        f"mix {json.dumps(mix)}"
+    )
+
+    for step, rate in enumerate(args.rate):
+        recorder = Recorder()
+        print(f"Offered rate {rate:g}/s for {args.duration:g}s")
+        run_step(traffic, recorder, mix, rate, args, args.seed + step)
+        for operation, stats in recorder.summary(args.duration).items():
+            print(format_statistics(f"  {operation}", stats))
+
+
+def main():
+    """
+    Parse the arguments, start the server if asked and run the load test.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default=availabilityClient.API_URL)
+    parser.add_argument("--serve", action="store_true", help="serve a temporary database")
+    parser.add_argument("--rate", type=float, nargs="+", default=[20.0])
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rooms", type=int, default=40, help="rooms created with --serve")
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    mix = args.mix if isinstance(args.mix, dict) else parse_mix(args.mix)
+
+    if not args.serve:
+        configure_client(args.url, args.max_in_flight)
+        load_test(args, mix)
+        return
+
+    with temporary_app(N_PLUS_ONE_MODE="off") as app:
+        seed(app, rooms=args.rooms)
+        # One access log line per request would hide the report
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        configure_client(f"http://127.0.0.1:{server.server_port}/api", args.max_in_flight)
+        try:
+            load_test(args, mix)
+        finally:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Performance regression gate of the hot paths, against a committed baseline.
+
+It times a fixed set of cases on a temporary SQLite database:
+- overlap_check: check_overlapping_reservations on a room with many reservations.
+- availability: GET /api/rooms_available/ with many rooms.
+- list_reservations: GET /api/users/<user_id>/reservations/.
+- auth: the API key check of require_user.
+- bulk_insert: one transaction inserting a batch of reservations.
+
+Every case runs --rounds rounds, 15 by default, and the time of a round is divided by its
+operations. The times are measured in units of a calibration loop of
+Python code run before every round, so the baseline of another machine,
+or of a busy moment of the same machine, stays usable. The median of the
+rounds is compared with the median stored in benchmarks/baseline.json. A
+case regresses when it is slower than the baseline by more than the
+threshold and by more than three standard errors of the difference of the
+medians, estimated from the median absolute deviations of both runs, and
+again when it is run a second time. The command exits with status 1 on a
+regression. Run it with:
+
+    python -m benchmarks.perf_gate
+
+and record a new baseline, after an intended change, with:
+
+    python -m benchmarks.perf_gate --update
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from src import db
+from src.decorators import require_user
+from src.models import Reservation, Room
+from src.resources.reservation import check_overlapping_reservations
+
+from .common import seed, temporary_app
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DAY = date(2030, 1, 7)
+HEADERS = {"Api-key": "token0"}
+
+
+def calibrate():
+    """
+    Time a fixed loop of Python code, the unit of the speed of the machine.
+
+    Returns:
+        float: The seconds of the loop.
+    """
+    start = time.perf_counter()
+    counts = {}
+    for index in range(50_000):
+        counts[index % 97] = counts.get(index % 97, 0) + 1
+    return time.perf_counter() - start
+
+
+def insert_reservations(room_id, count):
+    """
+    Insert reservations of one hour in a room, one per hour from DAY.
+
+    Returns:
+        None
+    """
+    start = datetime.combine(DAY, datetime.min.time())
+    db.session.add_all(
+        Reservation(
+            room_id=room_id,
+            user_id=1,
+            start_time=start + timedelta(hours=index),
+            end_time=start + timedelta(hours=index, minutes=59),
+        )
+        for index in range(count)
+    )
+    db.session.commit()
+
+
+def overlap_check(_app):
+    """
+    Check a free interval of the busiest room.
+    """
+    room = db.session.get(Room, 1)
+    start = datetime.combine(DAY, datetime.min.time()) - timedelta(days=1)
+    end = start + timedelta(hours=1)
+
+    def run():
+        assert not check_overlapping_reservations(room, start, end)
+
+    return run
+
+
+def availability(app):
+    """
+    Get the available rooms at a time of DAY.
+    """
+    client = app.test_client()
+    path = f"/api/rooms_available/?date={DAY}&time=10:30"
+
+    def run():
+        assert client.get(path).status_code == 200
+
+    return run
+
+
+def list_reservations(app):
+    """
+    List the reservations of the first user.
+    """
+    client = app.test_client()
+
+    def run():
+        assert client.get("/api/users/1/reservations/", headers=HEADERS).status_code == 200
+
+    return run
+
+
+def auth(app):
+    """
+    Check the API key of a request like require_user.
+    """
+    view = require_user(lambda api_key_user: api_key_user.id)
+
+    def run():
+        with app.test_request_context(headers=HEADERS):
+            assert view() == 1
+        db.session.remove()
+
+    return run
+
+
+def bulk_insert(_app):
+    """
+    Insert a batch of reservations in one transaction, then remove them.
+    """
+    room = Room(room_name="Bulk room", capacity=10, max_time=180)
+    db.session.add(room)
+    db.session.commit()
+    room_id = room.id
+
+    def run():
+        insert_reservations(room_id, 100)
+        Reservation.query.filter_by(room_id=room_id).delete()
+        db.session.commit()
+
+    return run
+
+
+# name: (setup, operations per round)
+CASES = {
+    "overlap_check": (overlap_check, 200),
+    "availability": (availability, 20),
+    "list_reservations": (list_reservations, 50),
+    "auth": (auth, 200),
+    "bulk_insert": (bulk_insert, 2),
+}
+
+
+def measure(names, rounds):
+    """
+    Time the cases on a seeded temporary database.
+
+    Every round of a case is preceded by the calibration loop, and its time
+    is divided by the time of the loop, so a machine slowed down for a
+    moment by other processes slows down both.
+
+    Args:
+        names (list): The names of the cases to run.
+        rounds (int): The number of rounds of every case.
+
+    Returns:
+        dict: The seconds per operation, and the median and the MAD of the
+        calibrated time per operation, of every case.
+    """
+    results = {}
+    # Singleflight and N+1 detection are not measured, every run is sequential
+    with temporary_app(SINGLEFLIGHT_ENABLED=False, N_PLUS_ONE_MODE="off") as app:
+        seed(app, users=1, rooms=100)
+        with app.app_context():
+            insert_reservations(1, 500)
+            for name in names:
+                setup, operations = CASES[name]
+                run = setup(app)
+                run()  # Warm up
+                seconds = []
+                relative = []
+                for _ in range(rounds):
+                    unit = calibrate()
+                    start = time.perf_counter()
+                    for _ in range(operations):
+                        run()
+                    seconds.append((time.perf_counter() - start) / operations)
+                    relative.append(seconds[-1] / unit)
+                median = statistics.median(relative)
+                results[name] = {
+                    "seconds": statistics.median(seconds),
+                    "median": median,
+                    "mad": statistics.median(abs(value - median) for value in relative),
+                    "rounds": rounds,
+                }
+                db.session.remove()
+    return results
+
+
+def standard_error(result):
+    """
+    Estimate the standard error of the median of a case.
+
+    The standard deviation is estimated from the MAD, robust to the rounds
+    slowed down by other processes, and the standard error of the median of
+    n rounds is about 1.253 standard deviations over the square root of n.
+
+    Args:
+        result (dict): The result of the case, from measure.
+
+    Returns:
+        float: The standard error, in calibrated time per operation.
+    """
+    return 1.253 * 1.4826 * result["mad"] / math.sqrt(result["rounds"])
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare the current results with the baseline.
+
+    Args:
+        baseline (dict): The baseline results, from baseline.json.
+        current (dict): The current results, from measure.
+        threshold (float): The tolerated slowdown, 0.2 for 20%.
+
+    Returns:
+        list: The (name, ratio, regressed) tuples of the cases in both results.
+    """
+    rows = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]["median"]
+        noise = 3 * math.hypot(standard_error(baseline[name]), standard_error(result))
+        slowdown = result["median"] - expected
+        regressed = slowdown > expected * threshold and slowdown > noise
+        rows.append((name, result["median"] / expected, regressed))
+    return rows
+
+
+def main():
+    """
+    Parse the arguments, time the cases and compare them with the baseline.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument(
+        "--update", action="store_true", help="write the results as the new baseline"
+    )
+    args = parser.parse_args()
+
+    current = measure(args.only, args.rounds)
+
+    if args.update:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(
+                {"python": platform.python_version(), "cases": current},
+                file,
+                indent=2,
+            )
+            file.write("\n")
+        for name, result in current.items():
+            print(f"{name:<18} {result['seconds'] * 1e6:10.1f} us/op")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    rows = compare(baseline["cases"], current, args.threshold)
+    suspects = [name for name, _ratio, regressed in rows if regressed]
+    if suspects:
+        # A regression must be confirmed by a second run of its case
+        current.update(measure(suspects, args.rounds))
+        rows = compare(baseline["cases"], current, args.threshold)
+    failed = False
+    for name, ratio, regressed in rows:
+        status = "REGRESSION" if regressed else "ok"
+        print(
+            f"{name:<18} {current[name]['seconds'] * 1e6:10.1f} us/op "
+            f"{ratio:6.2f}x baseline  {status}"
+        )
+        failed |= regressed
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Replay of recorded traffic against a local server.
+
+It reads a file written by the traffic recorder (see src/recorder.py) and
+sends its requests again, at the offsets of their recorded arrivals
+divided by --speed: 1 replays in real time, 10 ten times faster, and 0 as
+fast as possible. The arrivals are open-loop, like in the load test, so
+the latency of a request is counted from its planned arrival, or from its
+sending with --speed 0. It then compares, for every route, the status
+codes and the latency percentiles of the replay with the recorded ones.
+The recorded durations are measured in the server, so the replayed ones
+also include the network and the queueing in the server.
+
+The recorded Api-key headers are pseudonyms. Replay against a copy of the
+recorded database whose keys were replaced by their pseudonyms, with the
+salt of the recording:
+
+    cp instance/reservation_system.db /tmp/replay.db
+    FLASK_SQLALCHEMY_DATABASE_URI=sqlite:////tmp/replay.db flask --app src.api rekey-api-keys
+    FLASK_SQLALCHEMY_DATABASE_URI=sqlite:////tmp/replay.db flask --app src.api run
+    python -m benchmarks.replay instance/traffic.jsonl --speed 5 --shift-dates
+
+--shift-dates moves the dates of the requests by the days elapsed since
+the recording, so that the bookings are not refused as past time slots.
+"""
+
+import argparse
+import collections
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+ID_PATTERN = re.compile(r"/\d+(?=/|$)")
+
+
+def read_records(path):
+    """
+    Read the records of a traffic file, by arrival time.
+
+    Args:
+        path (str): The file written by the recorder.
+
+    Returns:
+        list: The records, as dicts.
+    """
+    with open(path, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    return sorted(records, key=lambda record: record["t"])
+
+
+def route(record):
+    """
+    Get the route of a record: its method and path, without the query and ids.
+
+    Returns:
+        str: The route, for example "GET /api/users/<id>/reservations/".
+    """
+    return f"{record['m']} {ID_PATTERN.sub('/<id>', urlsplit(record['p']).path)}"
+
+
+def shift_dates(record, days):
+    """
+    Move the dates of the query and the JSON body of a record.
+
+    Args:
+        record (dict): The record.
+        days (int): The number of days to add.
+
+    Returns:
+        tuple: The path and the body to send.
+    """
+
+    def shift(value):
+        if isinstance(value, str) and DATE_PATTERN.match(value):
+            return (date.fromisoformat(value) + timedelta(days=days)).isoformat()
+        return value
+
+    parts = urlsplit(record["p"])
+    path = parts.path
+    if parts.query:
+        query = [(name, shift(value)) for name, value in parse_qsl(parts.query)]
+        path += "?" + urlencode(query)
+    body = record.get("b")
+    if body and "json" in (record.get("c") or ""):
+        try:
+            document = json.loads(body)
+        except ValueError:
+            return path, body
+        if isinstance(document, dict):
+            body = json.dumps({name: shift(value) for name, value in document.items()})
+    return path, body
+
+
+def percentile(values, rank):
+    """
+    Get a percentile of a list of values.
+    """
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * rank))]
+
+
+def replay(records, args):
+    """
+    Send the recorded requests again and collect their results.
+
+    Args:
+        records (list): The records, by arrival time.
+        args (Namespace): The options of the command.
+
+    Returns:
+        list: The (record, status, latency in ms) tuples, status None for a
+        failed connection.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.max_in_flight)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    days = 0
+    if args.shift_dates:
+        days = (date.today() - date.fromtimestamp(records[0]["t"])).days
+
+    results = []
+    lock = threading.Lock()
+
+    def send(record, planned):
+        if planned is None:
+            planned = time.perf_counter()
+        path, body = shift_dates(record, days) if days else (record["p"], record.get("b"))
+        headers = {}
+        if record.get("k"):
+            headers["Api-key"] = record["k"]
+        if record.get("c"):
+            headers["Content-Type"] = record["c"]
+        try:
+            response = session.request(
+                record["m"],
+                args.url.rstrip("/") + path,
+                data=body.encode() if body else None,
+                headers=headers,
+                allow_redirects=False,
+            )
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        latency = (time.perf_counter() - planned) * 1000
+        with lock:
+            results.append((record, status, latency))
+
+    with ThreadPoolExecutor(args.max_in_flight) as executor:
+        start = time.perf_counter()
+        first = records[0]["t"]
+        for record in records:
+            # As fast as possible, the latency is counted from the sending
+            planned = None
+            if args.speed:
+                planned = start + (record["t"] - first) / args.speed
+                delay = planned - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(send, record, planned)
+    return results
+
+
+def report(results, top):
+    """
+    Print the comparison of the replay with the recording, by route.
+
+    Args:
+        results (list): The results of replay.
+        top (int): The number of routes and mismatches printed.
+
+    Returns:
+        None
+    """
+    by_route = collections.defaultdict(list)
+    mismatches = collections.Counter()
+    for record, status, latency in results:
+        by_route[route(record)].append((record, status, latency))
+        if status != record["s"]:
+            mismatches[(route(record), record["s"], status)] += 1
+
+    matching = len(results) - sum(mismatches.values())
+    print(f"{len(results)} requests, {matching / len(results):.1%} with the recorded status")
+    print(
+        f"{'route':<48} {'count':>6}  {'same status':>11}  "
+        f"{'p50 rec/replay ms':>19}  {'p95 rec/replay ms':>19}"
+    )
+    for name, rows in sorted(by_route.items(), key=lambda item: -len(item[1]))[:top]:
+        recorded = [record["d"] for record, _status, _latency in rows]
+        replayed = [latency for _record, _status, latency in rows]
+        same = sum(1 for record, status, _latency in rows if status == record["s"])
+        print(
+            f"{name:<48} {len(rows):>6}  {same / len(rows):>11.1%}  "
+            f"{percentile(recorded, 0.5):>8.1f} /{percentile(replayed, 0.5):>8.1f}  "
+            f"{percentile(recorded, 0.95):>8.1f} /{percentile(replayed, 0.95):>8.1f}"
+        )
+    if mismatches:
+        print("Status changes:")
+        for (name, recorded, replayed), count in mismatches.most_common(top):
+            print(f"  {name:<48} {recorded} -> {replayed}: {count}")
+
+
+def main():
+    """
+    Parse the arguments, replay the file and print the comparison.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("file", help="traffic file written by the recorder")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--shift-dates", action="store_true")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    records = read_records(args.file)
+    if not records:
+        raise SystemExit("The traffic file is empty.")
+    start = time.perf_counter()
+    results = replay(records, args)
+    print(f"Replayed in {time.perf_counter() - start:.1f}s")
+    report(results, args.top)
+
+
+if __name__ == "__main__":
+    main()
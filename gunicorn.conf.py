@@ -0,0 +1,60 @@
+"""
+Gunicorn configuration of the production server.
+
+    gunicorn -c gunicorn.conf.py src.wsgi:application
+
+The application is loaded and warmed up once in the master, then the
+workers are forked from it (see src/wsgi.py). Each setting can be changed
+with an environment variable:
+
+- GUNICORN_BIND: The address to listen on, 0.0.0.0:8000 by default.
+- WEB_CONCURRENCY: The number of worker processes, 2 per CPU plus 1 by default.
+- GUNICORN_THREADS: The number of threads of each worker, 1 by default.
+- GUNICORN_TIMEOUT: The seconds after which a silent worker is restarted.
+- GUNICORN_GRACEFUL_TIMEOUT: The seconds the workers have to finish
+  their requests on a reload or a shutdown.
+- GUNICORN_MAX_REQUESTS: The number of requests after which a worker is
+  replaced, 0 to never replace them.
+- GUNICORN_PRELOAD: 0 to load the application in every worker instead.
+
+The settings of the application itself can be given with FLASK_ prefixed
+environment variables, for example FLASK_SQLALCHEMY_DATABASE_URI.
+
+Graceful reload: "kill -HUP <master pid>" starts new workers and stops
+the old ones once their requests are finished. As the application is
+preloaded, new code is loaded by starting a new master with
+"kill -USR2 <master pid>", then stopping the old one with "kill -TERM".
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(
+    os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)
+)
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+# Load and warm up the application in the master, see src/wsgi.py
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+
+def post_fork(_server, worker):
+    """
+    Drop the database connections inherited from the master.
+
+    The engines keep their compiled statement cache, only their pools are
+    replaced, without closing the connections of the master.
+    """
+    app = worker.app.wsgi()
+    with app.app_context():
+        # pylint: disable=import-outside-toplevel
+        from src import db
+
+        db.engine.dispose(close=False)
+    app.extensions["tenant_engines"].dispose(close=False)
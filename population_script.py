@@ -5,6 +5,7 @@ This script is used to populate the database with initial data for a reservation
 
 from datetime import date, datetime, time
 from src.api import app
+from src.migrations import migrate
 from src.models import ApiKey, Reservation, Room, User, db
 
 def populate_db(test = False):
@@ -20,6 +21,7 @@ def populate_db(test = False):
 
         # Create tables again
         db.create_all()
+        migrate(db.engine)
 
         # Create users
         user1 = User(username="user1", email="user1@example.com")
@@ -16,7 +16,9 @@ import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from .tenancy import TenantSession
+
+db = SQLAlchemy(session_options={"class_": TenantSession})
 
 
 # Based on http://flask.pocoo.org/docs/1.0/tutorial/factory/#the-application-factory
@@ -38,10 +40,73 @@ def create_app(test_config=None):
         SQLALCHEMY_DATABASE_URI="sqlite:///"
         + os.path.join(app.instance_path, "reservation_system.db"),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        # Idempotency-Key support, durations in seconds
+        IDEMPOTENCY_TTL=24 * 60 * 60,
+        IDEMPOTENCY_LOCK_TIMEOUT=60,
+        IDEMPOTENCY_PURGE_INTERVAL=5 * 60,
+        # Group commit of the reservation writes, see write_pipeline.py
+        WRITE_PIPELINE_ENABLED=False,
+        WRITE_PIPELINE_WINDOW_MS=2,
+        WRITE_PIPELINE_MAX_BATCH=100,
+        # Tentative holds, see holds.py
+        HOLD_MINUTES=10,
+        HOLD_SWEEP_INTERVAL=60,
+        # History tier, see archive.py
+        ARCHIVE_HORIZON_DAYS=30,
+        ARCHIVE_BATCH_SIZE=1000,
+        ARCHIVE_INTERVAL=60 * 60,
+        # Quotas of every user, None to disable, see quotas.py
+        QUOTA_MAX_RESERVATIONS=None,
+        QUOTA_MAX_WEEKLY_MINUTES=None,
+        # Per campus databases, see tenancy.py
+        TENANTS=[],
+        TENANT_DATABASE_URI="sqlite:///"
+        + os.path.join(app.instance_path, "tenants", "{tenant}.db"),
+        TENANT_ENGINE_CACHE_SIZE=16,
+        # Limits of the requests by route class, see admission.py
+        ADMISSION_LIMITS={},
+        ADMISSION_QUEUE_TIMEOUT=1.0,
+        ADMISSION_RETRY_AFTER=1,
+        # Slow query log, None to disable, see slow_queries.py
+        SLOW_QUERY_THRESHOLD_MS=100,
+        # A file to also write the entries to, for example
+        # instance/slow_queries.log, None to keep them in memory only
+        SLOW_QUERY_LOG_FILE=None,
+        SLOW_QUERY_LOG_MAX_BYTES=1024 * 1024,
+        SLOW_QUERY_LOG_BACKUPS=3,
+        SLOW_QUERY_LOG_SIZE=100,
+        # Profiling of the requests by the admins, see profiling.py
+        PROFILING_MAX_PROFILES=20,
+        PROFILING_SAMPLE_INTERVAL_MS=5,
+        PROFILING_CONTINUOUS=False,
+        # N+1 query detector, None to raise in tests and log in debug mode,
+        # see nplusone.py
+        N_PLUS_ONE_MODE=None,
+        N_PLUS_ONE_THRESHOLD=5,
+        # Recording of the traffic, None to disable, see recorder.py
+        TRAFFIC_RECORD_FILE=None,
+        TRAFFIC_RECORD_MAX_BODY=64 * 1024,
+        TRAFFIC_RECORD_SALT=None,
+        TRAFFIC_RECORD_SCRUBBED_FIELDS=["email", "password", "token", "secret", "api_key"],
+        # Cache of the rooms, see room_catalog.py
+        ROOM_CATALOG_CHECK_INTERVAL=5.0,
+        # Background jobs, see scheduler.py
+        SCHEDULER_WORKERS=2,
+        OPTIMIZE_INTERVAL=6 * 60 * 60,
+        # Coalescing of identical concurrent reads, see singleflight.py
+        SINGLEFLIGHT_ENABLED=True,
+        SINGLEFLIGHT_SHARED_DIR=None,
+        # Threads running the requests in ASGI mode, see asgi.py
+        ASGI_THREADS=32,
+        # OpenAPI spec and Swagger UI, see apispec.py
+        SWAGGER_ENABLED=True,
+        SWAGGER_SPEC_FILE=None,
     )
 
     if test_config is None:
         app.config.from_pyfile("config.py", silent=True)
+        # For example FLASK_SQLALCHEMY_DATABASE_URI, see gunicorn.conf.py
+        app.config.from_prefixed_env()
     else:
         app.config.from_mapping(test_config)
 
@@ -51,4 +116,37 @@ def create_app(test_config=None):
         pass
 
     db.init_app(app)
+
+    # pylint: disable=import-outside-toplevel
+    from . import (
+        admission,
+        archive,
+        holds,
+        idempotency,
+        migrations,
+        nplusone,
+        profiling,
+        recorder,
+        room_catalog,
+        scheduler,
+        singleflight,
+        slow_queries,
+        tenancy,
+        write_pipeline,
+    )
+
+    admission.init_app(app)
+    tenancy.init_app(app)
+    room_catalog.init_app(app)
+    scheduler.init_app(app)
+    idempotency.init_app(app)
+    write_pipeline.init_app(app)
+    holds.init_app(app)
+    archive.init_app(app)
+    migrations.init_app(app)
+    singleflight.init_app(app)
+    slow_queries.init_app(app)
+    profiling.init_app(app)
+    nplusone.init_app(app)
+    recorder.init_app(app)
     return app
@@ -0,0 +1,241 @@
+"""
+This module contains the admission control of the requests.
+
+Under a spike, running every request to completion makes the latency
+climb for everyone. The requests of a route class (availability reads,
+reservation writes, admin listings) are admitted while fewer than its
+concurrency limit are running. The next ones wait in the queue of the
+class, up to its queue limit, for ADMISSION_QUEUE_TIMEOUT seconds at most.
+When the queue is full or the wait times out, the request gets a fast 503
+response with a Retry-After header instead.
+
+Each class has its own places, so the availability reads of the kiosks
+are shed without slowing down the bookings, and a queued booking never
+holds back the reads. The waiting requests of a class are admitted in
+order of priority, the ones with an Api-key first, then in order of
+arrival.
+
+The limits are set per class in ADMISSION_LIMITS, for example:
+
+    ADMISSION_LIMITS = {
+        "availability": {"concurrency": 8, "queue": 16},
+        "writes": {"concurrency": 4, "queue": 64},
+        "admin": {"concurrency": 1, "queue": 2},
+    }
+
+The classes without limits, and the other routes, are never limited. The
+limits apply to each process; the current queue depths are returned by
+the metrics endpoint.
+
+Classes:
+- AdmissionController: Admits the requests within the limits of their class.
+
+Functions:
+- init_app(app): Registers the admission of the requests of the application.
+- route_class(endpoint, method): Gets the route class of a request.
+- stats(app): Gets the counters of the route classes.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from flask import Response, g, request
+
+ROUTE_CLASSES = {
+    ("roomsavailable", "GET"): "availability",
+    ("reservationcollection", "POST"): "writes",
+    ("reservationid", "PUT"): "writes",
+    ("reservationid", "DELETE"): "writes",
+    ("reservationbulkcancel", "DELETE"): "writes",
+    ("waitlistcollection", "POST"): "writes",
+    ("waitlistentryid", "DELETE"): "writes",
+    ("usercollection", "GET"): "admin",
+    ("roomcollection", "POST"): "admin",
+    ("roomid", "PUT"): "admin",
+    ("roomid", "DELETE"): "admin",
+}
+
+# Lower values are admitted first
+PRIORITIES = {"writes": 0, "admin": 1}
+LOWEST_PRIORITY = 2
+
+
+def init_app(app):
+    """
+    Register the admission of the requests of the application.
+
+    Nothing changes when ADMISSION_LIMITS is empty.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    controller = AdmissionController(
+        app.config["ADMISSION_LIMITS"], app.config["ADMISSION_QUEUE_TIMEOUT"]
+    )
+    app.extensions["admission"] = controller
+    if not app.config["ADMISSION_LIMITS"]:
+        return
+
+    @app.before_request
+    def _admit_request():
+        name = route_class(request.endpoint, request.method)
+        if name is None:
+            return None
+        priority = LOWEST_PRIORITY
+        if request.headers.get("Api-key"):
+            priority = PRIORITIES.get(name, LOWEST_PRIORITY)
+        if not controller.acquire(name, priority):
+            return Response(
+                "The service is overloaded, retry later.",
+                status=503,
+                headers={"Retry-After": str(app.config["ADMISSION_RETRY_AFTER"])},
+            )
+        g.admission_class = name
+        return None
+
+    @app.teardown_request
+    def _release_request(_exc):
+        name = g.pop("admission_class", None)
+        if name is not None:
+            controller.release(name)
+
+
+def route_class(endpoint, method):
+    """
+    Get the route class of a request.
+
+    Args:
+        endpoint (str): The endpoint of the request.
+        method (str): The HTTP method of the request.
+
+    Returns:
+        str: The route class, None for the routes which are never limited.
+    """
+    return ROUTE_CLASSES.get((endpoint, method))
+
+
+def stats(app):
+    """
+    Get the counters of the route classes of the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        dict: The counters of every limited route class, by class name.
+    """
+    return app.extensions["admission"].stats()
+
+
+class AdmissionController:
+    """
+    Admits the requests within the limits of their class.
+
+    Attributes:
+        limits (dict): The concurrency and queue limits, by class name.
+        timeout (float): The longest wait in a queue, in seconds.
+
+    Methods:
+        acquire(name, priority): Waits for the admission of a request.
+        release(name): Releases the place of a finished request.
+        stats(): Gets the counters of the classes.
+    """
+
+    def __init__(self, limits, timeout):
+        self.limits = limits
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._counters = {
+            name: {"active": 0, "queued": 0, "admitted": 0, "rejected": 0, "timeouts": 0}
+            for name in limits
+        }
+        # Heaps of the (priority, arrival) tickets of the waiting requests, by class
+        self._waiting = {name: [] for name in limits}
+        self._arrivals = itertools.count()
+
+    def acquire(self, name, priority):
+        """
+        Wait for the admission of a request.
+
+        Args:
+            name (str): The route class of the request.
+            priority (int): The priority of the request, 0 is the highest.
+
+        Returns:
+            bool: True if the request is admitted, False if it must be rejected.
+        """
+        if name not in self.limits:
+            return True
+        limits = self.limits[name]
+        counters = self._counters[name]
+        waiting = self._waiting[name]
+        with self._condition:
+            if not waiting and self._has_place(name):
+                counters["active"] += 1
+                counters["admitted"] += 1
+                return True
+            if len(waiting) >= limits["queue"]:
+                counters["rejected"] += 1
+                return False
+
+            ticket = (priority, next(self._arrivals))
+            heapq.heappush(waiting, ticket)
+            counters["queued"] = len(waiting)
+            deadline = time.monotonic() + self.timeout
+            try:
+                while waiting[0] != ticket or not self._has_place(name):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        counters["timeouts"] += 1
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                waiting.remove(ticket)
+                heapq.heapify(waiting)
+                counters["queued"] = len(waiting)
+                # The next request of the class may now be admitted
+                self._condition.notify_all()
+            counters["active"] += 1
+            counters["admitted"] += 1
+            return True
+
+    def release(self, name):
+        """
+        Release the place of a finished request.
+
+        Args:
+            name (str): The route class of the request.
+
+        Returns:
+            None
+        """
+        if name not in self.limits:
+            return
+        with self._condition:
+            self._counters[name]["active"] -= 1
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        Get the counters of the classes.
+
+        Returns:
+            dict: The running and queued requests, the number of admitted,
+            rejected and timed out requests, and the limits, by class name.
+        """
+        with self._condition:
+            return {
+                name: dict(counters, **self.limits[name])
+                for name, counters in self._counters.items()
+            }
+
+    def _has_place(self, name):
+        """
+        Check that the class has a free place.
+        """
+        return self._counters[name]["active"] < self.limits[name]["concurrency"]
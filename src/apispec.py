@@ -0,0 +1,103 @@
+"""
+This module serves the OpenAPI spec of the API and the Swagger UI.
+
+flasgger builds the spec by parsing the YAML in the docstrings of every
+resource method, which is slow and allocates a lot. Here it is built once,
+on the first request to /apispec_1.json, and kept serialized with an ETag,
+so that clients revalidating with If-None-Match get an empty 304 response.
+The spec can also be built ahead of time into a JSON file with the
+build-apispec command; when SWAGGER_SPEC_FILE points to that file it is
+served as is, without parsing any docstring.
+
+When SWAGGER_ENABLED is false, for example with FLASK_SWAGGER_ENABLED=false
+in production, flasgger is not even imported and /apidocs/ is not served.
+
+Functions:
+- init_app(app): Registers Swagger, the cached spec endpoint and the build-apispec command.
+- spec_json(app): Gets the serialized spec and its ETag, building them on first use.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import click
+from flask import Response, current_app, request
+
+SPEC_ENDPOINT = "flasgger.apispec_1"
+
+
+def init_app(app):
+    """
+    Register Swagger, the cached spec endpoint and the build-apispec command.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    if not app.config["SWAGGER_ENABLED"]:
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from flasgger import Swagger
+
+    Swagger(app)
+    app.extensions["apispec"] = {"lock": threading.Lock(), "spec": None}
+    app.view_functions[SPEC_ENDPOINT] = spec_view
+
+    @app.cli.command("build-apispec")
+    @click.argument("path", required=False)
+    def build_apispec_command(path):
+        """Write the OpenAPI spec to PATH or to SWAGGER_SPEC_FILE."""
+        path = path or app.config["SWAGGER_SPEC_FILE"]
+        if not path:
+            raise click.UsageError("Give a PATH or set SWAGGER_SPEC_FILE.")
+        with app.test_request_context():
+            spec = app.swag.get_apispecs(SPEC_ENDPOINT.split(".")[1])
+        with open(path, "w", encoding="utf-8") as spec_file:
+            json.dump(spec, spec_file, separators=(",", ":"), sort_keys=True)
+        click.echo(f"OpenAPI spec written to {path}.")
+
+
+def spec_json(app):
+    """
+    Get the serialized spec and its ETag, building them on first use.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        tuple: The spec as JSON bytes and its ETag.
+    """
+    cache = app.extensions["apispec"]
+    with cache["lock"]:
+        if cache["spec"] is None:
+            path = app.config["SWAGGER_SPEC_FILE"]
+            if path and os.path.exists(path):
+                with open(path, "rb") as spec_file:
+                    body = spec_file.read()
+            else:
+                with app.test_request_context():
+                    spec = app.swag.get_apispecs(SPEC_ENDPOINT.split(".")[1])
+                body = json.dumps(
+                    spec, separators=(",", ":"), sort_keys=True
+                ).encode()
+            cache["spec"] = (body, hashlib.sha256(body).hexdigest()[:32])
+        return cache["spec"]
+
+
+def spec_view():
+    """
+    Serve the spec, or a 304 response when the ETag of the client matches.
+
+    Returns:
+        Response: The spec with its ETag.
+    """
+    body, etag = spec_json(current_app)
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
@@ -0,0 +1,77 @@
+"""
+This module creates the application serving the API.
+
+It has no side effect when imported: the entry points (api.py for the
+flask command, wsgi.py for gunicorn), the benchmarks and the tests create
+their own application.
+
+Functions:
+- create_api_app(test_config=None): Creates the application and registers the API resources.
+"""
+
+from flask_restful import Api
+
+from . import apispec, create_app
+from .converters import RoomConverter
+from .resources import (
+    metrics,
+    profiles,
+    reservation,
+    reservation_bulk,
+    reservation_collection,
+    room,
+    rooms_available,
+    slow_queries,
+    user,
+    user_collection,
+    waitlist,
+)
+
+
+def create_api_app(test_config=None):
+    """
+    Create the application and register the API resources.
+
+    Args:
+        test_config (dict, optional):
+        Configuration dictionary for testing purposes. Defaults to None.
+
+    Returns:
+        Flask: The application serving the API.
+    """
+    app = create_app(test_config)
+
+    apispec.init_app(app)
+
+    api = Api(app)
+
+    app.url_map.converters["room"] = RoomConverter
+
+    api.add_resource(user_collection.UserCollection, "/api/users/")
+    api.add_resource(user.UserId, "/api/users/<user_id>/")
+
+    api.add_resource(
+        reservation_collection.ReservationCollection,
+        "/api/users/<user_id>/reservations/",
+    )
+    api.add_resource(
+        reservation.ReservationId, "/api/users/<user_id>/reservations/<reservation_id>/"
+    )
+
+    api.add_resource(reservation_bulk.ReservationBulkCancel, "/api/reservations/")
+
+    api.add_resource(room.RoomCollection, "/api/rooms/")
+    api.add_resource(room.RoomId, "/api/rooms/<room:room>/")
+    api.add_resource(rooms_available.RoomsAvailable, "/api/rooms_available/")
+
+    api.add_resource(metrics.Metrics, "/api/metrics/")
+    api.add_resource(slow_queries.SlowQueries, "/api/slow_queries/")
+    api.add_resource(profiles.ProfileCollection, "/api/profiles/")
+    api.add_resource(profiles.ProfileId, "/api/profiles/<profile_id>/")
+    api.add_resource(profiles.RouteProfile, "/api/profiles/routes/<endpoint>/")
+
+    api.add_resource(waitlist.WaitlistCollection, "/api/users/<user_id>/waitlist/")
+    api.add_resource(
+        waitlist.WaitlistEntryId, "/api/users/<user_id>/waitlist/<entry_id>/"
+    )
+    return app
@@ -0,0 +1,102 @@
+"""
+This module contains the archive job moving the past reservations to the history tier.
+
+The reservation table only keeps the current reservations. The ones
+which ended more than ARCHIVE_HORIZON_DAYS ago are moved, in batches of
+ARCHIVE_BATCH_SIZE, to the reservation_history table every
+ARCHIVE_INTERVAL seconds. Each batch is one INSERT ... SELECT and one
+DELETE in a short transaction, so the job never holds the write lock
+for long.
+
+Functions:
+- init_app(app): Registers the archive job.
+- archive_past_reservations(): Archives all the reservations older than the horizon.
+- archive_batch(cutoff, batch_size): Archives one batch of reservations.
+"""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert, literal, select
+
+from . import db, scheduler
+from .models import Reservation, ReservationHistory, to_minutes
+
+
+def init_app(app):
+    """
+    Register the archive job.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    scheduler.register_periodic_job(
+        app, "archive", app.config["ARCHIVE_INTERVAL"], archive_past_reservations
+    )
+
+
+def archive_past_reservations():
+    """
+    Archive all the reservations which ended before the horizon.
+
+    Returns:
+        int: The number of archived reservations.
+    """
+    cutoff = datetime.now() - timedelta(days=current_app.config["ARCHIVE_HORIZON_DAYS"])
+    batch_size = current_app.config["ARCHIVE_BATCH_SIZE"]
+    archived = 0
+    while True:
+        count = archive_batch(cutoff, batch_size)
+        archived += count
+        if count < batch_size:
+            return archived
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move one batch of reservations which ended before cutoff to the history.
+
+    Holds are never archived, the expired ones are deleted by the hold sweeper.
+
+    Args:
+        cutoff (datetime): The reservations ending before it are archived.
+        batch_size (int): The maximum number of reservations to move.
+
+    Returns:
+        int: The number of archived reservations.
+    """
+    ids = db.session.scalars(
+        select(Reservation.id)
+        .where(
+            Reservation.end_minute < to_minutes(cutoff),
+            Reservation.expires_at.is_(None),
+        )
+        .order_by(Reservation.end_minute)
+        .limit(batch_size)
+    ).all()
+    if not ids:
+        return 0
+
+    db.session.execute(
+        insert(ReservationHistory).from_select(
+            ["id", "room_id", "user_id", "start_time", "end_time", "archived_at"],
+            select(
+                Reservation.id,
+                Reservation.room_id,
+                Reservation.user_id,
+                Reservation.start_time,
+                Reservation.end_time,
+                literal(datetime.now(), ReservationHistory.archived_at.type),
+            ).where(Reservation.id.in_(ids)),
+        )
+    )
+    # The booked minutes of the archived reservations still count in their
+    # week, so the counters are left as they are
+    Reservation.query.filter(Reservation.id.in_(ids)).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    return len(ids)
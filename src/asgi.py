@@ -0,0 +1,116 @@
+"""
+This module contains the ASGI serving mode of the API.
+
+The WSGI application uses one thread per connection: a slow client, like
+a kiosk polling the available rooms over a poor network, holds a thread
+for as long as it sends its request. In ASGI mode, the server reads the
+requests on the event loop, so thousands of slow clients only cost a few
+coroutines, and only the complete requests are handed to the Flask
+application, in a pool of ASGI_THREADS threads. Every endpoint is served
+by the same resources and request hooks as in WSGI mode (admission,
+tenancy, singleflight, the recorder and the profiler), so both modes
+always give the same responses.
+
+The requests are not run with an async SQLite driver: aiosqlite runs
+every connection in a thread of its own, so it would not save the
+threads, and the resources would have to be written twice.
+
+Run it with:
+
+    uvicorn --factory src.asgi:create_asgi_app
+
+Classes:
+- AsgiApp: ASGI application serving the Flask application.
+- WsgiRequest: A request served by the Flask application in the thread pool.
+
+Functions:
+- create_asgi_app(flask_app=None): Creates the ASGI application.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+
+from . import scheduler
+
+
+def create_asgi_app(flask_app=None):
+    """
+    Create the ASGI application.
+
+    Args:
+        flask_app (Flask, optional): The application serving the requests,
+        src.api.app by default.
+
+    Returns:
+        AsgiApp: The ASGI application.
+    """
+    if flask_app is None:
+        # pylint: disable=import-outside-toplevel
+        from .api import app as flask_app
+    return AsgiApp(flask_app)
+
+
+class AsgiApp:
+    """
+    ASGI application serving the Flask application.
+
+    Attributes:
+        flask_app (Flask): The application serving the requests.
+        executor (ThreadPoolExecutor): The threads running the requests.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(
+            flask_app.config["ASGI_THREADS"], thread_name_prefix="asgi"
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        await WsgiRequest(self.flask_app, self.executor)(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        """
+        Start the background jobs of the process, and stop them on shutdown.
+        """
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                scheduler.start(self.flask_app)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                scheduler.stop(self.flask_app)
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+class WsgiRequest(WsgiToAsgiInstance):
+    """
+    A request served by the Flask application in the thread pool.
+
+    WsgiToAsgi runs the application with a thread sensitive sync_to_async,
+    that is every request of the process on the same thread, one at a time.
+
+    Attributes:
+        executor (ThreadPoolExecutor): The threads running the requests.
+    """
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        """
+        Run the Flask application in a thread of the pool.
+        """
+        run = sync_to_async(
+            WsgiToAsgiInstance.run_wsgi_app.__wrapped__,
+            thread_sensitive=False,
+            executor=self.executor,
+        )
+        await run(self, body)
@@ -2,6 +2,9 @@ import requests
 
 API_URL = "http://localhost:5000/api"
 
+# Shared by the calls, to reuse the connections to the API
+session = requests.Session()
+
 
 class AvailabilityClient:
 
@@ -11,5 +14,5 @@ class AvailabilityClient:
         if duration is not None:
             params["duration"] = duration
 
-        response = requests.get(f"{API_URL}/rooms_available", params=params)
+        response = session.get(f"{API_URL}/rooms_available/", params=params)
         return f"{response.status_code} - {response.text}"
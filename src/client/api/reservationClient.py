@@ -2,6 +2,9 @@ import requests
 
 API_URL = "http://localhost:5000/api"
 
+# Shared by the calls, to reuse the connections to the API
+session = requests.Session()
+
 
 class ReservationClient:
 
@@ -14,7 +17,7 @@ class ReservationClient:
             "end-time": end_time,
             "roomId": roomId,
         }
-        response = requests.post(
+        response = session.post(
             f"{API_URL}/users/{user_id}/reservations/", json=body, headers=headers
         )
         return f"{response.status_code} - {response.text}"
@@ -22,7 +25,7 @@ class ReservationClient:
     @staticmethod
     def get_reservations(user_id, api_key):
         headers = {"Api-key": api_key}
-        response = requests.get(
+        response = session.get(
             f"{API_URL}/users/{user_id}/reservations/", headers=headers
         )
         return f"{response.status_code} - {response.text}"
@@ -30,7 +33,7 @@ class ReservationClient:
     @staticmethod
     def get_reservation(user_id, reservation_id, api_key):
         headers = {"Api-key": api_key}
-        response = requests.get(
+        response = session.get(
             f"{API_URL}/users/{user_id}/reservations/{reservation_id}/", headers=headers
         )
         return f"{response.status_code} - {response.text}"
@@ -56,7 +59,7 @@ class ReservationClient:
         if room_id:
             data["roomId"] = room_id
 
-        response = requests.put(
+        response = session.put(
             f"{API_URL}/users/{user_id}/reservations/{reservation_id}/",
             json=data, 
             headers=headers
@@ -66,7 +69,7 @@ class ReservationClient:
     @staticmethod
     def delete_reservation(user_id, reservation_id, api_key):
         headers = {'Api-key': api_key}
-        response = requests.delete(
+        response = session.delete(
             f"{API_URL}/users/{user_id}/reservations/{reservation_id}/", 
             headers=headers
         )
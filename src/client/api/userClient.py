@@ -2,11 +2,14 @@ import requests
 
 API_URL = "http://localhost:5000/api"
 
+# Shared by the calls, to reuse the connections to the API
+session = requests.Session()
+
 
 class UserClient:
     @staticmethod
     def create_user(username, email):
-        response = requests.post(
+        response = session.post(
             f"{API_URL}/users/", json={"username": username, "email": email}
         )
         if response.status_code == 201:
@@ -19,7 +22,7 @@ class UserClient:
     @staticmethod
     def get_user(user_id, api_key):
         headers = {"Api-key": api_key}
-        response = requests.get(f"{API_URL}/users/{user_id}/", headers=headers)
+        response = session.get(f"{API_URL}/users/{user_id}/", headers=headers)
         return f"{response.status_code} - {response.text}"
 
     @staticmethod
@@ -30,7 +33,7 @@ class UserClient:
             data["username"] = username
         if email:
             data["email"] = email
-        response = requests.put(
+        response = session.put(
             f"{API_URL}/users/{user_id}/", json=data, headers=headers
         )
         return f"{response.status_code} - {response.text}"
@@ -38,5 +41,5 @@ class UserClient:
     @staticmethod
     def delete_user(user_id, api_key):
         headers = {"Api-key": api_key}
-        response = requests.delete(f"{API_URL}/users/{user_id}/", headers=headers)
+        response = session.delete(f"{API_URL}/users/{user_id}/", headers=headers)
         return f"{response.status_code} - {response.text}"
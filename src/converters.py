@@ -5,7 +5,7 @@ This module contains the RoomConverter class for converting room names.
 from werkzeug.exceptions import NotFound
 from werkzeug.routing import BaseConverter
 
-from .models import Room
+from . import room_catalog
 
 
 class RoomConverter(BaseConverter):
@@ -15,28 +15,28 @@ class RoomConverter(BaseConverter):
 
     def to_python(self, value):
         """
-        Converts a room id to a database room object.
+        Converts a room id to a room of the room catalog.
 
         Args:
             value (int): The id of the room.
 
         Returns:
-            Room: The corresponding database room object.
+            CachedRoom: The corresponding room.
 
         Raises:
             NotFound: If the room does not exist in the database.
         """
-        db_room = Room.query.filter_by(id=value).first()
-        if db_room is None:
+        room = room_catalog.get(value)
+        if room is None:
             raise NotFound
-        return db_room
+        return room
 
     def to_url(self, value):
         """
-        Converts a database room object to its corresponding room id.
+        Converts a room to its corresponding room id.
 
         Args:
-            value (Room): The database room object.
+            value (Room or CachedRoom): The room.
 
         Returns:
             id: The id of the room.
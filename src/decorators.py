@@ -7,12 +7,21 @@ Decorators:
 Checks if the user making the request is an admin.
 - require_user:
 Requires the user to be authenticated with a valid API key.
+- require_api_key:
+Requires a valid API key and passes it, for resources open to both users and admins.
+- require_user_row:
+Like require_user, for the read-only resources, without loading ORM objects.
+
+Functions:
+- is_admin_request:
+Checks if the API key of the request belongs to an admin, for the request hooks.
 """
 
 from functools import wraps
 
 from flask import Response, request
 
+from . import reads
 from .models import ApiKey
 
 
@@ -33,14 +42,7 @@ def require_admin(func):
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        try:
-            key_hash = ApiKey.key_hash(request.headers.get("Api-key").strip())
-            db_key = ApiKey.query.filter_by(key=key_hash).first()
-        except Exception as exc:
-            return Response(
-                "The provided Api-key does not belong to an admin account", status=401
-            )
-        if db_key and db_key.admin:
+        if is_admin_request():
             return func(*args, **kwargs)
         return Response(
             "The provided Api-key does not belong to an admin account", status=401
@@ -49,6 +51,21 @@ def require_admin(func):
     return wrapper
 
 
+def is_admin_request():
+    """
+    Check if the Api-key header of the request belongs to an admin.
+
+    Returns:
+        bool: True if the API key is valid and has admin rights.
+    """
+    try:
+        key_hash = ApiKey.key_hash(request.headers.get("Api-key").strip())
+        db_key = ApiKey.query.filter_by(key=key_hash).first()
+    except Exception as exc:
+        return False
+    return bool(db_key and db_key.admin)
+
+
 # Function to verify if the request comes from an actual user
 def require_user(func):
     """
@@ -78,3 +95,70 @@ def require_user(func):
         return Response("Incorrect api key.", status=401)
 
     return wrapper
+
+
+# Function to verify the request has a valid key, admin or not
+def require_api_key(func):
+    """
+    Decorator that requires a valid API key, and passes the key itself.
+
+    Resources open to both the users and the admins use it to check the
+    user of the key and its admin rights.
+
+    Args:
+        func (callable): The function to be decorated.
+
+    Returns:
+        callable: The decorated function, with the ApiKey object as "api_key".
+
+    Raises:
+        Unauthorized: If the API key is invalid.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            key_hash = ApiKey.key_hash(request.headers.get("Api-key").strip())
+            db_key = ApiKey.query.filter_by(key=key_hash).first()
+        except Exception as exc:
+            return Response("Incorrect api key.", status=401)
+        if db_key:
+            kwargs["api_key"] = db_key
+            return func(*args, **kwargs)
+        return Response("Incorrect api key.", status=401)
+
+    return wrapper
+
+
+# Function to verify if the request comes from an actual user, for the GET endpoints
+def require_user_row(func):
+    """
+    Decorator that requires the user to be authenticated with a valid API key.
+
+    Unlike require_user, the user is read with a Core statement (see
+    reads.py), for the read-only resources which only need its id.
+
+    Args:
+        func (callable): The function to be decorated.
+
+    Returns:
+        callable: The decorated function, with the row of the user
+        (id, username and email) as "api_key_user".
+
+    Raises:
+        Unauthorized: If the user is not authenticated or the API key is invalid.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            key_hash = ApiKey.key_hash(request.headers.get("Api-key").strip())
+        except Exception as exc:
+            return Response("Incorrect api key.", status=401)
+        user = reads.api_key_user(key_hash)
+        if user:
+            kwargs["api_key_user"] = user
+            return func(*args, **kwargs)
+        return Response("Incorrect api key.", status=401)
+
+    return wrapper
@@ -0,0 +1,124 @@
+"""
+This module contains the expiry of the tentative holds.
+
+A hold is a reservation with an expires_at time. Until then it blocks its
+slot like any reservation; afterwards it is ignored by the overlap and
+availability checks and deleted by the sweep-holds job, which offers the
+freed intervals to the waitlist.
+
+The sweep is a periodic job of the scheduler (see scheduler.py), so with
+several processes only the leader of the job sweeps a database. A sweep
+deletes the expired holds with a single statement using the index on
+expires_at, then reads the next expiry time from the same index and
+returns it to the scheduler as the time of its next run. It never scans
+the reservation table. A new hold brings the next sweep of its process
+forward; the holds created by the other processes are picked up at the
+next sweep, at most HOLD_SWEEP_INTERVAL seconds later.
+
+Functions:
+- init_app(app): Registers the sweep of the holds.
+- schedule(expires_at): Brings the next sweep forward to the expiry of a new hold.
+- sweep_expired_holds(): Deletes the expired holds and offers their intervals to the waitlist.
+- delete_expired_holds(now, room_id=None, start_time=None, end_time=None): Deletes the expired holds.
+"""
+
+import logging
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func
+
+from . import db, scheduler
+from .models import Reservation, to_minutes
+from .quotas import release_usage
+
+logger = logging.getLogger(__name__)
+
+
+def init_app(app):
+    """
+    Register the sweep of the holds as a periodic job.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    scheduler.register_periodic_job(
+        app, "sweep-holds", app.config["HOLD_SWEEP_INTERVAL"], sweep_expired_holds
+    )
+
+
+def schedule(expires_at):
+    """
+    Bring the next sweep of the process forward to the expiry of a new hold.
+
+    Args:
+        expires_at (datetime): The expiry time of the hold.
+
+    Returns:
+        None
+    """
+    delay = (expires_at - datetime.now()).total_seconds()
+    scheduler.reschedule(current_app, "sweep-holds", delay)
+
+
+def sweep_expired_holds():
+    """
+    Delete the expired holds and offer their intervals to the waitlist.
+
+    Returns:
+        float: The seconds until the next expiry of a hold, None if there
+        is no hold.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .resources.reservation import promote_waitlist
+
+    now = datetime.now()
+    freed = (
+        db.session.query(
+            Reservation.room_id, Reservation.start_time, Reservation.end_time
+        )
+        .filter(Reservation.expires_at <= now)
+        .all()
+    )
+    if freed:
+        delete_expired_holds(now)
+        for room_id, start_time, end_time in set(freed):
+            promote_waitlist(room_id, start_time, end_time)
+        db.session.commit()
+        logger.info("Deleted %s expired holds", len(freed))
+    expires_at = db.session.query(func.min(Reservation.expires_at)).scalar()
+    db.session.commit()
+    if expires_at is None:
+        return None
+    return (expires_at - now).total_seconds()
+
+
+def delete_expired_holds(now, room_id=None, start_time=None, end_time=None):
+    """
+    Delete the expired holds with a single statement.
+
+    With a room and an interval, only the expired holds of that room
+    overlapping the interval are deleted, so that the slot of a hold
+    which is not swept yet can be booked again.
+
+    Args:
+        now (datetime): The current time.
+        room_id (int, optional): The room of the holds to delete.
+        start_time (datetime, optional): The start of the interval.
+        end_time (datetime, optional): The end of the interval.
+
+    Returns:
+        int: The number of deleted holds.
+    """
+    conditions = [Reservation.expires_at <= now]
+    if room_id is not None:
+        conditions += [
+            Reservation.room_id == room_id,
+            Reservation.end_minute >= to_minutes(start_time),
+            Reservation.start_minute <= to_minutes(end_time),
+        ]
+    release_usage(conditions)
+    return Reservation.query.filter(*conditions).delete(synchronize_session=False)
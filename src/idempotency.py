@@ -0,0 +1,255 @@
+"""
+This module contains the support for the Idempotency-Key request header.
+
+A client that retries a request after a network timeout sends the same
+Idempotency-Key header again. The first request with a key stores its
+response, and the retries get that stored response back without running
+the resource again, so no duplicate user or reservation is created.
+
+Keys are scoped by method, path and authenticated user, and they expire
+after IDEMPOTENCY_TTL seconds. Expired keys are deleted by a background job.
+
+Only the headers of _STORED_HEADERS are stored with the response, never
+the credentials. The retry of a user creation gets the id of the user and
+a new API key, which replaces the one the client never received.
+
+Functions:
+- init_app(app): Registers the purge job of the expired keys.
+- idempotent(func): Decorator that makes a resource method honour the Idempotency-Key header.
+- purge_expired_keys(): Deletes the expired keys from the database.
+"""
+
+import hashlib
+import json
+import time
+from functools import wraps
+
+from flask import Response, current_app, request
+from sqlalchemy.exc import IntegrityError
+
+from . import db, scheduler, tenancy
+from .models import ApiKey, IdempotencyKey
+
+# Headers replayed with a stored response, content-length is recomputed by werkzeug
+_STORED_HEADERS = {"content-type", "location", "user_id", "reservation_id"}
+# Headers stored without their value, a new API key is issued on replay
+_REISSUED_HEADERS = {"api_key"}
+
+
+def init_app(app):
+    """
+    Register the purge job of the expired keys.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    scheduler.register_periodic_job(
+        app,
+        "idempotency-purge",
+        app.config["IDEMPOTENCY_PURGE_INTERVAL"],
+        purge_expired_keys,
+    )
+
+
+def purge_expired_keys():
+    """
+    Delete the expired keys with a single statement using the expiry index.
+
+    Returns:
+        int: The number of deleted keys.
+    """
+    deleted = IdempotencyKey.query.filter(
+        IdempotencyKey.expires_at <= int(time.time())
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def idempotent(func):
+    """
+    Decorator that makes a resource method honour the Idempotency-Key header.
+
+    Requests without the header are not affected. When it is placed below
+    require_user or require_api_key, the key is also scoped to the
+    authenticated user.
+
+    Args:
+        func (callable): The function to be decorated.
+
+    Returns:
+        callable: The decorated function.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get("Idempotency-Key")
+        if header is None:
+            return func(*args, **kwargs)
+        header = header.strip()
+        if not header or len(header) > 255:
+            return Response("Invalid Idempotency-Key header", status=400)
+
+        user = kwargs.get("api_key_user")
+        api_key = kwargs.get("api_key")
+        owner = user.id if user else api_key.user_id if api_key else ""
+        scope = f"{request.method} {request.path} {owner} {header}"
+        key = hashlib.sha256(scope.encode()).digest()
+        # The query string is part of the request, for example the filters
+        # of a bulk cancellation
+        fingerprint = hashlib.sha256(
+            request.query_string + b"\n" + request.get_data()
+        ).digest()
+
+        response = _claim_key(key, fingerprint)
+        if response is not None:
+            return response
+
+        try:
+            response = func(*args, **kwargs)
+        except Exception:
+            db.session.rollback()
+            _release_key(key)
+            raise
+
+        if isinstance(response, Response) and response.status_code < 500:
+            _store_response(key, response)
+        else:
+            _release_key(key)
+        return response
+
+    return wrapper
+
+
+def _claim_key(key, fingerprint):
+    """
+    Claim a key for the current request, or return the response stored for it.
+
+    Args:
+        key (bytes): The digest of the scope and the header.
+        fingerprint (bytes): The digest of the request body.
+
+    Returns:
+        Response: The stored response or an error response if the key cannot be
+        used, None if the key was claimed by the current request.
+    """
+    now = int(time.time())
+    record = db.session.get(IdempotencyKey, key)
+    if record is not None and record.expires_at > now:
+        if record.fingerprint != fingerprint:
+            return Response(
+                "The Idempotency-Key was already used with a different request.",
+                status=422,
+            )
+        if record.status is None:
+            return Response(
+                "A request with the same Idempotency-Key is still being processed.",
+                status=409,
+            )
+        return _replay(record)
+
+    if record is not None:
+        db.session.delete(record)
+    db.session.add(
+        IdempotencyKey(
+            key=key,
+            fingerprint=fingerprint,
+            expires_at=now + current_app.config["IDEMPOTENCY_LOCK_TIMEOUT"],
+        )
+    )
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return Response(
+            "A request with the same Idempotency-Key is still being processed.",
+            status=409,
+        )
+    return None
+
+
+def _store_response(key, response):
+    """
+    Store the response of the request that claimed the key.
+
+    Args:
+        key (bytes): The digest of the scope and the header.
+        response (Response): The response to store.
+
+    Returns:
+        None
+    """
+    record = db.session.get(IdempotencyKey, key)
+    if record is None:
+        return
+    record.status = response.status_code
+    record.headers = json.dumps(
+        [
+            [name, value if name.lower() in _STORED_HEADERS else None]
+            for name, value in response.headers.items()
+            if name.lower() in _STORED_HEADERS | _REISSUED_HEADERS
+        ]
+    )
+    record.body = response.get_data()
+    record.expires_at = int(time.time()) + current_app.config["IDEMPOTENCY_TTL"]
+    db.session.commit()
+
+
+def _release_key(key):
+    """
+    Delete the key claimed by the current request so the request can be retried.
+
+    Args:
+        key (bytes): The digest of the scope and the header.
+
+    Returns:
+        None
+    """
+    IdempotencyKey.query.filter_by(key=key).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _replay(record):
+    """
+    Build a response from a stored record.
+
+    Args:
+        record (IdempotencyKey): The completed record.
+
+    Returns:
+        Response: The stored response, marked with the Idempotent-Replayed header.
+    """
+    response = Response(record.body, status=record.status)
+    response.headers.clear()
+    headers = json.loads(record.headers)
+    for name, value in headers:
+        if value is None:
+            value = _reissue_api_key(dict(headers).get("user_id"))
+            if value is None:
+                continue
+        response.headers.add(name, value)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _reissue_api_key(user_id):
+    """
+    Replace the API key of a user created by a replayed request with a new one.
+
+    Args:
+        user_id (str): The id of the user, from the stored response.
+
+    Returns:
+        str: The new token, None if the user no longer exists.
+    """
+    api_key = (
+        ApiKey.query.filter_by(user_id=user_id, admin=False).order_by(ApiKey.id).first()
+    )
+    if api_key is None:
+        return None
+    token = tenancy.tenant_token(ApiKey.create_token())
+    api_key.key = ApiKey.key_hash(token)
+    db.session.commit()
+    return token
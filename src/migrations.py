@@ -0,0 +1,394 @@
+"""
+This module contains the schema migrations of an existing database.
+
+db.create_all only creates the missing tables, it never changes the
+existing ones. The migrations are applied in order, and the number of
+the applied ones is kept in the SQLite user_version pragma. Every
+migration is also idempotent, so that it can run on a database created
+by db.create_all with the current models. The databases of the tenants
+(see tenancy.py) are migrated when their engine is opened.
+
+The missing tables are created first, then the pending migrations run,
+all in one transaction: pysqlite commits before every DDL statement on
+its own, so the transaction is begun and ended explicitly, and a failed
+migration leaves the database as it was.
+
+Run them with:
+
+    flask --app src.api migrate-db
+
+Functions:
+- init_app(app): Adds the migrate-db command to the application.
+- migrate(engine): Applies the migrations which are not applied yet.
+- columns(connection, table): Gets the column names of a table.
+- rebuild_table(connection, table, where=None): Recreates a table with the definition of its model.
+- add_epoch_minutes(connection): Adds and fills the epoch minute columns of the reservations.
+- add_usage_counters(connection): Creates and fills the weekly usage counters of the users.
+- add_job_locks(connection): Creates the lock rows of the scheduled jobs.
+- add_catalog_versions(connection): Creates the versions of the cached catalogs.
+- add_room_search(connection): Adds the location and the attributes of the rooms.
+- add_reservation_holds(connection): Adds the hold expiry column of the reservations.
+- add_reservation_autoincrement(connection): Stops the reuse of the ids of the reservations.
+- add_api_key_cascade(connection): Makes the deletes of the users cascade to their API keys.
+"""
+
+import logging
+
+import click
+from sqlalchemy.schema import CreateTable
+
+from . import db
+from .models import (
+    ApiKey,
+    CatalogVersion,
+    JobLock,
+    Reservation,
+    ReservationHistory,
+    RoomAttribute,
+    UserWeekUsage,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def init_app(app):
+    """
+    Add the migrate-db command to the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+
+    @app.cli.command("migrate-db")
+    def migrate_db_command():
+        """Apply the pending migrations of the database and of every tenant."""
+        version = migrate(db.engine)
+        click.echo(f"Database schema at version {version}.")
+        engines = app.extensions["tenant_engines"]
+        for tenant in app.config["TENANTS"]:
+            # Opening the engine of a tenant creates and migrates its schema
+            version = migrate(engines.get(tenant))
+            click.echo(f"Database schema of {tenant} at version {version}.")
+
+
+def columns(connection, table):
+    """
+    Get the column names of a table.
+
+    Args:
+        connection (Connection): The database connection.
+        table (str): The name of the table.
+
+    Returns:
+        set: The column names, empty if the table does not exist.
+    """
+    rows = connection.exec_driver_sql(f"PRAGMA table_info({table})")
+    return {row[1] for row in rows}
+
+
+def rebuild_table(connection, table, where=None):
+    """
+    Recreate a table with the definition of its model, keeping its rows.
+
+    SQLite cannot alter the constraints of a table, so a new table is
+    created, the rows are copied, and it replaces the old one, with the
+    foreign keys off (see migrate). The indexes of the model are created
+    again.
+
+    Args:
+        connection (Connection): The database connection.
+        table (Table): The table of the model.
+        where (str, optional): The SQL condition of the copied rows.
+
+    Returns:
+        None
+    """
+    name = table.name
+    ddl = str(CreateTable(table).compile(connection))
+    connection.exec_driver_sql(
+        ddl.replace(f"CREATE TABLE {name} ", f"CREATE TABLE {name}_new ", 1)
+    )
+    copied = ", ".join(
+        f'"{column}"' for column in table.columns.keys() if column in columns(connection, name)
+    )
+    connection.exec_driver_sql(
+        f"INSERT INTO {name}_new ({copied}) SELECT {copied} FROM {name}"
+        + (f" WHERE {where}" if where else "")
+    )
+    connection.exec_driver_sql(f"DROP TABLE {name}")
+    connection.exec_driver_sql(f"ALTER TABLE {name}_new RENAME TO {name}")
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+    if connection.exec_driver_sql(f"PRAGMA foreign_key_check({name})").first():
+        raise RuntimeError(f"The rows of {name} break its foreign keys.")
+
+
+def table_sql(connection, table):
+    """
+    Get the CREATE TABLE statement of a table, None if it does not exist.
+    """
+    return connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).scalar()
+
+
+def add_epoch_minutes(connection):
+    """
+    Add the start_minute and end_minute columns of the reservations and fill them.
+
+    The minutes are computed by SQLite from the stored datetimes, in a
+    single UPDATE, the same way as models.to_minutes.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        None
+    """
+    existing = columns(connection, "reservation")
+    if not existing:
+        return
+    for column in ("start_minute", "end_minute"):
+        if column not in existing:
+            connection.exec_driver_sql(
+                f"ALTER TABLE reservation ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+            )
+    connection.exec_driver_sql(
+        "UPDATE reservation SET"
+        " start_minute = CAST(strftime('%s', start_time) AS INTEGER) / 60,"
+        " end_minute = CAST(strftime('%s', end_time) AS INTEGER) / 60"
+    )
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_reservation_end_time")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_reservation_end_minute"
+        " ON reservation (end_minute)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_reservation_room_end_start"
+        " ON reservation (room_id, end_minute, start_minute)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_reservation_user_start"
+        " ON reservation (user_id, start_minute)"
+    )
+
+
+def add_usage_counters(connection):
+    """
+    Create the weekly reservation and minute counters of the users and compute them from the reservations.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        None
+    """
+    if not columns(connection, "reservation"):
+        return
+    UserWeekUsage.__table__.create(connection, checkfirst=True)
+    connection.exec_driver_sql("DELETE FROM user_week_usage")
+    # The week of a minute, see models.week_of
+    connection.exec_driver_sql(
+        "INSERT INTO user_week_usage (user_id, week, minutes, reservations)"
+        " SELECT user_id, (start_minute / 1440 + 3) / 7 AS week,"
+        " SUM(end_minute - start_minute), COUNT(*) FROM reservation"
+        " GROUP BY user_id, week"
+    )
+    if not columns(connection, "reservation_history"):
+        return
+    connection.exec_driver_sql(
+        "INSERT INTO user_week_usage (user_id, week, minutes, reservations)"
+        " SELECT user_id, (CAST(strftime('%s', start_time) AS INTEGER) / 60 / 1440 + 3) / 7"
+        " AS week, SUM(CAST(strftime('%s', end_time) AS INTEGER) / 60"
+        " - CAST(strftime('%s', start_time) AS INTEGER) / 60), COUNT(*)"
+        " FROM reservation_history GROUP BY user_id, week"
+        " ON CONFLICT (user_id, week) DO UPDATE SET minutes = minutes + excluded.minutes,"
+        " reservations = reservations + excluded.reservations"
+    )
+
+
+def add_job_locks(connection):
+    """
+    Create the table of the lock rows of the scheduled jobs, see scheduler.py.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        None
+    """
+    JobLock.__table__.create(connection, checkfirst=True)
+
+
+def add_catalog_versions(connection):
+    """
+    Create the table of the versions of the cached catalogs, see room_catalog.py.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        None
+    """
+    CatalogVersion.__table__.create(connection, checkfirst=True)
+
+
+def add_room_search(connection):
+    """
+    Add the location column of the rooms and the table of the room attributes.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        None
+    """
+    existing = columns(connection, "room")
+    if not existing:
+        return
+    if "location" not in existing:
+        connection.exec_driver_sql("ALTER TABLE room ADD COLUMN location VARCHAR(100)")
+    RoomAttribute.__table__.create(connection, checkfirst=True)
+
+
+def add_reservation_holds(connection):
+    """
+    Add the expires_at column of the tentative holds and its index.
+
+    The existing reservations are confirmed ones, their expiry stays NULL.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        None
+    """
+    existing = columns(connection, "reservation")
+    if not existing:
+        return
+    if "expires_at" not in existing:
+        connection.exec_driver_sql("ALTER TABLE reservation ADD COLUMN expires_at DATETIME")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_reservation_expires_at ON reservation (expires_at)"
+    )
+
+
+def add_reservation_autoincrement(connection):
+    """
+    Make the ids of the reservations AUTOINCREMENT.
+
+    Without it, SQLite reuses the ids of the deleted and archived
+    reservations, which then collide with the archived rows keeping them.
+    The sequence starts after the largest id of both tables, and the
+    reservations already sharing the id of an archived one get a new id.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        None
+    """
+    sql = table_sql(connection, "reservation")
+    if sql is None:
+        return
+    if "AUTOINCREMENT" not in sql.upper():
+        rebuild_table(connection, Reservation.__table__)
+    if not columns(connection, "reservation_history"):
+        ReservationHistory.__table__.create(connection)
+    connection.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'reservation'")
+    connection.exec_driver_sql(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'reservation', MAX("
+        " (SELECT COALESCE(MAX(id), 0) FROM reservation),"
+        " (SELECT COALESCE(MAX(id), 0) FROM reservation_history))"
+    )
+    reused = connection.exec_driver_sql(
+        "SELECT id FROM reservation WHERE id IN (SELECT id FROM reservation_history)"
+    ).scalars().all()
+    for reservation_id in reused:
+        connection.exec_driver_sql(
+            "UPDATE reservation SET id ="
+            " (SELECT seq + 1 FROM sqlite_sequence WHERE name = 'reservation')"
+            " WHERE id = ?",
+            (reservation_id,),
+        )
+        connection.exec_driver_sql(
+            "UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'reservation'"
+        )
+
+
+def add_api_key_cascade(connection):
+    """
+    Add ON DELETE CASCADE to the foreign key of the API keys to their user.
+
+    The users are deleted with passive deletes, which rely on the database
+    cascades. The API keys left by the users deleted before it are dropped.
+    The other foreign keys to the users and rooms were created with their
+    cascade.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        None
+    """
+    foreign_keys = connection.exec_driver_sql("PRAGMA foreign_key_list(api_key)").all()
+    # The on_delete column of the pragma
+    if not foreign_keys or all(row[6] == "CASCADE" for row in foreign_keys):
+        return
+    rebuild_table(
+        connection, ApiKey.__table__, where='user_id IN (SELECT id FROM "user")'
+    )
+
+
+# Never reorder nor remove a migration, the user_version is an index in this list.
+MIGRATIONS = [
+    add_epoch_minutes,
+    add_usage_counters,
+    add_job_locks,
+    add_catalog_versions,
+    add_room_search,
+    add_reservation_holds,
+    add_reservation_autoincrement,
+    add_api_key_cascade,
+]
+
+
+def migrate(engine):
+    """
+    Create the missing tables and apply the migrations which are not
+    applied yet, in one transaction.
+
+    Args:
+        engine (Engine): The engine of the database.
+
+    Returns:
+        int: The schema version of the database.
+    """
+    with engine.connect() as connection:
+        # The driver no longer commits before the DDL, the transaction is ours
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+        if version >= len(MIGRATIONS):
+            return version
+        # The table rebuilds need it, and it cannot change in a transaction
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        try:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                db.metadata.create_all(connection)
+                for number, migration in enumerate(
+                    MIGRATIONS[version:], start=version + 1
+                ):
+                    logger.info("Applying migration %s: %s", number, migration.__name__)
+                    migration(connection)
+                    connection.exec_driver_sql(f"PRAGMA user_version = {number}")
+            except BaseException:
+                connection.exec_driver_sql("ROLLBACK")
+                raise
+            connection.exec_driver_sql("COMMIT")
+        finally:
+            connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+    return len(MIGRATIONS)
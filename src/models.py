@@ -1,22 +1,68 @@
 """
 This module contains the database models for the reservation system.
 
+It also defines the conversion between datetimes and epoch minutes:
+- to_minutes(value): Converts a datetime to the number of minutes since 1970-01-01.
+- from_minutes(value): Converts a number of minutes since 1970-01-01 to a datetime.
+
 It defines the following classes:
 - User: Represents a user in the reservation system.
 - Room: Represents a room in the reservation system.
 - Reservation: Represents a reservation made by a user for a specific room.
 - ApiKey: Represents an API key in the reservation system.
+- IdempotencyKey: Represents a stored response for an Idempotency-Key header.
+- WaitlistEntry: Represents a user waiting for a room in a specific interval.
+- ReservationHistory: Represents a past reservation moved out of the reservation table.
+- UserWeekUsage: Represents the reservations and booked minutes of a user in a week.
+- JobLock: Represents the lease of a scheduled job by a process.
+
+The weekly usage counters are maintained by mapper events, with
+adjust_usage(connection, user_id, week, minutes, reservations) and week_of(minute).
 """
 
 import hashlib
 import secrets
+from datetime import datetime, timedelta
 
-from sqlalchemy import event
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.engine import Engine
 
 from . import db
 
 
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_minutes(value):
+    """
+    Convert a datetime to the number of minutes since 1970-01-01.
+
+    The datetimes of the system are naive, they are converted as they are.
+    Seconds are truncated.
+
+    Args:
+        value (datetime): The datetime to convert.
+
+    Returns:
+        int: The number of minutes since the epoch.
+    """
+    return int((value - EPOCH).total_seconds()) // 60
+
+
+def from_minutes(value):
+    """
+    Convert a number of minutes since 1970-01-01 to a datetime.
+
+    Args:
+        value (int): The number of minutes since the epoch.
+
+    Returns:
+        datetime: The corresponding naive datetime.
+    """
+    return EPOCH + timedelta(minutes=value)
+
+
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, _connection_record=None):
     """
@@ -38,12 +84,17 @@ class User(db.Model):
     """
     Represents a user in the reservation system.
 
+    Deleting a user deletes its reservations, API keys and waitlist entries
+    through the ON DELETE CASCADE of their foreign keys: the relationships
+    use passive deletes, so the ORM never loads the children to delete them.
+
     Attributes:
         id (int): The unique identifier for the user.
         username (str): The username of the user.
         email (str): The email address of the user.
         reservations (list): A list of reservations made by the user.
         api_keys (list): A list of API keys associated with the user.
+        waitlist_entries (list): A list of the waitlist entries of the user.
     """
 
     id = db.Column(db.Integer, primary_key=True)
@@ -51,10 +102,22 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
 
     reservations = db.relationship(
-        "Reservation", back_populates="user", cascade="all, delete-orphan"
+        "Reservation",
+        back_populates="user",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     api_keys = db.relationship(
-        "ApiKey", back_populates="user", cascade="all, delete-orphan"
+        "ApiKey",
+        back_populates="user",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    waitlist_entries = db.relationship(
+        "WaitlistEntry",
+        back_populates="user",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     def serialize(self):
@@ -73,21 +136,45 @@ class Room(db.Model):
     """
     Represents a room in the reservation system.
 
+    Like for users, the reservations and waitlist entries of a deleted room
+    are deleted by the database. The rooms are searched in the room catalog
+    (see room_catalog.py), so the search columns have no index.
+
     Attributes:
         id (int): The unique identifier for the room.
         room_name (str): The name of the room.
         capacity (int): The maximum capacity of the room.
         max_time (int): The maximum reservation time in minutes.
+        location (str): The building or floor of the room.
+        attributes (list): The equipment of the room, see RoomAttribute.
         reservations (list): The list of reservations associated with the room.
+        waitlist_entries (list): The list of waitlist entries for the room.
     """
 
     id = db.Column(db.Integer, primary_key=True)
     room_name = db.Column(db.String(100), unique=True, nullable=False)
     capacity = db.Column(db.Integer, nullable=False)
     max_time = db.Column(db.Integer, nullable=False, default=180)
+    location = db.Column(db.String(100), nullable=True)
+
+    attributes = db.relationship(
+        "RoomAttribute",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="RoomAttribute.name",
+    )
 
     reservations = db.relationship(
-        "Reservation", back_populates="room", cascade="all, delete-orphan"
+        "Reservation",
+        back_populates="room",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    waitlist_entries = db.relationship(
+        "WaitlistEntry",
+        back_populates="room",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     def serialize(self):
@@ -102,21 +189,51 @@ class Room(db.Model):
             "room_name": self.room_name,
             "capacity": self.capacity,
             "max_time": self.max_time,
+            "location": self.location,
+            "attributes": [attribute.name for attribute in self.attributes],
         }
         return doc
 
 
+class RoomAttribute(db.Model):
+    # pylint: disable=too-few-public-methods
+    """
+    Represents an equipment of a room, like "projector" or "whiteboard".
+
+    The rooms are searched by their attributes in the room catalog (see
+    room_catalog.py), which reads the whole table when it loads.
+
+    Attributes:
+        room_id (int): The ID of the room.
+        name (str): The name of the attribute.
+    """
+
+    room_id = db.Column(
+        db.Integer, db.ForeignKey("room.id", ondelete="CASCADE"), primary_key=True
+    )
+    name = db.Column(db.String(64), primary_key=True)
+
+
 class Reservation(db.Model):
     # pylint: disable=too-few-public-methods
     """
     Represents a reservation made by a user for a specific room.
 
+    SQLite stores the datetimes as ISO text, so range comparisons on them
+    are string comparisons. The start and end times are also stored as
+    integer minutes since the epoch, kept in sync by the attribute events
+    below, and the overlap, availability and listing queries use these.
+
     Attributes:
         id (int): The unique identifier for the reservation.
         room_id (int): The ID of the room being reserved.
         user_id (int): The ID of the user making the reservation.
         start_time (datetime): The start time of the reservation.
         end_time (datetime): The end time of the reservation.
+        start_minute (int): The start time in minutes since the epoch.
+        end_minute (int): The end time in minutes since the epoch.
+        expires_at (datetime): The expiry of a tentative hold, None once the reservation
+        is confirmed. An expired hold no longer blocks the slot.
         room (Room): The room object associated with the reservation.
         user (User): The user object associated with the reservation.
     """
@@ -130,8 +247,19 @@ class Reservation(db.Model):
     )
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=False)
-
-    __table_args__ = (db.UniqueConstraint("room_id", "start_time", "end_time"),)
+    start_minute = db.Column(db.Integer, nullable=False)
+    end_minute = db.Column(db.Integer, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("room_id", "start_time", "end_time"),
+        db.Index(
+            "ix_reservation_room_end_start", "room_id", "end_minute", "start_minute"
+        ),
+        db.Index("ix_reservation_user_start", "user_id", "start_minute"),
+        # The ids of the archived reservations are never reused
+        {"sqlite_autoincrement": True},
+    )
 
     room = db.relationship("Room", back_populates="reservations")
     user = db.relationship("User", back_populates="reservations")
@@ -149,9 +277,53 @@ class Reservation(db.Model):
             "room": self.room.room_name,
             "date": self.start_time.date().isoformat(),
             "time-span": f"{self.start_time.time()} - {self.end_time.time()}",
+            "status": "confirmed" if self.expires_at is None else "held",
         }
+        if self.expires_at is not None:
+            doc["hold-expires"] = self.expires_at.isoformat(timespec="seconds")
         return doc
 
+    def is_active(self, now):
+        """
+        Check if the reservation blocks its slot, i.e. it is confirmed or an unexpired hold.
+
+        Args:
+            now (datetime): The current time.
+
+        Returns:
+            bool: True if the reservation is active, False if it is an expired hold.
+        """
+        return self.expires_at is None or self.expires_at > now
+
+    @staticmethod
+    def active_clause(now):
+        """
+        SQL condition matching the active reservations, see is_active.
+
+        Args:
+            now (datetime): The current time.
+
+        Returns:
+            ColumnElement: The condition, to be used in a filter.
+        """
+        return Reservation.expires_at.is_(None) | (Reservation.expires_at > now)
+
+
+@event.listens_for(Reservation.start_time, "set")
+def set_start_minute(target, value, _oldvalue, _initiator):
+    """
+    Keep start_minute in sync with start_time.
+    """
+    target.start_minute = to_minutes(value)
+
+
+@event.listens_for(Reservation.end_time, "set")
+def set_end_minute(target, value, _oldvalue, _initiator):
+    """
+    Keep end_minute in sync with end_time.
+    """
+    target.end_minute = to_minutes(value)
+
 
 # Got the code from
 # https://lovelace.oulu.fi/ohjelmoitava-web/ohjelmoitava-web/implementing-rest-apis-with-flask/#validating-keys
@@ -175,7 +347,9 @@ class ApiKey(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(32), nullable=False, unique=True)
     admin = db.Column(db.Boolean, default=False)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False
+    )
 
     user = db.relationship("User", back_populates="api_keys")
 
@@ -201,3 +375,300 @@ class ApiKey(db.Model):
             str: A URL-safe token.
         """
         return secrets.token_urlsafe()
+
+
+class IdempotencyKey(db.Model):
+    # pylint: disable=too-few-public-methods
+    """
+    Represents a stored response for an Idempotency-Key header.
+
+    The row is inserted without a status when the first request with the key
+    starts, and completed with the response once it finishes. Rows are kept
+    compact: the key and the request fingerprint are SHA-256 digests and the
+    expiry is an integer unix timestamp, indexed for the purge.
+
+    Attributes:
+        key (bytes): The digest of the request scope and the Idempotency-Key header.
+        fingerprint (bytes): The digest of the request body.
+        status (int): The status code of the stored response, None while in flight.
+        headers (str): The headers of the stored response as a JSON list of pairs.
+        body (bytes): The body of the stored response.
+        expires_at (int): The unix timestamp after which the row can be purged.
+    """
+
+    key = db.Column(db.LargeBinary(32), primary_key=True)
+    fingerprint = db.Column(db.LargeBinary(32), nullable=False)
+    status = db.Column(db.Integer)
+    headers = db.Column(db.Text)
+    body = db.Column(db.LargeBinary)
+    expires_at = db.Column(db.Integer, nullable=False, index=True)
+
+
+class WaitlistEntry(db.Model):
+    # pylint: disable=too-few-public-methods
+    """
+    Represents a user waiting for a room in a specific interval.
+
+    When the interval is freed, the entry is turned into a reservation.
+    The index on (room_id, start_time) is the interval index used to find
+    the entries touching a freed interval: as no entry is longer than the
+    max_time of its room, their start times are in a bounded range.
+
+    Attributes:
+        id (int): The unique identifier for the entry.
+        room_id (int): The ID of the wanted room.
+        user_id (int): The ID of the waiting user.
+        start_time (datetime): The start time of the wanted interval.
+        end_time (datetime): The end time of the wanted interval.
+        created_at (datetime): The time the user joined the waitlist, which gives the order.
+        room (Room): The room object associated with the entry.
+        user (User): The user object associated with the entry.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    room_id = db.Column(
+        db.Integer, db.ForeignKey("room.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False
+    )
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "room_id", "start_time", "end_time"),
+        db.Index("ix_waitlist_entry_room_start", "room_id", "start_time"),
+    )
+
+    room = db.relationship("Room", back_populates="waitlist_entries")
+    user = db.relationship("User", back_populates="waitlist_entries")
+
+    def serialize(self):
+        """
+        Serialize the waitlist entry object into a dictionary.
+
+        Returns:
+            dict: A dictionary representation of the waitlist entry object.
+        """
+        doc = {
+            "id": self.id,
+            "room": self.room.room_name,
+            "date": self.start_time.date().isoformat(),
+            "time-span": f"{self.start_time.time()} - {self.end_time.time()}",
+        }
+        return doc
+
+
+class ReservationHistory(db.Model):
+    # pylint: disable=too-few-public-methods
+    """
+    Represents a past reservation moved out of the reservation table.
+
+    The reservations ending before the archive horizon are moved here in
+    batches by the archive job (see archive.py), so that the overlap and
+    availability checks and the listings only work over the current data.
+    The rows keep the id they had in the reservation table, whose ids are
+    AUTOINCREMENT so that they are never given to a new reservation.
+
+    Attributes:
+        id (int): The identifier the reservation had.
+        room_id (int): The ID of the reserved room.
+        user_id (int): The ID of the user who made the reservation.
+        start_time (datetime): The start time of the reservation.
+        end_time (datetime): The end time of the reservation.
+        archived_at (datetime): The time the reservation was archived.
+        room (Room): The room object associated with the reservation.
+        user (User): The user object associated with the reservation.
+    """
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    room_id = db.Column(
+        db.Integer, db.ForeignKey("room.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("user.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    room = db.relationship("Room")
+    user = db.relationship("User")
+
+    def serialize(self):
+        """
+        Serialize the archived reservation into a dictionary, like a reservation.
+
+        Returns:
+            dict: A dictionary representation of the archived reservation.
+        """
+        doc = {
+            "id": self.id,
+            "user": self.user.username,
+            "room": self.room.room_name,
+            "date": self.start_time.date().isoformat(),
+            "time-span": f"{self.start_time.time()} - {self.end_time.time()}",
+            "status": "archived",
+        }
+        return doc
+
+
+def week_of(minute):
+    """
+    Get the week of an epoch minute, weeks starting on Monday.
+
+    Args:
+        minute (int): The number of minutes since the epoch.
+
+    Returns:
+        int: The number of weeks since the week of 1970-01-01.
+    """
+    # 1970-01-01 was a Thursday
+    return (minute // (24 * 60) + 3) // 7
+
+
+class UserWeekUsage(db.Model):
+    # pylint: disable=too-few-public-methods
+    """
+    Represents the reservations and booked minutes of a user in a week.
+
+    A reservation counts in the week it starts. Archiving a past
+    reservation keeps it in the counters.
+
+    Attributes:
+        user_id (int): The user.
+        week (int): The week, see week_of.
+        minutes (int): The booked minutes of the user in the week.
+        reservations (int): The reservations of the user starting in the week.
+    """
+
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True
+    )
+    week = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+    reservations = db.Column(db.Integer, nullable=False, default=0)
+
+
+def adjust_usage(connection, user_id, week, minutes, reservations=0):
+    """
+    Add to the counters of a user in a week with an upsert.
+
+    Args:
+        connection (Connection): The connection of the transaction.
+        user_id (int): The user.
+        week (int): The week of the reservations.
+        minutes (int): The change of the booked minutes of the week.
+        reservations (int): The change of the number of reservations of the week.
+
+    Returns:
+        None
+    """
+    if minutes or reservations:
+        table = UserWeekUsage.__table__
+        statement = sqlite_insert(table).values(
+            user_id=user_id, week=week, minutes=minutes, reservations=reservations
+        )
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=["user_id", "week"],
+                set_={
+                    "minutes": table.c.minutes + minutes,
+                    "reservations": table.c.reservations + reservations,
+                },
+            )
+        )
+
+
+@event.listens_for(Reservation, "after_insert")
+def count_inserted_reservation(_mapper, connection, target):
+    """
+    Count a new reservation in the usage of its user.
+    """
+    adjust_usage(
+        connection,
+        target.user_id,
+        week_of(target.start_minute),
+        target.end_minute - target.start_minute,
+        1,
+    )
+
+
+@event.listens_for(Reservation, "after_update")
+def count_updated_reservation(_mapper, connection, target):
+    """
+    Move a modified reservation and its minutes to its new week.
+    """
+    state = inspect(target)
+    start = state.attrs.start_minute.history
+    end = state.attrs.end_minute.history
+    if not start.has_changes() and not end.has_changes():
+        return
+    old_start = start.deleted[0] if start.deleted else target.start_minute
+    old_end = end.deleted[0] if end.deleted else target.end_minute
+    adjust_usage(
+        connection, target.user_id, week_of(old_start), old_start - old_end, -1
+    )
+    adjust_usage(
+        connection,
+        target.user_id,
+        week_of(target.start_minute),
+        target.end_minute - target.start_minute,
+        1,
+    )
+
+
+@event.listens_for(Reservation, "after_delete")
+def count_deleted_reservation(_mapper, connection, target):
+    """
+    Remove a deleted reservation from the usage of its user.
+    """
+    adjust_usage(
+        connection,
+        target.user_id,
+        week_of(target.start_minute),
+        target.start_minute - target.end_minute,
+        -1,
+    )
+
+
+class JobLock(db.Model):
+    # pylint: disable=too-few-public-methods
+    """
+    Represents the lease of a scheduled job by a process.
+
+    The process holding an unexpired lease is the leader of the job: it is
+    the only one running it, see scheduler.py. It renews the lease at every
+    run, and another process takes it over once it expires.
+
+    Attributes:
+        name (str): The name of the job.
+        owner (str): The host and process id of the leader.
+        expires_at (float): The unix timestamp at which the lease expires.
+    """
+
+    name = db.Column(db.String(64), primary_key=True)
+    owner = db.Column(db.String(128), nullable=False)
+    expires_at = db.Column(db.Float, nullable=False)
+
+
+class CatalogVersion(db.Model):
+    # pylint: disable=too-few-public-methods
+    """
+    Represents the version of a cached catalog of the database.
+
+    The version of the "rooms" catalog is incremented in the transaction of
+    every change of the rooms, and tells the processes to reload their room
+    catalog, see room_catalog.py.
+
+    Attributes:
+        name (str): The name of the catalog.
+        version (int): The number of changes of the catalog.
+    """
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,205 @@
+"""
+This module contains the detector of the N+1 queries.
+
+Every statement run by the thread serving a request is counted by its SQL
+text. The statements are parametrized, so a statement run once per row of
+a list, like a lazy load of a relationship, always has the same text. When
+a statement runs N_PLUS_ONE_THRESHOLD times or more in one request, the
+request has an N+1 query: NPlusOneError is raised when the application is
+testing, and a warning is logged in debug mode. N_PLUS_ONE_MODE ("raise",
+"log" or "off") overrides this choice.
+
+count_queries() counts the statements of the current thread in a block of
+code, the query_budget fixture of the tests uses it. The write pipeline
+runs the operations of the requests in its own thread, it wraps them with
+bind_counters() so that their statements count for the request too.
+
+Classes:
+- NPlusOneError: Raised when a request repeats a statement.
+- QueryCounter: The statements run in a block of code.
+
+Functions:
+- init_app(app): Registers the detector on the requests of the application.
+- detection_mode(app): Gets what to do with the N+1 queries.
+- count_queries(): Context manager counting the statements of the current thread.
+- bind_counters(func): Counts the statements of func in the counters of the current thread.
+"""
+
+import collections
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Statements which are not queries of the application
+_SKIPPED_PREFIXES = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+class NPlusOneError(Exception):
+    """
+    Raised when a request repeats a statement, in tests.
+    """
+
+
+def init_app(app):
+    """
+    Register the detector on the requests of the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+
+    @app.before_request
+    def _count_request_queries():
+        if detection_mode(app) == "off":
+            return
+        counter = QueryCounter()
+        _counters().append(counter)
+        g.query_counter = counter
+
+    @app.after_request
+    def _check_request_queries(response):
+        counter = g.pop("query_counter", None)
+        if counter is None:
+            return response
+        _counters().remove(counter)
+        repeated = counter.repeated(app.config["N_PLUS_ONE_THRESHOLD"])
+        if repeated:
+            statement, count = repeated[0]
+            message = (
+                f"N+1 query in {request.method} {request.endpoint}: "
+                f"{count} times {' '.join(statement.split())}"
+            )
+            if detection_mode(app) == "raise":
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
+
+    @app.teardown_request
+    def _stop_counting(_exc):
+        counter = g.pop("query_counter", None)
+        if counter is not None:
+            _counters().remove(counter)
+
+
+def detection_mode(app):
+    """
+    Get what to do with the N+1 queries.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        str: "raise" when testing, "log" in debug mode, "off" otherwise,
+        unless N_PLUS_ONE_MODE is set.
+    """
+    if app.config["N_PLUS_ONE_MODE"]:
+        return app.config["N_PLUS_ONE_MODE"]
+    if app.testing:
+        return "raise"
+    if app.debug:
+        return "log"
+    return "off"
+
+
+@contextmanager
+def count_queries():
+    """
+    Context manager counting the statements run by the current thread.
+
+    Yields:
+        QueryCounter: The statements, filled until the end of the block.
+    """
+    counter = QueryCounter()
+    _counters().append(counter)
+    try:
+        yield counter
+    finally:
+        _counters().remove(counter)
+
+
+def bind_counters(func):
+    """
+    Count the statements of func, in whichever thread it runs, in the active counters of the current thread.
+
+    Args:
+        func (callable): The function, run later, possibly by another thread.
+
+    Returns:
+        callable: The wrapped function.
+    """
+    counters = list(_counters())
+    if not counters:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        active = _counters()
+        active.extend(counters)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            for counter in counters:
+                active.remove(counter)
+
+    return wrapper
+
+
+class QueryCounter:
+    """
+    The statements run in a block of code.
+
+    Attributes:
+        statements (list): The SQL text of every statement, in order.
+
+    Methods:
+        repeated(threshold): Gets the statements run threshold times or more.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    def repeated(self, threshold):
+        """
+        Get the statements run threshold times or more.
+
+        Args:
+            threshold (int): The number of runs of a repeated statement.
+
+        Returns:
+            list: The (statement, count) pairs, most repeated first.
+        """
+        counts = collections.Counter(self.statements)
+        return [(statement, count) for statement, count in counts.most_common() if count >= threshold]
+
+
+def _counters():
+    """
+    Get the active counters of the current thread.
+    """
+    if not hasattr(_local, "counters"):
+        _local.counters = []
+    return _local.counters
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(_conn, _cursor, statement, _parameters, _context, _executemany):
+    counters = getattr(_local, "counters", None)
+    if not counters or statement.lstrip().upper().startswith(_SKIPPED_PREFIXES):
+        return
+    for counter in counters:
+        counter.statements.append(statement)
@@ -0,0 +1,328 @@
+"""
+This module contains the on-demand profiling of the requests.
+
+An admin profiles a single request by sending it with the X-Profile
+header, or the profile query parameter, set to:
+- cprofile: The request runs under cProfile, and the profile is kept as
+  pstats text sorted by cumulative time.
+- sample: The stack of the request thread is sampled every
+  PROFILING_SAMPLE_INTERVAL_MS milliseconds, and the profile is kept as
+  collapsed stacks, the input format of flame graph tools.
+
+The flag is ignored when the Api-key of the request is not an admin key.
+The response gets an X-Profile-Id header, and the last PROFILING_MAX_PROFILES
+profiles of the process are served by the admin profile endpoints.
+
+With PROFILING_CONTINUOUS, the sampler also samples every request and
+aggregates the collapsed stacks by endpoint, to find the hot paths of
+production traffic. Sampling a thread only reads its current frame, so the
+cost is one walk of the stacks of the running requests per interval.
+
+Classes:
+- Sampler: Samples the stacks of the tracked threads.
+- ProfileStore: Keeps the last profiles of the process.
+
+Functions:
+- init_app(app): Registers the profiling of the requests of the application.
+- collapse(frame): Formats the stack of a frame as a collapsed stack.
+- format_collapsed(counts): Formats stack counts as collapsed stack lines.
+"""
+
+import collections
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+
+from flask import g, request
+
+from .decorators import is_admin_request
+
+KINDS = ("cprofile", "sample")
+
+
+def init_app(app):
+    """
+    Register the profiling of the requests of the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    store = ProfileStore(app.config["PROFILING_MAX_PROFILES"])
+    sampler = Sampler(app.config["PROFILING_SAMPLE_INTERVAL_MS"] / 1000)
+    continuous = app.config["PROFILING_CONTINUOUS"]
+    app.extensions["profiling"] = {"store": store, "sampler": sampler}
+
+    @app.before_request
+    def _start_profiling():
+        thread = threading.get_ident()
+        if continuous and request.endpoint:
+            sampler.track(thread, ("route", request.endpoint))
+
+        kind = request.headers.get("X-Profile") or request.args.get("profile")
+        if kind not in KINDS or not is_admin_request():
+            return
+        profile = {
+            "id": store.next_id(),
+            "kind": kind,
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "time": time.time(),
+            "start": time.perf_counter(),
+        }
+        if kind == "cprofile":
+            profile["profiler"] = cProfile.Profile()
+            profile["profiler"].enable()
+        else:
+            sampler.track(thread, ("profile", profile["id"]))
+        g.profile = profile
+
+    @app.after_request
+    def _finish_profiling(response):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            _finish(profile, store, sampler)
+            response.headers["X-Profile-Id"] = str(profile["id"])
+        return response
+
+    @app.teardown_request
+    def _stop_profiling(_exc):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            # The request failed before after_request
+            _finish(profile, store, sampler)
+        sampler.untrack(threading.get_ident())
+
+
+def _finish(profile, store, sampler):
+    """
+    Stop the profiler of a request and store its output.
+    """
+    duration = time.perf_counter() - profile.pop("start")
+    if profile["kind"] == "cprofile":
+        profiler = profile.pop("profiler")
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats()
+        profile["output"] = output.getvalue()
+    else:
+        sampler.untrack(threading.get_ident())
+        counts = sampler.pop(("profile", profile["id"]))
+        profile["samples"] = sum(counts.values())
+        profile["output"] = format_collapsed(counts)
+    profile["duration_ms"] = round(duration * 1000, 3)
+    store.add(profile)
+
+
+def collapse(frame):
+    """
+    Format the stack of a frame as a collapsed stack, outermost frame first.
+
+    Args:
+        frame (frame): The innermost frame.
+
+    Returns:
+        str: The functions of the stack as file:function, separated by ";".
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def format_collapsed(counts):
+    """
+    Format stack counts as collapsed stack lines, most sampled first.
+
+    Args:
+        counts (Counter): The number of samples of every collapsed stack.
+
+    Returns:
+        str: One "stack count" line per stack.
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class ProfileStore:
+    """
+    Keeps the last profiles of the process.
+
+    Attributes:
+        size (int): The number of profiles kept.
+
+    Methods:
+        next_id(): Gets the id of a new profile.
+        add(profile): Stores a finished profile.
+        get(profile_id): Gets a profile by id.
+        list(): Gets the descriptions of the profiles, newest first.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._ids = itertools.count(1)
+        self._profiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        """
+        Get the id of a new profile.
+
+        Returns:
+            int: The id.
+        """
+        return next(self._ids)
+
+    def add(self, profile):
+        """
+        Store a finished profile, dropping the oldest one when full.
+
+        Args:
+            profile (dict): The profile.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._profiles[profile["id"]] = profile
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id):
+        """
+        Get a profile by id.
+
+        Args:
+            profile_id (int): The id of the profile.
+
+        Returns:
+            dict: The profile, None if it is unknown or was dropped.
+        """
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self):
+        """
+        Get the descriptions of the profiles, newest first.
+
+        Returns:
+            list: The profiles without their output.
+        """
+        with self._lock:
+            return [
+                {key: value for key, value in profile.items() if key != "output"}
+                for profile in reversed(self._profiles.values())
+            ]
+
+
+class Sampler:
+    """
+    Samples the stacks of the tracked threads.
+
+    A single thread, started with the first tracked thread, reads the
+    current frame of every tracked thread each interval and counts its
+    collapsed stack under the key of the thread.
+
+    Attributes:
+        interval (float): The seconds between two samples.
+
+    Methods:
+        track(thread, key): Samples a thread under a key.
+        untrack(thread): Stops sampling a thread.
+        pop(key): Gets and forgets the counts of a key.
+        routes(): Gets the counts of the continuous samples, by endpoint.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._condition = threading.Condition()
+        # Keys of every tracked thread, a thread can be tracked under two keys
+        self._targets = collections.defaultdict(set)
+        self._counts = collections.defaultdict(collections.Counter)
+        self._pid = None
+
+    def track(self, thread, key):
+        """
+        Sample a thread under a key until it is untracked.
+
+        Args:
+            thread (int): The identifier of the thread.
+            key (tuple): The key counting the samples.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="sampler", daemon=True).start()
+            self._targets[thread].add(key)
+            self._condition.notify()
+
+    def untrack(self, thread):
+        """
+        Stop sampling a thread.
+
+        Args:
+            thread (int): The identifier of the thread.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            self._targets.pop(thread, None)
+
+    def pop(self, key):
+        """
+        Get and forget the counts of a key.
+
+        Args:
+            key (tuple): The key.
+
+        Returns:
+            Counter: The number of samples of every collapsed stack.
+        """
+        with self._condition:
+            return self._counts.pop(key, collections.Counter())
+
+    def routes(self):
+        """
+        Get the counts of the continuous samples, by endpoint.
+
+        Returns:
+            dict: The Counter of the collapsed stacks of every endpoint.
+        """
+        with self._condition:
+            return {
+                key[1]: collections.Counter(counts)
+                for key, counts in self._counts.items()
+                if key[0] == "route"
+            }
+
+    def _run(self):
+        """
+        Sample the tracked threads every interval, forever.
+        """
+        while True:
+            with self._condition:
+                while not self._targets:
+                    self._condition.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            with self._condition:
+                for thread, keys in self._targets.items():
+                    frame = frames.get(thread)
+                    if frame is None:
+                        continue
+                    stack = collapse(frame)
+                    for key in keys:
+                        self._counts[key][stack] += 1
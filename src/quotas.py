@@ -0,0 +1,106 @@
+"""
+This module contains the reservation quotas of the users.
+
+A user can have at most QUOTA_MAX_RESERVATIONS reservations (holds
+included) in the current and the coming weeks, and book at most
+QUOTA_MAX_WEEKLY_MINUTES minutes in a week. A quota set to None is not
+enforced. Both are read from the weekly counters of the user
+(UserWeekUsage), which are maintained in the transaction of every write,
+instead of counting the reservations of the user: the reservations of the
+past weeks drop out of the quota without a write, and those of the
+current week count until it ends.
+
+The ORM writes update the counters through mapper events. The set-based
+deletes bypass these events, so they call release_usage with their
+conditions before deleting.
+
+Functions:
+- check_quota(user_id, start_time, end_time, replaced=None): Checks the quotas for a new booking.
+- release_usage(conditions): Removes the reservations about to be deleted from the counters.
+"""
+
+from datetime import datetime
+
+from flask import Response, current_app
+from sqlalchemy import func, select
+
+from . import db, reads
+from .models import Reservation, UserWeekUsage, adjust_usage, to_minutes, week_of
+
+
+def check_quota(user_id, start_time, end_time, replaced=None):
+    """
+    Check the quotas of a user for a new booking, or for the modification of one.
+
+    Args:
+        user_id (int): The user.
+        start_time (datetime): The start time of the booking.
+        end_time (datetime): The end time of the booking.
+        replaced (Reservation, optional): The reservation being modified,
+        which is already counted.
+
+    Returns:
+        Response: An error response if a quota would be exceeded, None otherwise.
+    """
+    max_reservations = current_app.config["QUOTA_MAX_RESERVATIONS"]
+    if max_reservations is not None and replaced is None:
+        active = reads.execute(
+            reads.ACTIVE_RESERVATIONS,
+            user_id=user_id,
+            week=week_of(to_minutes(datetime.now())),
+        ).scalar()
+        if active + 1 > max_reservations:
+            return Response(
+                f"Reservation quota exceeded: at most {max_reservations} reservations.",
+                status=409,
+            )
+
+    max_minutes = current_app.config["QUOTA_MAX_WEEKLY_MINUTES"]
+    if max_minutes is not None:
+        start_minute = to_minutes(start_time)
+        week = week_of(start_minute)
+        minutes = (
+            db.session.scalar(
+                select(UserWeekUsage.minutes).where(
+                    UserWeekUsage.user_id == user_id, UserWeekUsage.week == week
+                )
+            )
+            or 0
+        )
+        if replaced is not None and week_of(replaced.start_minute) == week:
+            minutes -= replaced.end_minute - replaced.start_minute
+        if minutes + to_minutes(end_time) - start_minute > max_minutes:
+            return Response(
+                f"Reservation quota exceeded: at most {max_minutes} minutes a week.",
+                status=409,
+            )
+    return None
+
+
+def release_usage(conditions):
+    """
+    Remove the reservations about to be deleted by a set-based delete from the counters.
+
+    It must run in the transaction of the delete, with the same conditions.
+
+    Args:
+        conditions (list): The conditions of the deleted reservations.
+
+    Returns:
+        None
+    """
+    # Same as week_of, in SQL
+    week = (Reservation.start_minute // (24 * 60) + 3) // 7
+    rows = db.session.execute(
+        select(
+            Reservation.user_id,
+            week,
+            func.sum(Reservation.end_minute - Reservation.start_minute),
+            func.count(),
+        )
+        .where(*conditions)
+        .group_by(Reservation.user_id, week)
+    ).all()
+    connection = db.session.connection()
+    for user_id, user_week, booked, count in rows:
+        adjust_usage(connection, user_id, user_week, -booked, -count)
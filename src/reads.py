@@ -0,0 +1,271 @@
+"""
+This module contains the read-only fast path of the GET endpoints.
+
+Loading ORM objects to serialize four or five of their fields costs more
+than the query itself: identity map lookups, instance state, and the lazy
+loads of the user and the room of every reservation. The functions of
+this module execute Core select() statements, built once at import so
+their compiled form is always found in the statement cache, and return
+plain rows or dictionaries. The writes stay on the ORM.
+
+The statements run on the connection of the session, so they see the
+same transaction as the ORM.
+
+Functions:
+- api_key_user(key_hash): Gets the user of an API key.
+- get_user(user_id): Gets a serialized user.
+- get_usage(user_id, now): Gets the usage of a user.
+- get_reservation(reservation_id, now): Gets a serialized active reservation and its user id.
+- get_archived_reservation(reservation_id): Gets a serialized archived reservation and its user id.
+- list_reservations(user_id, now): Gets the serialized active reservations of a user.
+- list_archived_reservations(user_id): Gets the serialized archived reservations of a user.
+"""
+
+from sqlalchemy import bindparam, func, select
+
+from . import db
+from .models import (
+    ApiKey,
+    Reservation,
+    ReservationHistory,
+    Room,
+    User,
+    UserWeekUsage,
+    to_minutes,
+    week_of,
+)
+
+users = User.__table__
+rooms = Room.__table__
+reservations = Reservation.__table__
+history = ReservationHistory.__table__
+api_keys = ApiKey.__table__
+week_usage = UserWeekUsage.__table__
+
+API_KEY_USER = (
+    select(users.c.id, users.c.username, users.c.email)
+    .join(api_keys, api_keys.c.user_id == users.c.id)
+    .where(api_keys.c.key == bindparam("key_hash"))
+)
+
+USER = select(users.c.id, users.c.username, users.c.email).where(
+    users.c.id == bindparam("user_id")
+)
+
+WEEK_MINUTES = select(week_usage.c.minutes).where(
+    week_usage.c.user_id == bindparam("user_id"),
+    week_usage.c.week == bindparam("week"),
+)
+
+# The reservations of the current and the coming weeks, from the weekly
+# counters of the user
+ACTIVE_RESERVATIONS = select(
+    func.coalesce(func.sum(week_usage.c.reservations), 0)
+).where(
+    week_usage.c.user_id == bindparam("user_id"),
+    week_usage.c.week >= bindparam("week"),
+)
+
+ACTIVE = reservations.c.expires_at.is_(None) | (
+    reservations.c.expires_at > bindparam("now")
+)
+
+RESERVATIONS = select(
+    reservations.c.id,
+    reservations.c.user_id,
+    users.c.username,
+    rooms.c.room_name,
+    reservations.c.start_time,
+    reservations.c.end_time,
+    reservations.c.expires_at,
+).select_from(
+    reservations.join(users, users.c.id == reservations.c.user_id).join(
+        rooms, rooms.c.id == reservations.c.room_id
+    )
+)
+
+RESERVATION = RESERVATIONS.where(
+    reservations.c.id == bindparam("reservation_id"), ACTIVE
+)
+
+USER_RESERVATIONS = RESERVATIONS.where(
+    reservations.c.user_id == bindparam("user_id"), ACTIVE
+).order_by(reservations.c.start_minute)
+
+ARCHIVED_RESERVATIONS = select(
+    history.c.id,
+    history.c.user_id,
+    users.c.username,
+    rooms.c.room_name,
+    history.c.start_time,
+    history.c.end_time,
+).select_from(
+    history.join(users, users.c.id == history.c.user_id).join(
+        rooms, rooms.c.id == history.c.room_id
+    )
+)
+
+ARCHIVED_RESERVATION = ARCHIVED_RESERVATIONS.where(
+    history.c.id == bindparam("reservation_id")
+)
+
+USER_ARCHIVED_RESERVATIONS = ARCHIVED_RESERVATIONS.where(
+    history.c.user_id == bindparam("user_id")
+)
+
+
+def execute(statement, **params):
+    """
+    Execute a statement on the connection of the session.
+
+    Args:
+        statement (Select): The statement.
+        **params: The values of its bound parameters.
+
+    Returns:
+        CursorResult: The result of the statement.
+    """
+    return db.session.connection().execute(statement, params)
+
+
+def reservation_document(row, status=None):
+    """
+    Serialize a reservation row like Reservation.serialize.
+
+    Args:
+        row (Row): A row of RESERVATIONS or ARCHIVED_RESERVATIONS.
+        status (str, optional): The status of an archived reservation.
+
+    Returns:
+        dict: A dictionary representation of the reservation.
+    """
+    doc = {
+        "id": row.id,
+        "user": row.username,
+        "room": row.room_name,
+        "date": row.start_time.date().isoformat(),
+        "time-span": f"{row.start_time.time()} - {row.end_time.time()}",
+    }
+    if status is not None:
+        doc["status"] = status
+    elif row.expires_at is None:
+        doc["status"] = "confirmed"
+    else:
+        doc["status"] = "held"
+        doc["hold-expires"] = row.expires_at.isoformat(timespec="seconds")
+    return doc
+
+
+def api_key_user(key_hash):
+    """
+    Get the user of an API key.
+
+    Args:
+        key_hash (str): The hash of the API key.
+
+    Returns:
+        Row: The id, username and email of the user, None if the key is unknown.
+    """
+    return execute(API_KEY_USER, key_hash=key_hash).first()
+
+
+def get_user(user_id):
+    """
+    Get a serialized user.
+
+    Args:
+        user_id (int): The unique identifier of the user.
+
+    Returns:
+        dict: The user like User.serialize, None if it does not exist.
+    """
+    row = execute(USER, user_id=user_id).first()
+    if row is None:
+        return None
+    return {"id": row.id, "username": row.username, "email": row.email}
+
+
+def get_usage(user_id, now):
+    """
+    Get the usage of a user.
+
+    Args:
+        user_id (int): The unique identifier of the user.
+        now (datetime): The current time.
+
+    Returns:
+        dict: The number of reservations and holds of the current and the
+        coming weeks, and the minutes booked in the week of now.
+    """
+    week = week_of(to_minutes(now))
+    active = execute(ACTIVE_RESERVATIONS, user_id=user_id, week=week).scalar()
+    minutes = execute(WEEK_MINUTES, user_id=user_id, week=week).scalar()
+    return {"active-reservations": active, "week-minutes": minutes or 0}
+
+
+def get_reservation(reservation_id, now):
+    """
+    Get a serialized reservation and the id of its user. Expired holds are ignored.
+
+    Args:
+        reservation_id (int): The unique identifier of the reservation.
+        now (datetime): The current time.
+
+    Returns:
+        tuple: The user id and the reservation like Reservation.serialize,
+        None if there is no such active reservation.
+    """
+    row = execute(RESERVATION, reservation_id=reservation_id, now=now).first()
+    if row is None:
+        return None
+    return row.user_id, reservation_document(row)
+
+
+def get_archived_reservation(reservation_id):
+    """
+    Get a serialized archived reservation and the id of its user.
+
+    Args:
+        reservation_id (int): The identifier the reservation had.
+
+    Returns:
+        tuple: The user id and the reservation like ReservationHistory.serialize,
+        None if there is no such archived reservation.
+    """
+    row = execute(ARCHIVED_RESERVATION, reservation_id=reservation_id).first()
+    if row is None:
+        return None
+    return row.user_id, reservation_document(row, "archived")
+
+
+def list_reservations(user_id, now):
+    """
+    Get the serialized active reservations of a user, by start time.
+
+    Args:
+        user_id (int): The unique identifier of the user.
+        now (datetime): The current time.
+
+    Returns:
+        list: The reservations like Reservation.serialize.
+    """
+    return [
+        reservation_document(row)
+        for row in execute(USER_RESERVATIONS, user_id=user_id, now=now)
+    ]
+
+
+def list_archived_reservations(user_id):
+    """
+    Get the serialized archived reservations of a user.
+
+    Args:
+        user_id (int): The unique identifier of the user.
+
+    Returns:
+        list: The reservations like ReservationHistory.serialize.
+    """
+    return [
+        reservation_document(row, "archived")
+        for row in execute(USER_ARCHIVED_RESERVATIONS, user_id=user_id)
+    ]
@@ -0,0 +1,178 @@
+"""
+This module contains the opt-in recorder of the traffic of the application.
+
+When TRAFFIC_RECORD_FILE is set, every request is appended to it as one
+JSON line with short keys:
+- t: The arrival time of the request, in seconds since the epoch.
+- m, p: The method and the path, with the script root (the tenant
+  prefix, see tenancy.py) and the query string.
+- k: The pseudonym of the Api-key header, None without one.
+- c, b: The content type and the body, only when there is a body.
+- s, d: The status code and the duration of the response in milliseconds.
+
+The API keys are never written. The pseudonym of a key is an HMAC of its
+stored hash, keyed with TRAFFIC_RECORD_SALT: the same key always gets the
+same pseudonym, which cannot be turned back into the key without the salt.
+To replay the traffic, the keys of a copy of the database are replaced by
+the pseudonyms of their hashes (flask rekey-api-keys), so the pseudonyms of
+the file authenticate the same users on the copy. The bodies are kept up to
+TRAFFIC_RECORD_MAX_BODY bytes. In the JSON bodies, the values of the fields
+listed in TRAFFIC_RECORD_SCRUBBED_FIELDS (the emails and the secrets by
+default) are replaced by their pseudonyms, the same way as the keys, so
+that a replayed body is still valid and unique. Every line is written by a single write to
+a file opened in append mode, so the workers of a host can share the file.
+See benchmarks/replay.py for the replay tool.
+
+Functions:
+- init_app(app): Registers the recorder on the requests of the application.
+- pseudonym(key_hash, salt): Gets the pseudonym of an API key.
+- scrub(value, fields, salt): Replaces the sensitive fields of a JSON document by their pseudonyms.
+- rekey_api_keys(salt): Replaces the API keys of the database by their pseudonyms.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+import click
+from flask import g, request
+
+from . import db
+from .models import ApiKey
+
+
+def init_app(app):
+    """
+    Register the recorder on the requests of the application, if enabled,
+    and add the rekey-api-keys command.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+
+    @app.cli.command("rekey-api-keys")
+    def rekey_api_keys_command():
+        """Replace the API keys by the pseudonyms of the recorded traffic, on a copy!"""
+        count = rekey_api_keys(_salt(app))
+        click.echo(f"{count} API keys replaced by their pseudonyms.")
+
+    path = app.config["TRAFFIC_RECORD_FILE"]
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    salt = _salt(app)
+    max_body = app.config["TRAFFIC_RECORD_MAX_BODY"]
+    scrubbed = {field.lower() for field in app.config["TRAFFIC_RECORD_SCRUBBED_FIELDS"]}
+    lock = threading.Lock()
+    state = {"pid": None, "fd": None}
+
+    @app.before_request
+    def _start_recording():
+        g.record_start = (time.time(), time.perf_counter())
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("record_start", None)
+        if start is None:
+            return response
+        entry = {
+            "t": round(start[0], 3),
+            "m": request.method,
+            "p": (request.script_root + request.full_path).rstrip("?"),
+            "k": None,
+        }
+        key = request.headers.get("Api-key")
+        if key:
+            entry["k"] = pseudonym(ApiKey.key_hash(key.strip()), salt)
+        body = request.get_data(cache=True)
+        if body:
+            entry["c"] = request.content_type
+            document = request.get_json(silent=True) if request.is_json else None
+            if document is not None:
+                body = json.dumps(scrub(document, scrubbed, salt)).encode()
+            entry["b"] = body[:max_body].decode("utf-8", "replace")
+        entry["s"] = response.status_code
+        entry["d"] = round((time.perf_counter() - start[1]) * 1000, 3)
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+        with lock:
+            # The file of the parent process is not shared by the forked workers
+            if state["pid"] != os.getpid():
+                state["pid"] = os.getpid()
+                state["fd"] = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            os.write(state["fd"], line)
+        return response
+
+
+def pseudonym(key_hash, salt):
+    """
+    Get the pseudonym of an API key.
+
+    Args:
+        key_hash (bytes): The hash of the key, see ApiKey.key_hash.
+        salt (str): The secret of the pseudonyms.
+
+    Returns:
+        str: 32 hexadecimal characters.
+    """
+    return hmac.new(salt.encode(), key_hash, hashlib.sha256).hexdigest()[:32]
+
+
+def scrub(value, fields, salt):
+    """
+    Replace the values of the sensitive fields of a JSON document by their pseudonyms.
+
+    A string keeps the form of an email address if it has one.
+
+    Args:
+        value: The JSON document.
+        fields (set): The lowercase names of the sensitive fields.
+        salt (str): The secret of the pseudonyms.
+
+    Returns:
+        The scrubbed copy of the document.
+    """
+    if isinstance(value, list):
+        return [scrub(item, fields, salt) for item in value]
+    if not isinstance(value, dict):
+        return value
+    document = {}
+    for name, item in value.items():
+        if name.lower() in fields and isinstance(item, str):
+            item_pseudonym = pseudonym(item.encode(), salt)
+            item = f"{item_pseudonym}@example.com" if "@" in item else item_pseudonym
+        document[name] = scrub(item, fields, salt)
+    return document
+
+
+def rekey_api_keys(salt):
+    """
+    Replace the API keys of the database by their pseudonyms.
+
+    After it, the pseudonyms of the recorded traffic authenticate as the
+    keys they replace. Only run it on a copy of the database: the users can
+    no longer use their keys.
+
+    Args:
+        salt (str): The secret of the pseudonyms.
+
+    Returns:
+        int: The number of replaced keys.
+    """
+    api_keys = ApiKey.query.all()
+    for api_key in api_keys:
+        api_key.key = ApiKey.key_hash(pseudonym(api_key.key, salt))
+    db.session.commit()
+    return len(api_keys)
+
+
+def _salt(app):
+    """
+    Get the secret of the pseudonyms, the secret key by default.
+    """
+    return app.config["TRAFFIC_RECORD_SALT"] or app.config["SECRET_KEY"]
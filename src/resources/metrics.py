@@ -0,0 +1,95 @@
+"""
+This module contains the implementation of the Metrics resource.
+
+The Metrics resource returns the counters of the process serving the
+request, for the administrators. With several worker processes, each
+request is answered by one of them.
+
+Classes:
+    Metrics: A resource class returning the counters of the process.
+"""
+
+import os
+
+from flask import current_app
+from flask_restful import Resource
+
+from .. import admission, room_catalog, scheduler, singleflight
+from ..decorators import require_admin
+
+
+class Metrics(Resource):
+    """
+    Resource class returning the counters of the process.
+
+    Attributes:
+        None
+
+    Methods:
+        get(self): Handle GET requests to retrieve the counters.
+    """
+
+    @require_admin
+    def get(self):
+        """
+        Handle GET requests to retrieve the counters of the process.
+
+        Returns:
+            Response: The counters, with status code 200.
+
+        Retrieve the counters of the process serving the request.
+        ---
+        tags:
+          - Metrics
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: Api-key corresponding to an admin account.
+        responses:
+          200:
+            description: The counters of the process.
+            content:
+              application/json:
+                example:
+                  pid: 4242
+                  singleflight:
+                    rooms_available:
+                      computed: 12
+                      coalesced: 340
+                      shared: 25
+                      in_flight: 0
+                  jobs:
+                    archive:
+                      runs: 3
+                      failures: 0
+                      skipped: 9
+                      last_run: 1718900000.5
+                      last_duration: 0.042
+                      total_duration: 0.131
+                  admission:
+                    availability:
+                      active: 8
+                      queued: 16
+                      admitted: 5120
+                      rejected: 310
+                      timeouts: 12
+                      concurrency: 8
+                      queue: 16
+                  room_catalog:
+                    loads: 2
+                    snapshots:
+                      None:
+                        version: 7
+                        rooms: 40
+          401:
+            description: The provided Api-key does not belong to an admin account.
+        """
+        return {
+            "pid": os.getpid(),
+            "singleflight": singleflight.stats(current_app),
+            "jobs": scheduler.stats(current_app),
+            "admission": admission.stats(current_app),
+            "room_catalog": room_catalog.stats(current_app),
+        }, 200
@@ -0,0 +1,181 @@
+"""
+This module contains the implementation of the profile resources.
+
+They serve the profiles of the requests profiled by an admin, and the
+stacks sampled continuously by endpoint, of the process serving the
+request (see profiling.py).
+
+Classes:
+    ProfileCollection: A resource class listing the profiles.
+    ProfileId: A resource class returning the output of a profile.
+    RouteProfile: A resource class returning the sampled stacks of an endpoint.
+"""
+
+from flask import Response, current_app
+from flask_restful import Resource
+
+from ..decorators import require_admin
+from ..profiling import format_collapsed
+
+
+class ProfileCollection(Resource):
+    """
+    Resource class listing the profiles of the process.
+
+    Attributes:
+        None
+
+    Methods:
+        get(self): Handle GET requests to list the profiles.
+    """
+
+    @require_admin
+    def get(self):
+        """
+        Handle GET requests to list the profiles of the process.
+
+        Returns:
+            Response: The profiles and the sampled endpoints, with status code 200.
+
+        List the profiles of the process, newest first, and the number of
+        continuous samples of every endpoint.
+        ---
+        tags:
+          - Metrics
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: Api-key corresponding to an admin account.
+        responses:
+          200:
+            description: The profiles and the sampled endpoints.
+            content:
+              application/json:
+                example:
+                  profiles:
+                    - id: 3
+                      kind: cprofile
+                      method: GET
+                      path: /api/rooms_available/?date=2024-06-30&time=10:00
+                      endpoint: roomsavailable
+                      time: 1718900000.5
+                      duration_ms: 48.2
+                  routes:
+                    roomsavailable: 1520
+          401:
+            description: The provided Api-key does not belong to an admin account.
+        """
+        profiling = current_app.extensions["profiling"]
+        routes = profiling["sampler"].routes()
+        return {
+            "profiles": profiling["store"].list(),
+            "routes": {endpoint: sum(counts.values()) for endpoint, counts in routes.items()},
+        }, 200
+
+
+class ProfileId(Resource):
+    """
+    Resource class returning the output of a profile.
+
+    Attributes:
+        None
+
+    Methods:
+        get(self, profile_id): Handle GET requests to retrieve a profile.
+    """
+
+    @require_admin
+    def get(self, profile_id):
+        """
+        Handle GET requests to retrieve the output of a profile.
+
+        Args:
+            profile_id (str): The X-Profile-Id of the profiled response.
+
+        Returns:
+            Response: The pstats text or the collapsed stacks of the profile.
+
+        Retrieve the output of a profile: the pstats text of a cprofile
+        profile, or the collapsed stacks of a sample profile.
+        ---
+        tags:
+          - Metrics
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: Api-key corresponding to an admin account.
+          - in: path
+            name: profile_id
+            type: integer
+            required: true
+            description: The X-Profile-Id header of the profiled response.
+        responses:
+          200:
+            description: The output of the profile, as text.
+          401:
+            description: The provided Api-key does not belong to an admin account.
+          404:
+            description: No profile with this id is kept by the process.
+        """
+        try:
+            profile = current_app.extensions["profiling"]["store"].get(int(profile_id))
+        except ValueError:
+            profile = None
+        if profile is None:
+            return Response("No profile found with the provided profile_id.", status=404)
+        return Response(profile["output"], mimetype="text/plain")
+
+
+class RouteProfile(Resource):
+    """
+    Resource class returning the stacks sampled continuously for an endpoint.
+
+    Attributes:
+        None
+
+    Methods:
+        get(self, endpoint): Handle GET requests to retrieve the stacks.
+    """
+
+    @require_admin
+    def get(self, endpoint):
+        """
+        Handle GET requests to retrieve the stacks sampled for an endpoint.
+
+        Args:
+            endpoint (str): The endpoint, as listed by the profile collection.
+
+        Returns:
+            Response: The collapsed stacks of the endpoint.
+
+        Retrieve the collapsed stacks sampled continuously for an endpoint.
+        ---
+        tags:
+          - Metrics
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: Api-key corresponding to an admin account.
+          - in: path
+            name: endpoint
+            type: string
+            required: true
+            description: The endpoint, for example roomsavailable.
+        responses:
+          200:
+            description: The collapsed stacks, one "stack count" line per stack.
+          401:
+            description: The provided Api-key does not belong to an admin account.
+          404:
+            description: No sample of this endpoint.
+        """
+        counts = current_app.extensions["profiling"]["sampler"].routes().get(endpoint)
+        if not counts:
+            return Response("No samples found for the provided endpoint.", status=404)
+        return Response(format_collapsed(counts), mimetype="text/plain")
@@ -6,16 +6,26 @@ deletions and retrievals of existing reservations.
 
 Classes:
     ReservationId: A resource class for seeing, modifying and deleting existing reservations.
+
+Functions:
+    insert_reservation: Write operation creating a reservation or a hold.
+    update_reservation: Write operation modifying a reservation.
+    confirm_reservation: Write operation confirming a hold.
+    promote_waitlist: Turns the waitlist entries of a freed interval into reservations.
+    include_history_requested: Checks the include_history query flag.
+    delete_reservation: Write operation deleting a reservation.
 """
 
 from datetime import datetime, timedelta
+from functools import partial
 
 from flask import Response, request
 from flask_restful import Resource
 
-from .. import db
-from ..decorators import require_user
-from ..models import Reservation, Room
+from .. import db, holds, reads, room_catalog, write_pipeline
+from ..decorators import require_user, require_user_row
+from ..quotas import check_quota
+from ..models import Reservation, WaitlistEntry, to_minutes
 
 
 def validate_user_id(user_id):
@@ -43,41 +53,65 @@ def validate_user_id(user_id):
     return user_id
 
 
-def check_overlapping_reservations(room, start_time, end_time):
+def include_history_requested():
+    """
+    Check if the request asks for the archived reservations too.
+
+    The read endpoints only return the current reservations, unless the
+    include_history query parameter is true.
+
+    Returns:
+        bool: True if the include_history query parameter is true.
     """
-    Check for overlapping reservations.
+    return request.args.get("include_history", "").lower() in ("1", "true", "yes")
+
+
+def check_overlapping_reservations(
+    room, start_time, end_time, exclude_id=None, purge_expired=False
+):
+    """
+    Check for overlapping reservations. Expired holds are ignored.
 
     Args:
         room (Room): The room for the reservation.
         start_time (datetime): The start time of the reservation.
         end_time (datetime): The end time of the reservation.
+        exclude_id (int, optional): The id of a reservation to ignore,
+        the one being modified.
+        purge_expired (bool, optional): Whether the expired holds overlapping
+        the interval, which are not swept yet, are deleted, so that the
+        interval can be booked. Only for the write operations.
 
     Returns:
         Response: An error response if there are overlapping reservations, None otherwise.
     """
-    overlapping_reservations = Reservation.query.filter(
-        (Reservation.room == room)
-        & (
-            (
-                (Reservation.start_time >= start_time)
-                & (Reservation.start_time <= end_time)
-            )
-            | (
-                (Reservation.end_time >= start_time)
-                & (Reservation.end_time <= end_time)
-            )
-            | (
-                (Reservation.start_time <= start_time)
-                & (Reservation.end_time >= end_time)
-            )
+    query = db.session.query(Reservation.expires_at)
+    if exclude_id is not None:
+        query = query.filter(Reservation.id != exclude_id)
+    # Two intervals overlap (bounds included) when each one starts before the
+    # other ends. The integer minutes use the (room_id, end_minute, start_minute) index.
+    # The confirmed reservations come first, then the holds expiring last: when
+    # the first one is an expired hold, all the overlapping ones are.
+    overlapping = (
+        query.filter(
+            Reservation.room_id == room.id,
+            Reservation.end_minute >= to_minutes(start_time),
+            Reservation.start_minute <= to_minutes(end_time),
         )
-    ).all()
-    if overlapping_reservations:
+        .order_by(Reservation.expires_at.is_not(None), Reservation.expires_at.desc())
+        .first()
+    )
+    if overlapping is None:
+        return None
+    now = datetime.now()
+    if overlapping.expires_at is None or overlapping.expires_at > now:
         return Response("Time slot already taken", status=409)
+    if purge_expired:
+        holds.delete_expired_holds(now, room.id, start_time, end_time)
     return None
 
 
-def check_reservation_duration_and_overlap(room, start_time, end_time):
+def check_reservation_duration_and_overlap(room, start_time, end_time, exclude_id=None):
     """
     Check the duration of a reservation and if it overlaps with other reservations.
 
@@ -98,6 +132,8 @@ def check_reservation_duration_and_overlap(room, start_time, end_time):
         room (Room): The room for the reservation.
         start_time (datetime): The start time of the reservation.
         end_time (datetime): The end time of the reservation.
+        exclude_id (int, optional): The id of a reservation to ignore,
+        the one being modified.
 
     Returns:
         Response: An error response if the reservation duration
@@ -110,13 +146,211 @@ def check_reservation_duration_and_overlap(room, start_time, end_time):
         return Response("Reservation is too long.", status=409)
 
     # Check for overlapping reservations
-    response = check_overlapping_reservations(room, start_time, end_time)
+    response = check_overlapping_reservations(
+        room, start_time, end_time, exclude_id, purge_expired=True
+    )
     if response:
         return response
 
     return None
 
 
+def promote_waitlist(room_id, start_time, end_time):
+    """
+    Turn the waitlist entries of a freed interval into reservations.
+
+    The entries of the room touching the interval are read in the order
+    they joined the waitlist, through the (room_id, start_time) index:
+    an entry is never longer than the max_time of the room, so only the
+    start times from start_time - max_time to end_time have to be read.
+    Every entry whose interval is now free becomes a reservation, the
+    first one in the queue getting the slot when several compete for it.
+    The entries of users who reached their quota stay in the waitlist.
+
+    Args:
+        room_id (int): The room of the freed interval.
+        start_time (datetime): The start of the freed interval.
+        end_time (datetime): The end of the freed interval.
+
+    Returns:
+        list: The ids of the created reservations.
+    """
+    room = room_catalog.get(room_id)
+    now = datetime.now()
+    entries = (
+        WaitlistEntry.query.filter(
+            WaitlistEntry.room_id == room_id,
+            WaitlistEntry.start_time >= start_time - timedelta(minutes=room.max_time),
+            WaitlistEntry.start_time <= end_time,
+            WaitlistEntry.end_time >= start_time,
+            WaitlistEntry.start_time > now,
+        )
+        .order_by(WaitlistEntry.created_at, WaitlistEntry.id)
+        .all()
+    )
+    promoted = []
+    for entry in entries:
+        if check_overlapping_reservations(
+            room, entry.start_time, entry.end_time, purge_expired=True
+        ):
+            continue
+        if check_quota(entry.user_id, entry.start_time, entry.end_time):
+            continue
+        reservation = Reservation(
+            room_id=room_id,
+            user_id=entry.user_id,
+            start_time=entry.start_time,
+            end_time=entry.end_time,
+        )
+        db.session.add(reservation)
+        db.session.delete(entry)
+        db.session.flush()
+        promoted.append(reservation.id)
+    return promoted
+
+
+def insert_reservation(room_id, user_id, start_time, end_time, expires_at=None):
+    """
+    Write operation creating a reservation, run with write_pipeline.execute.
+
+    Args:
+        room_id (int): The id of the reserved room, which must exist.
+        user_id (int): The id of the user making the reservation.
+        start_time (datetime): The start time of the reservation.
+        end_time (datetime): The end time of the reservation.
+        expires_at (datetime, optional): The expiry time if the reservation is a hold.
+
+    Returns:
+        Response: The success response with the reservation_id header,
+        or an error response if the reservation is too long or overlaps another one.
+    """
+    room = room_catalog.get(room_id)
+    response = check_reservation_duration_and_overlap(room, start_time, end_time)
+    if response:
+        return response
+
+    response = check_quota(user_id, start_time, end_time)
+    if response:
+        return response
+    reservation = Reservation(
+        room_id=room_id,
+        user_id=user_id,
+        start_time=start_time,
+        end_time=end_time,
+        expires_at=expires_at,
+    )
+    db.session.add(reservation)
+    db.session.flush()
+    if expires_at is not None:
+        # The sweeper only learns about the hold once it is committed
+        write_pipeline.on_commit(partial(holds.schedule, expires_at))
+        return Response(
+            "Hold created successfully",
+            headers={
+                "reservation_id": reservation.id,
+                "hold_expires": expires_at.isoformat(timespec="seconds"),
+            },
+            status=201,
+        )
+    return Response(
+        "Reservation created successfully",
+        headers={"reservation_id": reservation.id},
+        status=201,
+    )
+
+
+def update_reservation(reservation_id, room_id, start_time, end_time, confirm=False):
+    """
+    Write operation modifying a reservation, run with write_pipeline.execute.
+
+    The previous interval of the reservation is offered to the waitlist.
+
+    Args:
+        reservation_id (int): The id of the modified reservation.
+        room_id (int): The id of the new room, which must exist.
+        start_time (datetime): The new start time of the reservation.
+        end_time (datetime): The new end time of the reservation.
+        confirm (bool, optional): Whether a hold is also confirmed.
+
+    Returns:
+        Response: The success response, or an error response if the reservation
+        no longer exists, is too long or overlaps another one.
+    """
+    reservation = db.session.get(Reservation, reservation_id)
+    if reservation is None or not reservation.is_active(datetime.now()):
+        return Response(
+            "No reservation found with the provided reservation_id.", status=404
+        )
+    room = room_catalog.get(room_id)
+    response = check_reservation_duration_and_overlap(
+        room, start_time, end_time, exclude_id=reservation_id
+    )
+    if response:
+        return response
+
+    response = check_quota(
+        reservation.user_id, start_time, end_time, replaced=reservation
+    )
+    if response:
+        return response
+    freed = (reservation.room_id, reservation.start_time, reservation.end_time)
+    reservation.start_time = start_time
+    reservation.end_time = end_time
+    reservation.room_id = room_id
+    if confirm:
+        reservation.expires_at = None
+    db.session.flush()
+    promote_waitlist(*freed)
+    return Response("Reservation updated successfully", status=200)
+
+
+def confirm_reservation(reservation_id):
+    """
+    Write operation confirming a hold, run with write_pipeline.execute.
+
+    Confirming a reservation which is not a hold does nothing.
+
+    Args:
+        reservation_id (int): The id of the hold.
+
+    Returns:
+        Response: The success response, or an error response if the hold
+        no longer exists or has expired.
+    """
+    reservation = db.session.get(Reservation, reservation_id)
+    if reservation is None or not reservation.is_active(datetime.now()):
+        return Response(
+            "No reservation found with the provided reservation_id.", status=404
+        )
+    reservation.expires_at = None
+    return Response("Reservation confirmed successfully", status=200)
+
+
+def delete_reservation(reservation_id):
+    """
+    Write operation deleting a reservation, run with write_pipeline.execute.
+
+    The interval of the reservation is offered to the waitlist.
+
+    Args:
+        reservation_id (int): The id of the deleted reservation.
+
+    Returns:
+        Response: The success response, or an error response if the reservation
+        no longer exists.
+    """
+    reservation = db.session.get(Reservation, reservation_id)
+    if reservation is None:
+        return Response(
+            "No reservation found with the provided reservation_id.", status=404
+        )
+    freed = (reservation.room_id, reservation.start_time, reservation.end_time)
+    db.session.delete(reservation)
+    db.session.flush()
+    promote_waitlist(*freed)
+    return Response("Reservation deleted successfully", status=200)
+
+
 class ReservationId(Resource):
     """
     Resource class for seeing, modifying and deleting existing reservations. Implementing
@@ -140,7 +374,7 @@ class ReservationId(Resource):
         Handle DELETE requests to remove a specific reservation.
     """
 
-    @require_user
+    @require_user_row
     def get(self, api_key_user, user_id, reservation_id):
         """
         Retrieve a specific reservation for a given user.
@@ -167,7 +401,7 @@ class ReservationId(Resource):
                 type: string
                 required: true
                 description:
-                The user for whom to retrieve the reservation using API key for authentication.
+                  The user for whom to retrieve the reservation using API key for authentication.
               - in: path
                 name: user_id
                 type: integer
@@ -178,6 +412,11 @@ class ReservationId(Resource):
                 type: integer
                 required: true
                 description: The unique identifier of the reservation.
+              - in: query
+                name: include_history
+                type: boolean
+                required: false
+                description: Also look for the reservation in the archived reservations.
             responses:
               200:
                 description: The reservation details.
@@ -230,17 +469,19 @@ class ReservationId(Resource):
         except ValueError:
             return Response("Invalid reservation_id parameter", status=400)
 
-        # Check that the reservation exists
-        reservation = Reservation.query.filter_by(id=reservation_id).first()
-        if not reservation:
+        # Check that the reservation exists, in the history too if requested
+        found = reads.get_reservation(reservation_id, datetime.now())
+        if not found and include_history_requested():
+            found = reads.get_archived_reservation(reservation_id)
+        if not found:
             return Response(
                 "No reservation found with the provided reservation_id.", status=404
             )
-        if reservation.user_id != user_id:
+        owner_id, reservation_data = found
+        if owner_id != user_id:
             return Response(
                 "Reservation does not belong to the provided user_id.", status=403
             )
-        reservation_data = reservation.serialize()
         return reservation_data, 200
 
     @require_user
@@ -270,7 +511,7 @@ class ReservationId(Resource):
               type: string
               required: true
               description: T
-              he user for whom to delete the reservation using API key for authentication.
+                The user for whom to delete the reservation using API key for authentication.
             - in: path
               name: user_id
               type: integer
@@ -323,7 +564,7 @@ class ReservationId(Resource):
 
         # Check that the reservation exists
         reservation = Reservation.query.filter_by(id=reservation_id).first()
-        if not reservation:
+        if not reservation or not reservation.is_active(datetime.now()):
             return Response(
                 "No reservation found with the provided reservation_id.", status=404
             )
@@ -333,9 +574,7 @@ class ReservationId(Resource):
             )
 
         # Delete the reservation
-        db.session.delete(reservation)
-        db.session.commit()
-        return Response("Reservation deleted successfully", status=200)
+        return write_pipeline.execute(partial(delete_reservation, reservation_id))
 
     @require_user
     def put(self, api_key_user, user_id, reservation_id):
@@ -347,6 +586,7 @@ class ReservationId(Resource):
         and the API key must correspond to the user_id provided.
         The request body should be in JSON format and
         may include the new date, start-time, end-time, and room_id.
+        A hold is confirmed by sending "confirm": true.
 
         Args:
             api_key_user (User): The user associated with the provided API key.
@@ -366,7 +606,7 @@ class ReservationId(Resource):
               type: string
               required: true
               description:
-              The user for whom to update the reservation using API key for authentication.
+                The user for whom to update the reservation using API key for authentication.
             - in: path
               name: user_id
               type: integer
@@ -400,6 +640,11 @@ class ReservationId(Resource):
                     roomId:
                       type: integer
                       description: The new room id for the reservation.
+                    confirm:
+                      type: boolean
+                      description:
+                        Confirm a hold, so that it no longer expires.
+                        It can be sent alone or with the other fields.
                 example:
                     date: "2024-06-01"
                     start-time: "14:00"
@@ -416,12 +661,12 @@ class ReservationId(Resource):
                 description: Reservation does not belong to the provided user_id.
               404:
                 description:
-                No reservation found with the provided reservation_id
-                or no room found with the provided room id.
+                  No reservation found with the provided reservation_id
+                  or no room found with the provided room id.
               409:
                 description:
-                The new time slot is already taken or the
-                reservation duration exceeds the room's max time.
+                  The new time slot is already taken or the
+                  reservation duration exceeds the room's max time.
         """
         user_id = validate_user_id(user_id)
         if isinstance(user_id, Response):
@@ -443,7 +688,7 @@ class ReservationId(Resource):
 
         # Check that the reservation exists
         reservation = Reservation.query.filter_by(id=reservation_id).first()
-        if not reservation:
+        if not reservation or not reservation.is_active(datetime.now()):
             return Response(
                 "No reservation found with the provided reservation_id.", status=404
             )
@@ -461,21 +706,26 @@ class ReservationId(Resource):
             start_time = data.get("start-time")
             end_time = data.get("end-time")
             room_id = data.get("roomId")
+            confirm = data.get("confirm") is True
         except:
             return Response(f"Error parsing JSON data", status=400)
 
         if not reservation_date and not start_time and not end_time and not room_id:
+            if confirm:
+                return write_pipeline.execute(
+                    partial(confirm_reservation, reservation_id)
+                )
             return Response(
                 "At least one of date, start-time, end-time, or roomId is required.",
                 status=400,
             )
 
         if room_id:
-            room = Room.query.filter_by(id=room_id).first()
+            room = room_catalog.get(room_id)
             if not room:
                 return Response("No room found with the provided room id.", status=404)
         else:
-            room = reservation.room
+            room = room_catalog.get(reservation.room_id)
 
         # Update reservation details
         try:
@@ -511,14 +761,13 @@ class ReservationId(Resource):
                 status=400,
             )
 
-        response = check_reservation_duration_and_overlap(room, start_time, end_time)
-        if response:
-            return response
-
-        reservation.start_time = start_time
-        reservation.end_time = end_time
-        reservation.room = room
-
-        db.session.commit()
-
-        return Response("Reservation updated successfully", status=200)
+        return write_pipeline.execute(
+            partial(
+                update_reservation,
+                reservation_id,
+                room.id,
+                start_time,
+                end_time,
+                confirm=confirm,
+            )
+        )
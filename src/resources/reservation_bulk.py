@@ -0,0 +1,250 @@
+"""
+This module contains the implementation of the bulk cancellation of reservations.
+
+Closing a room for maintenance, or removing the bookings of a user, would
+otherwise take one DELETE request per reservation, each one with its own
+authentication, SELECT, ORM delete and commit. The ReservationBulkCancel
+resource cancels all the matching reservations with one set-based DELETE
+statement, run as a write operation (see write_pipeline.py). The freed
+intervals are only offered to the waitlist when the request asks for it,
+so a room closed for maintenance is not booked again right away.
+
+Classes:
+    ReservationBulkCancel: A resource class for cancelling all the
+    reservations matching a filter.
+
+Functions:
+    cancel_reservations(conditions, promote=False): Write operation cancelling the matching reservations.
+"""
+
+from datetime import datetime, timedelta
+from functools import partial
+
+from flask import Response, jsonify, request
+from flask_restful import Resource
+from sqlalchemy import func
+
+from .. import db, write_pipeline
+from ..decorators import require_api_key
+from ..idempotency import idempotent
+from ..models import Reservation, to_minutes
+from ..quotas import release_usage
+from .reservation import promote_waitlist
+
+
+def parse_positive_int(name):
+    """
+    Parse an optional positive integer query parameter.
+
+    Args:
+        name (str): The name of the query parameter.
+
+    Returns:
+        tuple: The value (None if absent) and None, or None and an error response.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return None, None
+    try:
+        value = int(value)
+        if value <= 0:
+            raise ValueError
+    except ValueError:
+        return None, Response(f"Invalid {name} parameter", status=400)
+    return value, None
+
+
+def parse_date(name):
+    """
+    Parse an optional date query parameter in YYYY-MM-DD format.
+
+    Args:
+        name (str): The name of the query parameter.
+
+    Returns:
+        tuple: The date (None if absent) and None, or None and an error response.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return None, None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d"), None
+    except ValueError:
+        return None, Response(
+            f"Invalid {name} parameter. Date format: YYYY-MM-DD", status=400
+        )
+
+
+def cancel_reservations(conditions, promote=False):
+    """
+    Write operation cancelling the matching reservations, run with write_pipeline.execute.
+
+    The reservations are deleted with one statement, without loading them.
+    With promote, the span of every room from its first cancelled start to
+    its last cancelled end is then offered to the waitlist, one query per
+    room.
+
+    Args:
+        conditions (list): The conditions of the cancelled reservations.
+        promote (bool): Whether to offer the freed intervals to the waitlist.
+
+    Returns:
+        Response: The number of cancelled reservations.
+    """
+    freed = []
+    if promote:
+        freed = (
+            db.session.query(
+                Reservation.room_id,
+                func.min(Reservation.start_time),
+                func.max(Reservation.end_time),
+            )
+            .filter(*conditions)
+            .group_by(Reservation.room_id)
+            .all()
+        )
+    release_usage(conditions)
+    cancelled = Reservation.query.filter(*conditions).delete(
+        synchronize_session=False
+    )
+    for room_id, start_time, end_time in freed:
+        promote_waitlist(room_id, start_time, end_time)
+    return jsonify(cancelled=cancelled)
+
+
+class ReservationBulkCancel(Resource):
+    """
+    Resource class for cancelling all the reservations matching a filter.
+
+    Admins can cancel the reservations of any room and user, the other
+    users only their own reservations.
+
+    Attributes:
+        None
+
+    Methods:
+        delete(): Handles the DELETE request cancelling the matching reservations.
+    """
+
+    @require_api_key
+    @idempotent
+    def delete(self, api_key):
+        """
+        Cancel all the reservations matching the filter with a single statement.
+
+        Only the reservations starting from the "from" date (now when it is
+        absent) are cancelled, the past reservations are kept. The "to"
+        date is included. Admins must give at least one filter. The freed
+        intervals are offered to the waitlist when promote is true.
+
+        Args:
+            api_key (ApiKey): The API key of the request.
+
+        Returns:
+            Response: The number of cancelled reservations,
+            or an error message with the appropriate status code.
+
+        ---
+        tags:
+          - Reservations
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: The API key of an admin, or of the user owning the reservations.
+          - in: header
+            name: Idempotency-Key
+            type: string
+            required: false
+            description: Optional key to safely retry the request.
+              A retry with the same key returns the stored response.
+          - in: query
+            name: roomId
+            type: integer
+            required: false
+            description: Only cancel the reservations of this room.
+          - in: query
+            name: userId
+            type: integer
+            required: false
+            description: Only cancel the reservations of this user.
+              For non admin keys, it must be the user of the key.
+          - in: query
+            name: from
+            type: string
+            format: date
+            required: false
+            description: First date of the cancelled reservations, today when absent.
+          - in: query
+            name: to
+            type: string
+            format: date
+            required: false
+            description: Last date of the cancelled reservations.
+          - in: query
+            name: promote
+            type: boolean
+            required: false
+            description: Offer the freed intervals to the waitlist, false by default.
+        responses:
+          200:
+            description: The reservations were cancelled.
+            content:
+              application/json:
+                schema:
+                  type: object
+                  properties:
+                    cancelled:
+                      type: integer
+                      description: The number of cancelled reservations.
+          400:
+            description: Invalid or missing filter parameter.
+          401:
+            description: The API key is invalid, or does not belong
+              to an admin nor to the user of the userId filter.
+          409:
+            description: A request with the same Idempotency-Key is still being processed.
+          422:
+            description: The Idempotency-Key was already used with a different request.
+        """
+        room_id, response = parse_positive_int("roomId")
+        if response:
+            return response
+        user_id, response = parse_positive_int("userId")
+        if response:
+            return response
+        from_date, response = parse_date("from")
+        if response:
+            return response
+        to_date, response = parse_date("to")
+        if response:
+            return response
+
+        if not api_key.admin:
+            if user_id is not None and user_id != api_key.user_id:
+                return Response(
+                    "The provided Api-key does not correspond to the userId provided.",
+                    status=401,
+                )
+            user_id = api_key.user_id
+        elif room_id is None and user_id is None and from_date is None and to_date is None:
+            return Response(
+                "At least one of roomId, userId, from or to is required.", status=400
+            )
+
+        start = datetime.now()
+        if from_date is not None and from_date > start:
+            start = from_date
+        conditions = [Reservation.start_minute >= to_minutes(start)]
+        if to_date is not None:
+            conditions.append(
+                Reservation.start_minute < to_minutes(to_date + timedelta(days=1))
+            )
+        if room_id is not None:
+            conditions.append(Reservation.room_id == room_id)
+        if user_id is not None:
+            conditions.append(Reservation.user_id == user_id)
+
+        promote = request.args.get("promote", "").lower() in ("1", "true", "yes")
+        return write_pipeline.execute(partial(cancel_reservations, conditions, promote))
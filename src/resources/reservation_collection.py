@@ -14,21 +14,24 @@ Classes:
     A resource class for creating new reservations and
     getting a list of all reservations of the user.
 
+Functions:
+    list_user_reservations: Lists the reservations of a user.
 """
 
 from datetime import datetime, timedelta
+from functools import partial
 
-from flask import Response, request
+from flask import Response, current_app, request
 from flask_restful import Resource
 from .reservation import (
-    check_overlapping_reservations,
-    check_reservation_duration_and_overlap,
+    include_history_requested,
+    insert_reservation,
     validate_user_id,
 )
 
-from .. import db
-from ..decorators import require_user
-from ..models import Reservation, Room
+from .. import reads, room_catalog, singleflight, write_pipeline
+from ..decorators import require_user, require_user_row
+from ..idempotency import idempotent
 
 
 class ReservationCollection(Resource):
@@ -87,7 +90,7 @@ class ReservationCollection(Resource):
         except:
             return None, Response("Error parsing JSON data", status=400)
 
-    @require_user
+    @require_user_row
     def get(self, api_key_user, user_id):
         """
         Retrieve all reservations for a given user.
@@ -114,7 +117,12 @@ class ReservationCollection(Resource):
             type: string
             required: true
             description: The user for whom to retrieve
-            reservations using API key for authentication.
+              reservations using API key for authentication.
+          - in: query
+            name: include_history
+            type: boolean
+            required: false
+            description: Also return the archived reservations.
         responses:
           200:
             description: A list of all reservations for the specified user.
@@ -128,7 +136,7 @@ class ReservationCollection(Resource):
                       user:
                         type: string
                         description:
-                        The username of the user who made the reservation.
+                          The username of the user who made the reservation.
                         example: "john_doe"
                       room:
                         type: string
@@ -147,7 +155,7 @@ class ReservationCollection(Resource):
             description: Invalid user_id parameter.
           401:
             description: The provided API key
-            does not correspond to the user_id provided.
+              does not correspond to the user_id provided.
         """
 
         # Validate user_id parameter
@@ -160,11 +168,20 @@ class ReservationCollection(Resource):
         if response:
             return response
 
-        reservation_list = [r.serialize() for r in api_key_user.reservations]
+        # Ordered by the (user_id, start_minute) index, without loading
+        # the expired holds
+        include_history = include_history_requested()
+        # Concurrent identical requests share one query, see singleflight.py
+        reservation_list = singleflight.coalesce(
+            "reservations",
+            (api_key_user.id, include_history),
+            partial(list_user_reservations, api_key_user.id, include_history),
+        )
 
         return reservation_list, 200
 
     @require_user
+    @idempotent
     def post(self, api_key_user, user_id):
         """
         Create a new reservation for a given user.
@@ -175,6 +192,7 @@ class ReservationCollection(Resource):
         and the API key must correspond to the user_id provided.
         The reservation details (date, start-time, end-time,
         roomId) must be provided in the request body in JSON format.
+        With "hold": true, a hold expiring after HOLD_MINUTES is created instead.
 
         Args:
             api_key_user (User): The user associated
@@ -196,7 +214,13 @@ class ReservationCollection(Resource):
             type: string
             required: true
             description: The user for whom to
-            create a reservation using API key for authentication.
+              create a reservation using API key for authentication.
+          - in: header
+            name: Idempotency-Key
+            type: string
+            required: false
+            description: Optional key to safely retry the request.
+              A retry with the same key returns the stored response.
           - in: body
             name: reservation
             description: The reservation details.
@@ -227,14 +251,23 @@ class ReservationCollection(Resource):
                   type: integer
                   description: The ID of the room being reserved.
                   example: 1
+                hold:
+                  type: boolean
+                  description: Create a tentative hold, which blocks the slot
+                    for a few minutes and expires unless it is confirmed.
+                  example: false
         responses:
           201:
-            description: Reservation created successfully.
+            description: Reservation or hold created successfully.
             headers:
               reservation_id:
                 description: The id of the newly created reservation.
                 schema:
                   type: integer
+              hold_expires:
+                description: The expiry time of the hold, only for holds.
+                schema:
+                  type: string
             content:
               application/json:
                 schema:
@@ -245,17 +278,19 @@ class ReservationCollection(Resource):
                       example: "Reservation created successfully"
           400:
             description: Invalid user_id parameter,
-            or missing/invalid reservation details.
+              or missing/invalid reservation details.
           401:
             description: The provided API key
-            does not correspond to the user_id provided.
+              does not correspond to the user_id provided.
           404:
             description: No room found with the roomId provided.
           409:
             description: Reservation conflict
-            (e.g., past time slot, overlapping reservation, reservation too long).
+              (e.g., past time slot, overlapping reservation, reservation too long).
           415:
             description: The request body must be in JSON format.
+          422:
+            description: The Idempotency-Key was already used with a different request.
         """
 
         # Validate user_id parameter
@@ -279,6 +314,7 @@ class ReservationCollection(Resource):
           start_time = data.get("start-time")
           end_time = data.get("end-time")
           room_id = data.get("roomId")
+          hold = data.get("hold") is True
         except:
           return Response("Error parsing JSON data", status=400)
 
@@ -288,7 +324,7 @@ class ReservationCollection(Resource):
             )
 
         # Check that the room ID corresponds to a room
-        room = Room.query.filter_by(id=room_id).first()
+        room = room_catalog.get(room_id)
         if not room:
             return Response("No room found with the provided room id.", status=404)
 
@@ -314,24 +350,38 @@ class ReservationCollection(Resource):
         if start_time < datetime.now():
             return Response("Cannot book past time slots", status=409)
 
-        response = check_reservation_duration_and_overlap(room, start_time, end_time)
-        if response:
-            return response
-
-        # Check for overlapping reservations
-        response = check_overlapping_reservations(room, start_time, end_time)
-        if response:
-            return response
+        # A hold blocks the slot for HOLD_MINUTES until it is confirmed
+        expires_at = None
+        if hold:
+            expires_at = datetime.now() + timedelta(
+                minutes=current_app.config["HOLD_MINUTES"]
+            )
 
-        # Create and insert the reservation object
-        reservation = Reservation(
-            room=room, user=api_key_user, start_time=start_time, end_time=end_time
+        # Check the duration and the overlaps, and insert the reservation
+        return write_pipeline.execute(
+            partial(
+                insert_reservation,
+                room.id,
+                api_key_user.id,
+                start_time,
+                end_time,
+                expires_at=expires_at,
+            )
         )
-        db.session.add(reservation)
-        db.session.commit()
 
-        return Response(
-            "Reservation created successfully",
-            headers={"reservation_id": reservation.id},
-            status=201,
-        )
+
+def list_user_reservations(user_id, include_history):
+    """
+    List the active reservations of a user, and optionally the archived ones.
+
+    Args:
+        user_id (int): The id of the user.
+        include_history (bool): True to also list the archived reservations.
+
+    Returns:
+        list: The reservation documents.
+    """
+    reservation_list = reads.list_reservations(user_id, datetime.now())
+    if include_history:
+        reservation_list.extend(reads.list_archived_reservations(user_id))
+    return reservation_list
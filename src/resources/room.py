@@ -0,0 +1,386 @@
+"""
+This module contains the implementation of the room resources.
+
+The rooms are read from the room catalog (see room_catalog.py), whose
+snapshots index them by capacity, by location and by attribute, so the
+search never scans the rooms table. The writes are reserved to the admins,
+and every committed change reloads the catalog.
+
+Classes:
+    RoomCollection: A resource class searching the rooms and creating a room.
+    RoomId: A resource class getting, modifying and deleting a room.
+
+Functions:
+    parse_filters: Parse the room search filters of the query string.
+    parse_room: Parse and validate the JSON data of a room.
+"""
+
+from flask import Response, request
+from flask_restful import Resource
+from sqlalchemy.exc import IntegrityError
+
+from .. import db, room_catalog
+from ..decorators import require_admin
+from ..models import Reservation, Room, RoomAttribute
+from ..quotas import release_usage
+
+
+class RoomCollection(Resource):
+    """
+    Resource class for searching the rooms or creating a new room.
+
+    Attributes:
+        None
+
+    Methods:
+        get(self): Handle GET requests to search the rooms.
+        post(self): Handle POST requests to create a room.
+    """
+
+    def get(self):
+        """
+        Search the rooms by minimum capacity, location and attributes.
+
+        All the filters are optional, and a room must match all of them.
+
+        Returns:
+            Response: The matching rooms, by id, with status code 200.
+        ---
+        tags:
+          - Rooms
+        parameters:
+          - in: query
+            name: min_capacity
+            required: false
+            schema:
+              type: integer
+              example: 6
+            description: The minimum capacity of the rooms
+          - in: query
+            name: location
+            required: false
+            schema:
+              type: string
+              example: "Building A"
+            description: The location of the rooms
+          - in: query
+            name: attribute
+            required: false
+            schema:
+              type: array
+              items:
+                type: string
+              example: ["projector", "whiteboard"]
+            description: An attribute the rooms must have, repeatable
+        responses:
+          200:
+            description: The matching rooms.
+          400:
+            description: Bad Request - The minimum capacity is not a positive integer.
+        """
+        filters = parse_filters()
+        if isinstance(filters, Response):
+            return filters
+        rooms = room_catalog.snapshot().search(**filters)
+        return [room.serialize() for room in rooms], 200
+
+    @require_admin
+    def post(self):
+        """
+        Create a new room. Requires an admin API key in the 'Api-key' header.
+
+        Returns:
+            Response: The response object with the appropriate status code and headers.
+        ---
+        tags:
+          - Rooms
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: Api-key corresponding to an admin account.
+          - in: body
+            name: body
+            schema:
+              id: Room
+              required:
+                - room_name
+                - capacity
+              properties:
+                room_name:
+                  type: string
+                  description: The unique name of the room
+                capacity:
+                  type: integer
+                  description: The people capacity of the room
+                max_time:
+                  type: integer
+                  description: The longest possible reservation in minutes, 180 by default
+                location:
+                  type: string
+                  description: The building or floor of the room
+                attributes:
+                  type: array
+                  items:
+                    type: string
+                  description: The equipment of the room
+        responses:
+          201:
+            description: Room created successfully
+            headers:
+              room_id:
+                description: The id of the newly created room.
+                schema:
+                  type: integer
+          400:
+            description: Bad Request - The JSON data is malformed, or a field is missing or invalid.
+          401:
+            description: Unauthorized - The Api-key does not belong to an admin.
+          409:
+            description: Conflict - A room with this name already exists.
+          415:
+            description: Unsupported Media Type - The request is not in JSON format.
+        """
+        data = parse_room(required=("room_name", "capacity"))
+        if isinstance(data, Response):
+            return data
+
+        room = Room(
+            room_name=data["room_name"],
+            capacity=data["capacity"],
+            max_time=data.get("max_time", 180),
+            location=data.get("location"),
+        )
+        room.attributes = [
+            RoomAttribute(name=name) for name in data.get("attributes", ())
+        ]
+        try:
+            db.session.add(room)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return Response("Room name already exists", status=409)
+
+        return Response(headers={"room_id": room.id}, status=201)
+
+
+class RoomId(Resource):
+    """
+    Resource class for getting, modifying or deleting a room.
+
+    Attributes:
+        None
+
+    Methods:
+        get(self, room): Handle GET requests to get a room.
+        put(self, room): Handle PUT requests to modify a room.
+        delete(self, room): Handle DELETE requests to delete a room.
+    """
+
+    def get(self, room):
+        """
+        Get a room.
+
+        Args:
+            room (CachedRoom): The room, from the room converter.
+
+        Returns:
+            Response: The room, with status code 200.
+        ---
+        tags:
+          - Rooms
+        parameters:
+          - in: path
+            name: room
+            type: integer
+            required: true
+            description: The id of the room.
+        responses:
+          200:
+            description: The room.
+          404:
+            description: Not Found - There is no room with this id.
+        """
+        return room.serialize(), 200
+
+    @require_admin
+    def put(self, room):
+        """
+        Modify a room. Requires an admin API key in the 'Api-key' header.
+
+        Only the given fields are modified, and the given attributes replace
+        the attributes of the room.
+
+        Args:
+            room (CachedRoom): The room, from the room converter.
+
+        Returns:
+            Response: The response object with the appropriate status code.
+        ---
+        tags:
+          - Rooms
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: Api-key corresponding to an admin account.
+          - in: path
+            name: room
+            type: integer
+            required: true
+            description: The id of the room.
+          - in: body
+            name: body
+            schema:
+              $ref: '#/definitions/Room'
+        responses:
+          204:
+            description: Room modified successfully
+          400:
+            description: Bad Request - The JSON data is malformed, or a field is invalid.
+          401:
+            description: Unauthorized - The Api-key does not belong to an admin.
+          404:
+            description: Not Found - There is no room with this id.
+          409:
+            description: Conflict - A room with this name already exists.
+          415:
+            description: Unsupported Media Type - The request is not in JSON format.
+        """
+        data = parse_room(required=())
+        if isinstance(data, Response):
+            return data
+
+        row = db.session.get(Room, room.id)
+        if row is None:
+            return Response("Room not found", status=404)
+        for field in ("room_name", "capacity", "max_time", "location"):
+            if field in data:
+                setattr(row, field, data[field])
+        if "attributes" in data:
+            kept = {attribute.name: attribute for attribute in row.attributes}
+            row.attributes = [
+                kept.get(name) or RoomAttribute(name=name) for name in data["attributes"]
+            ]
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return Response("Room name already exists", status=409)
+
+        return Response(status=204)
+
+    @require_admin
+    def delete(self, room):
+        """
+        Delete a room, with its reservations and waitlist entries.
+
+        Requires an admin API key in the 'Api-key' header.
+
+        Args:
+            room (CachedRoom): The room, from the room converter.
+
+        Returns:
+            Response: The response object with the appropriate status code.
+        ---
+        tags:
+          - Rooms
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: Api-key corresponding to an admin account.
+          - in: path
+            name: room
+            type: integer
+            required: true
+            description: The id of the room.
+        responses:
+          204:
+            description: Room deleted successfully
+          401:
+            description: Unauthorized - The Api-key does not belong to an admin.
+          404:
+            description: Not Found - There is no room with this id.
+        """
+        row = db.session.get(Room, room.id)
+        if row is None:
+            return Response("Room not found", status=404)
+        # The reservations are deleted by the database, without the mapper events
+        release_usage([Reservation.room_id == room.id])
+        db.session.delete(row)
+        db.session.commit()
+
+        return Response(status=204)
+
+
+def parse_filters():
+    """
+    Parse the room search filters of the query string.
+
+    Returns:
+        dict: The keyword arguments of Snapshot.search, or a Response with
+        status code 400 when the minimum capacity is invalid.
+    """
+    min_capacity = request.args.get("min_capacity")
+    if min_capacity is not None:
+        try:
+            min_capacity = int(min_capacity)
+        except ValueError:
+            min_capacity = 0
+        if min_capacity <= 0:
+            return Response("min_capacity must be a positive integer.", status=400)
+    return {
+        "min_capacity": min_capacity,
+        "location": request.args.get("location") or None,
+        "attributes": [name for name in request.args.getlist("attribute") if name],
+    }
+
+
+def parse_room(required):
+    """
+    Parse and validate the JSON data of a room.
+
+    Args:
+        required (tuple): The fields which must be given.
+
+    Returns:
+        dict: The given fields, or a Response with the error status code.
+    """
+    if not request.is_json:
+        return Response("Request must be in JSON format.", status=415)
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return Response("Error parsing JSON data", status=400)
+
+    missing = [field for field in required if data.get(field) in (None, "")]
+    if missing:
+        return Response(f"Missing fields: {', '.join(missing)}", status=400)
+
+    room = {}
+    if "room_name" in data:
+        if not isinstance(data["room_name"], str) or not data["room_name"].strip():
+            return Response("room_name must be a non-empty string.", status=400)
+        room["room_name"] = data["room_name"].strip()
+    for field in ("capacity", "max_time"):
+        if field in data:
+            value = data[field]
+            if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+                return Response(f"{field} must be a positive integer.", status=400)
+            room[field] = value
+    if "location" in data:
+        if data["location"] is not None and not isinstance(data["location"], str):
+            return Response("location must be a string.", status=400)
+        room["location"] = (data["location"] or "").strip() or None
+    if "attributes" in data:
+        attributes = data["attributes"]
+        if not isinstance(attributes, list) or not all(
+            isinstance(name, str) and name.strip() for name in attributes
+        ):
+            return Response("attributes must be a list of names.", status=400)
+        room["attributes"] = sorted({name.strip() for name in attributes})
+    return room
@@ -12,6 +12,8 @@ Classes:
     the available rooms in th especified date and time with the specified duration.
 
 Functions:
+    find_available_rooms: Helper function which
+     returns the rooms available at a specific datetime.
     is_room_available: Helper function which
      returns if a room is available in a specific timespan.
 """
@@ -20,8 +22,11 @@ from datetime import datetime, timedelta
 
 from flask import Response, request
 from flask_restful import Resource
+from sqlalchemy import func
 
-from ..models import Room
+from .. import db, room_catalog, singleflight
+from ..models import Reservation, to_minutes
+from .room import parse_filters
 
 
 class RoomsAvailable(Resource):
@@ -51,6 +56,8 @@ class RoomsAvailable(Resource):
         returning a list of all the available rooms. A duration parameter is optional,
         and if it is not inputed, the maximun time of the
         room will be taken as the desired duration of the reservation.
+        The rooms can be filtered like in the room search, before checking
+        their reservations.
 
         Returns:
             Response: JSON response with available
@@ -82,6 +89,29 @@ class RoomsAvailable(Resource):
               type: integer
               example: 120
             description: Optional duration of the reservation in minutes
+          - in: query
+            name: min_capacity
+            required: false
+            schema:
+              type: integer
+              example: 6
+            description: Optional minimum capacity of the rooms
+          - in: query
+            name: location
+            required: false
+            schema:
+              type: string
+              example: "Building A"
+            description: Optional location of the rooms
+          - in: query
+            name: attribute
+            required: false
+            schema:
+              type: array
+              items:
+                type: string
+              example: ["projector"]
+            description: Optional attribute the rooms must have, repeatable
         responses:
           200:
             description: List of available rooms retrieved successfully.
@@ -115,14 +145,24 @@ class RoomsAvailable(Resource):
                           max_time:
                             type: integer
                             description: The longest possible reservation in minutes.
+                          location:
+                            type: string
+                            description: The building or floor of the room.
+                          attributes:
+                            type: array
+                            items:
+                              type: string
+                            description: The equipment of the room.
                         example:
                           id: 4
                           room_name: "Conference room 1"
                           capacity: 9
                           max_time: 120
+                          location: "Building A"
+                          attributes: ["projector"]
           400:
             description:
-            Bad Request - Invalid date, time, or duration parameter provided.
+              Bad Request - Invalid date, time, duration or min_capacity parameter provided.
         """
 
         # Parse query parameters
@@ -149,16 +189,22 @@ class RoomsAvailable(Resource):
             except ValueError:
                 return Response("Duration must be a positive integer.", status=400)
 
-        # Query all rooms
-        rooms = Room.query.all()
+        filters = parse_filters()
+        if isinstance(filters, Response):
+            return filters
 
-        # List to store available rooms
-        available_rooms = []
-
-        # Check availability for each room
-        for room in rooms:
-            if is_room_available(room, search_datetime, duration):
-                available_rooms.append(room.serialize())
+        # Concurrent identical requests share one scan, see singleflight.py
+        available_rooms = singleflight.coalesce(
+            "rooms_available",
+            (
+                search_datetime.isoformat(),
+                duration or 0,
+                filters["min_capacity"],
+                filters["location"],
+                tuple(sorted(filters["attributes"])),
+            ),
+            lambda: find_available_rooms(search_datetime, duration, **filters),
+        )
 
         # Example response format
         response_data = {"date": date, "time": time, "available_rooms": available_rooms}
@@ -166,6 +212,59 @@ class RoomsAvailable(Resource):
         return response_data, 200
 
 
+def find_available_rooms(
+    start_datetime, duration, min_capacity=None, location=None, attributes=()
+):
+    """
+    Find the rooms available at the specified datetime.
+
+    The rooms are taken from the room catalog, filtered by its indexes, and
+    the reservations are read with a single query: the earliest start of
+    the active reservations of every room still running at the start time,
+    up to the longest interval checked. A room is busy when it starts before
+    the end of the interval of the room. The conditions are the ones of
+    is_room_available. When the rooms are filtered, the query only reads the
+    reservations of the remaining rooms.
+
+    Args:
+        start_datetime (datetime): Start datetime of the availability check.
+        duration (int): Desired duration in minutes, None for the max time of each room.
+        min_capacity (int, optional): The minimum capacity of the rooms.
+        location (str, optional): The location of the rooms.
+        attributes (iterable): The attributes that the rooms must all have.
+
+    Returns:
+        list: The serialized available rooms.
+    """
+    filtered = min_capacity is not None or location is not None or bool(attributes)
+    rooms = room_catalog.snapshot().search(min_capacity, location, attributes)
+    if duration:
+        rooms = [room for room in rooms if room.max_time >= duration]
+    if not rooms:
+        return []
+    start_minute = to_minutes(start_datetime)
+    longest = duration or max(room.max_time for room in rooms)
+    conditions = [
+        Reservation.end_minute > start_minute,
+        Reservation.start_minute < start_minute + longest,
+        Reservation.active_clause(datetime.now()),
+    ]
+    if filtered:
+        conditions.append(Reservation.room_id.in_([room.id for room in rooms]))
+    first_starts = dict(
+        db.session.query(Reservation.room_id, func.min(Reservation.start_minute))
+        .filter(*conditions)
+        .group_by(Reservation.room_id)
+        .all()
+    )
+    return [
+        room.serialize()
+        for room in rooms
+        if first_starts.get(room.id, start_minute + longest)
+        >= start_minute + (duration or room.max_time)
+    ]
+
+
 def is_room_available(room, start_datetime, duration):
     """
     Check if the room is available within the specified datetime range.
@@ -187,12 +286,14 @@ def is_room_available(room, start_datetime, duration):
         end_datetime = start_datetime + timedelta(minutes=duration)
 
     # Check if there are any reservations
-    # that overlap with the specified datetime range
-    for reservation in room.reservations:
-        if (
-            reservation.start_time < end_datetime
-            and reservation.end_time > start_datetime
-        ):
-            return False
+    # that overlap with the specified datetime range, ignoring the expired holds
+    overlapping = db.session.query(
+        Reservation.query.filter(
+            Reservation.room_id == room.id,
+            Reservation.end_minute > to_minutes(start_datetime),
+            Reservation.start_minute < to_minutes(end_datetime),
+            Reservation.active_clause(datetime.now()),
+        ).exists()
+    ).scalar()
 
-    return True
+    return not overlapping
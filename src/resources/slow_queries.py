@@ -0,0 +1,70 @@
+"""
+This module contains the implementation of the SlowQueries resource.
+
+The SlowQueries resource returns the last slow queries of the process
+serving the request, with their query plans, for the administrators.
+
+Classes:
+    SlowQueries: A resource class returning the last slow queries.
+"""
+
+from flask import current_app
+from flask_restful import Resource
+
+from .. import slow_queries
+from ..decorators import require_admin
+
+
+class SlowQueries(Resource):
+    """
+    Resource class returning the last slow queries of the process.
+
+    Attributes:
+        None
+
+    Methods:
+        get(self): Handle GET requests to retrieve the slow queries.
+    """
+
+    @require_admin
+    def get(self):
+        """
+        Handle GET requests to retrieve the last slow queries of the process.
+
+        Returns:
+            Response: The slow queries, newest first, with status code 200.
+
+        Retrieve the last slow queries of the process serving the request.
+        ---
+        tags:
+          - Metrics
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: Api-key corresponding to an admin account.
+        responses:
+          200:
+            description: The slow queries, newest first.
+            content:
+              application/json:
+                example:
+                  - time: 1718900000.5
+                    duration_ms: 212.4
+                    endpoint: reservationcollection
+                    statement: "SELECT reservation.id FROM reservation
+                      WHERE reservation.room_id = ? AND reservation.end_minute >= ?
+                      AND reservation.start_minute <= ? LIMIT ? OFFSET ?"
+                    parameters:
+                      count: 5
+                      types: [int, int, int, int, int]
+                    executemany: false
+                    query_plan:
+                      - SEARCH reservation USING INDEX ix_reservation_room_end_start
+                        (room_id=? AND end_minute>?)
+                    full_scan: false
+          401:
+            description: The provided Api-key does not belong to an admin account.
+        """
+        return slow_queries.entries(current_app), 200
@@ -8,12 +8,14 @@ Classes:
     UserResource: A resource class for seeing, modifying, and deleting existing users.
 """
 
+from datetime import datetime
+
 from flask import Response, request
 from flask_restful import Resource
 from sqlalchemy.exc import IntegrityError
 
-from .. import db
-from ..decorators import require_user
+from .. import db, reads
+from ..decorators import require_user, require_user_row
 from ..models import User
 from .user_collection import is_valid_email
 
@@ -56,7 +58,7 @@ class UserId(Resource):
         delete(user_id): Handle DELETE requests to remove a specific user.
     """
 
-    @require_user
+    @require_user_row
     def get(self, api_key_user, user_id):
         """
         Handle GET requests to retrieve information about a specific user.
@@ -96,11 +98,21 @@ class UserId(Resource):
                       email:
                         type: string
                         description: The user's email address
+                      usage:
+                        type: object
+                        description: The usage counted by the quotas.
+                        properties:
+                          active-reservations:
+                            type: integer
+                            description: The number of current reservations and holds.
+                          week-minutes:
+                            type: integer
+                            description: The minutes booked in the current week.
             400:
               description: Bad Request - The user_id parameter is missing or invalid.
             401:
               description: Unauthorized -
-              The provided api-key does not belong to the user_id provided.
+                The provided api-key does not belong to the user_id provided.
             404:
               description: Not Found - No user exists with the specified user_id.
 
@@ -109,8 +121,8 @@ class UserId(Resource):
         if not is_valid:
             return response
 
-        user = User.query.filter_by(id=user_id).first()
-        if user is None:
+        user_data = reads.get_user(response)
+        if user_data is None:
             return Response("User not found", status=404)
         # Check that the api-key corresponds to the user.
         if api_key_user.id != int(user_id):
@@ -119,7 +131,7 @@ class UserId(Resource):
                 status=401,
             )
 
-        user_data = user.serialize()
+        user_data["usage"] = reads.get_usage(api_key_user.id, datetime.now())
         return user_data, 200
 
     @require_user
@@ -162,20 +174,20 @@ class UserId(Resource):
         responses:
           200:
             description:
-            User updated successfully.
+              User updated successfully.
           400:
             description:
-            Bad Request - The user_id parameter is missing or invalid,
+              Bad Request - The user_id parameter is missing or invalid,
                         or no username or email provided.
           401:
             description:
-            Unauthorized - The provided api-key does not belong to the user_id provided.
+              Unauthorized - The provided api-key does not belong to the user_id provided.
           404:
             description:
-            Not Found - No user exists with the specified user_id.
+              Not Found - No user exists with the specified user_id.
           409:
             description:
-            Conflict - The email provided is in an incorrect format
+              Conflict - The email provided is in an incorrect format
                         or the username already exists.
         """
         is_valid, response = validate_user_id(user_id)
@@ -241,7 +253,7 @@ class UserId(Resource):
             description: Bad Request - The user_id parameter is missing or invalid.
           401:
             description:
-            Unauthorized - The provided api-key does not belong to the user_id provided.
+              Unauthorized - The provided api-key does not belong to the user_id provided.
           404:
             description: Not Found - No user exists with the specified user_id.
         """
@@ -260,6 +272,8 @@ class UserId(Resource):
                 status=401,
             )
 
-        db.session.delete(user)
+        # One statement, the database deletes the reservations, API keys
+        # and waitlist entries of the user through ON DELETE CASCADE.
+        User.query.filter_by(id=user.id).delete(synchronize_session=False)
         db.session.commit()
         return Response("User deleted successfully", status=200)
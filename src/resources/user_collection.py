@@ -23,8 +23,9 @@ from flask import Response, request
 from flask_restful import Resource
 from sqlalchemy.exc import IntegrityError
 
-from .. import db
+from .. import db, tenancy
 from ..decorators import require_admin, require_user
+from ..idempotency import idempotent
 from ..models import ApiKey, User
 
 
@@ -74,6 +75,7 @@ class UserCollection(Resource):
 
         return users_list, 200
 
+    @idempotent
     def post(self):
         """
         Handle POST requests to create a new user.
@@ -86,6 +88,12 @@ class UserCollection(Resource):
         tags:
           - User
         parameters:
+          - in: header
+            name: Idempotency-Key
+            type: string
+            required: false
+            description: Optional key to safely retry the request.
+              A retry with the same key returns the stored response, without the api-key header.
           - in: body
             name: body
             schema:
@@ -114,16 +122,19 @@ class UserCollection(Resource):
                   type: integer
           400:
             description:
-            Bad Request - The JSON data provided is malformed
-            or missing required fields (email, username).
+              Bad Request - The JSON data provided is malformed
+              or missing required fields (email, username).
           409:
             description:
-            Conflict - Conflict - The email provided is not in a
-            valid format or the username already exists.
+              Conflict - Conflict - The email provided is not in a
+              valid format or the username already exists.
           415:
             description:
-            Unsupported Media Type - The content type of
-            the request is not supported. Ensure you are sending JSON data.
+              Unsupported Media Type - The content type of
+              the request is not supported. Ensure you are sending JSON data.
+          422:
+            description:
+              Unprocessable Entity - The Idempotency-Key was already used with a different request.
 
         """
         if not request.is_json:
@@ -145,7 +156,7 @@ class UserCollection(Resource):
             return Response("Incorrect email format", status=409)
 
         user = User(username=username, email=email)
-        token = ApiKey.create_token()
+        token = tenancy.tenant_token(ApiKey.create_token())
         api_key = ApiKey(key=ApiKey.key_hash(token), user=user)
 
         # Add instances to the database
@@ -0,0 +1,401 @@
+"""
+This module contains the implementation of the Waitlist resources.
+
+A user whose wanted time slot is taken can join the waitlist of the room
+for that interval, instead of polling the available rooms. When the
+interval is freed by a cancellation, a modification or an expired hold,
+the entries are promoted to reservations in the order they joined
+(see promote_waitlist in the reservation module).
+
+Classes:
+    WaitlistCollection: A resource class for joining the waitlist and
+    getting the list of the waitlist entries of a user.
+    WaitlistEntryId: A resource class for seeing and leaving a waitlist entry.
+"""
+
+from datetime import datetime, timedelta
+
+from flask import Response, request
+from flask_restful import Resource
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from .. import db, room_catalog
+from ..decorators import require_user
+from ..models import WaitlistEntry
+from .reservation import check_overlapping_reservations, validate_user_id
+
+
+def check_api_key_user(api_key_user, user_id):
+    """
+    Check that the api-key corresponds to the user.
+
+    Args:
+        api_key_user (User): The user associated with the provided API key.
+        user_id (int): The unique identifier of the user.
+
+    Returns:
+        Response: An error response if the API key does not match the user_id, None otherwise.
+    """
+    if api_key_user.id != user_id:
+        return Response(
+            "The provided Api-key does not correspond to the user_id provided.",
+            status=401,
+        )
+    return None
+
+
+def get_user_entry(api_key_user, user_id, entry_id):
+    """
+    Validate the path parameters and get the waitlist entry of the user.
+
+    Args:
+        api_key_user (User): The user associated with the provided API key.
+        user_id (str): The unique identifier of the user.
+        entry_id (str): The unique identifier of the waitlist entry.
+
+    Returns:
+        tuple: The waitlist entry and None, or None and an error response.
+    """
+    user_id = validate_user_id(user_id)
+    if isinstance(user_id, Response):
+        return None, user_id
+    response = check_api_key_user(api_key_user, user_id)
+    if response:
+        return None, response
+    try:
+        entry_id = int(entry_id)
+        if entry_id <= 0:
+            return None, Response("Invalid entry_id parameter", status=400)
+    except ValueError:
+        return None, Response("Invalid entry_id parameter", status=400)
+
+    entry = db.session.get(WaitlistEntry, entry_id)
+    if entry is None:
+        return None, Response(
+            "No waitlist entry found with the provided entry_id.", status=404
+        )
+    if entry.user_id != user_id:
+        return None, Response(
+            "Waitlist entry does not belong to the provided user_id.", status=403
+        )
+    return entry, None
+
+
+class WaitlistCollection(Resource):
+    """
+    Resource class for joining the waitlist of a room or getting
+    the list of the waitlist entries of a user.
+
+    Attributes:
+        None
+
+    Methods:
+        get(user_id): Handles the GET request for returning the waitlist entries of the user.
+        post(user_id): Handles the POST request for joining a waitlist.
+    """
+
+    @require_user
+    def get(self, api_key_user, user_id):
+        """
+        Retrieve all the waitlist entries of a given user.
+
+        Args:
+            api_key_user (User): The user associated with the provided API key.
+            user_id (int): The unique identifier of the user.
+
+        Returns:
+            Response: A list of the waitlist entries of the user,
+            or an error message with the appropriate status code.
+
+        ---
+        tags:
+          - Waitlist
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: The API key of the user.
+          - in: path
+            name: user_id
+            type: integer
+            required: true
+            description: The unique identifier of the user.
+        responses:
+          200:
+            description: A list of the waitlist entries of the user.
+          400:
+            description: Invalid user_id parameter.
+          401:
+            description: The provided API key
+              does not correspond to the user_id provided.
+        """
+        user_id = validate_user_id(user_id)
+        if isinstance(user_id, Response):
+            return user_id
+        response = check_api_key_user(api_key_user, user_id)
+        if response:
+            return response
+
+        # Load the rooms in the same query, not one query per entry
+        entries = (
+            WaitlistEntry.query.filter_by(user_id=user_id)
+            .options(joinedload(WaitlistEntry.room))
+            .order_by(WaitlistEntry.start_time)
+        )
+        return [entry.serialize() for entry in entries], 200
+
+    @require_user
+    def post(self, api_key_user, user_id):
+        """
+        Join the waitlist of a room for a time slot which is already taken.
+
+        The request body has the same fields as a new reservation. When the
+        slot is freed, the entry is turned into a reservation automatically.
+
+        Args:
+            api_key_user (User): The user associated with the provided API key.
+            user_id (int): The unique identifier of the user.
+
+        Returns:
+            Response: A success message with status 201 and the entry_id header,
+            or an error message with the appropriate status code.
+
+        ---
+        tags:
+          - Waitlist
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: The API key of the user.
+          - in: path
+            name: user_id
+            type: integer
+            required: true
+            description: The unique identifier of the user.
+          - in: body
+            name: entry
+            description: The wanted time slot.
+            schema:
+              type: object
+              required:
+                - date
+                - start-time
+                - end-time
+                - roomId
+              properties:
+                date:
+                  type: string
+                  format: date
+                  example: "2023-05-28"
+                start-time:
+                  type: string
+                  format: time
+                  example: "10:00"
+                end-time:
+                  type: string
+                  format: time
+                  example: "11:00"
+                roomId:
+                  type: integer
+                  example: 1
+        responses:
+          201:
+            description: Joined the waitlist successfully.
+            headers:
+              entry_id:
+                description: The id of the new waitlist entry.
+                schema:
+                  type: integer
+          400:
+            description: Invalid user_id parameter, or missing/invalid time slot.
+          401:
+            description: The provided API key
+              does not correspond to the user_id provided.
+          404:
+            description: No room found with the roomId provided.
+          409:
+            description: The time slot is in the past, too long, available
+              or the user already waits for it.
+          415:
+            description: The request body must be in JSON format.
+        """
+        user_id = validate_user_id(user_id)
+        if isinstance(user_id, Response):
+            return user_id
+        response = check_api_key_user(api_key_user, user_id)
+        if response:
+            return response
+
+        if not request.is_json:
+            return Response("Request must be in JSON format.", status=415)
+        try:
+            data = request.get_json(force=True)
+            entry_date = data.get("date")
+            start_time = data.get("start-time")
+            end_time = data.get("end-time")
+            room_id = data.get("roomId")
+        except Exception:  # pylint: disable=broad-except
+            return Response("Error parsing JSON data", status=400)
+
+        if not entry_date or not start_time or not end_time or not room_id:
+            return Response(
+                "date, start-time, end-time and roomId are required", status=400
+            )
+
+        room = room_catalog.get(room_id)
+        if not room:
+            return Response("No room found with the provided room id.", status=404)
+
+        try:
+            entry_date = datetime.strptime(entry_date, "%Y-%m-%d").date()
+            start_time = datetime.combine(
+                entry_date, datetime.strptime(start_time, "%H:%M").time()
+            )
+            end_time = datetime.combine(
+                entry_date, datetime.strptime(end_time, "%H:%M").time()
+            )
+            if end_time.time() <= start_time.time():
+                end_time += timedelta(days=1)
+        except Exception:  # pylint: disable=broad-except
+            return Response(
+                "Invalid date or time format. Date format: YYYY-MM-DD. Time format: HH:MM",
+                status=400,
+            )
+
+        if start_time < datetime.now():
+            return Response("Cannot book past time slots", status=409)
+        if (end_time - start_time).total_seconds() // 60 > room.max_time:
+            return Response("Reservation is too long.", status=409)
+        if not check_overlapping_reservations(room, start_time, end_time):
+            return Response(
+                "The time slot is available, book it instead.", status=409
+            )
+
+        entry = WaitlistEntry(
+            room_id=room.id, user_id=user_id, start_time=start_time, end_time=end_time
+        )
+        try:
+            db.session.add(entry)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return Response("Already in the waitlist for this time slot.", status=409)
+
+        return Response(
+            "Joined the waitlist successfully",
+            headers={"entry_id": entry.id},
+            status=201,
+        )
+
+
+class WaitlistEntryId(Resource):
+    """
+    Resource class for seeing and leaving a waitlist entry.
+
+    Attributes:
+        None
+
+    Methods:
+        get(user_id, entry_id): Handles the GET request for returning a waitlist entry.
+        delete(user_id, entry_id): Handles the DELETE request for leaving the waitlist.
+    """
+
+    @require_user
+    def get(self, api_key_user, user_id, entry_id):
+        """
+        Retrieve a waitlist entry of a given user.
+
+        Args:
+            api_key_user (User): The user associated with the provided API key.
+            user_id (int): The unique identifier of the user.
+            entry_id (int): The unique identifier of the waitlist entry.
+
+        Returns:
+            Response: The waitlist entry, or an error message with the appropriate status code.
+
+        ---
+        tags:
+          - Waitlist
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: The API key of the user.
+          - in: path
+            name: user_id
+            type: integer
+            required: true
+          - in: path
+            name: entry_id
+            type: integer
+            required: true
+        responses:
+          200:
+            description: The waitlist entry.
+          400:
+            description: Invalid user_id or entry_id parameter.
+          401:
+            description: The provided API key does not correspond to the user_id provided.
+          403:
+            description: Waitlist entry does not belong to the provided user_id.
+          404:
+            description: No waitlist entry found with the provided entry_id.
+        """
+        entry, response = get_user_entry(api_key_user, user_id, entry_id)
+        if response:
+            return response
+        return entry.serialize(), 200
+
+    @require_user
+    def delete(self, api_key_user, user_id, entry_id):
+        """
+        Leave the waitlist.
+
+        Args:
+            api_key_user (User): The user associated with the provided API key.
+            user_id (int): The unique identifier of the user.
+            entry_id (int): The unique identifier of the waitlist entry.
+
+        Returns:
+            Response: A success message, or an error message with the appropriate status code.
+
+        ---
+        tags:
+          - Waitlist
+        parameters:
+          - in: header
+            name: Api-key
+            type: string
+            required: true
+            description: The API key of the user.
+          - in: path
+            name: user_id
+            type: integer
+            required: true
+          - in: path
+            name: entry_id
+            type: integer
+            required: true
+        responses:
+          200:
+            description: Waitlist entry deleted successfully.
+          400:
+            description: Invalid user_id or entry_id parameter.
+          401:
+            description: The provided API key does not correspond to the user_id provided.
+          403:
+            description: Waitlist entry does not belong to the provided user_id.
+          404:
+            description: No waitlist entry found with the provided entry_id.
+        """
+        entry, response = get_user_entry(api_key_user, user_id, entry_id)
+        if response:
+            return response
+        db.session.delete(entry)
+        db.session.commit()
+        return Response("Waitlist entry deleted successfully", status=200)
@@ -0,0 +1,382 @@
+"""
+This module contains the in-process catalog of the rooms.
+
+The rooms almost never change, but the URL converter, the bookings, the
+modifications, the waitlist and the availability checks all need them.
+Instead of querying them on every request, they are read from a snapshot
+of the rooms of the database: an immutable object indexing the rooms by
+id, by name, by capacity, by location and by attribute. A snapshot is
+never modified, a reload builds a new one and replaces the reference to
+the old one, so the readers never see a partly loaded catalog and need no
+lock.
+
+Every change of the rooms increments the version of the "rooms" catalog
+(see CatalogVersion) in its own transaction. The process which made the
+change drops its snapshot when the transaction commits, and the other
+processes compare their version with the one of the database at most every
+ROOM_CATALOG_CHECK_INTERVAL seconds (0 to compare on every lookup). The
+rooms changed outside the application are reloaded after:
+
+    flask --app src.api bump-room-catalog
+
+There is one snapshot per tenant (see tenancy.py).
+
+Classes:
+- CachedRoom: An immutable room of the catalog.
+- Snapshot: The rooms of a database at a version.
+- RoomCatalog: The snapshots of the tenants of the application.
+
+Functions:
+- init_app(app): Creates the room catalog of the application.
+- snapshot(): Gets the current snapshot of the rooms.
+- get(room_id): Gets a room by id.
+- bump_version(connection): Increments the version of the rooms catalog.
+- stats(app): Gets the state of the catalog of the application.
+"""
+
+import bisect
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+import click
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import db, tenancy
+from .models import CatalogVersion, Room, RoomAttribute
+
+CATALOG = "rooms"
+
+
+def init_app(app):
+    """
+    Create the room catalog of the application, and add the bump-room-catalog command.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    app.extensions["room_catalog"] = RoomCatalog(app.config["ROOM_CATALOG_CHECK_INTERVAL"])
+
+    @app.cli.command("bump-room-catalog")
+    def bump_room_catalog_command():
+        """Make every process reload its room catalog."""
+        with db.engine.begin() as connection:
+            bump_version(connection)
+        click.echo("Room catalog version incremented.")
+
+
+class CachedRoom(
+    namedtuple("CachedRoom", "id room_name capacity max_time location attributes")
+):
+    """
+    An immutable room of the catalog, with the attributes of Room.
+
+    The attributes of the room are a tuple of names, sorted.
+
+    Methods:
+        serialize(): Serializes the room like Room.serialize.
+    """
+
+    __slots__ = ()
+
+    def serialize(self):
+        """
+        Serialize the room into a dictionary, like Room.serialize.
+
+        Returns:
+            dict: A dictionary representation of the room.
+        """
+        doc = self._asdict()
+        doc["attributes"] = list(self.attributes)
+        return doc
+
+
+class Snapshot:
+    """
+    The rooms of a database at a version.
+
+    Attributes:
+        version (int): The version of the rooms catalog.
+        rooms (tuple): The rooms, by id.
+        by_id (Mapping): The rooms by id.
+        by_name (Mapping): The rooms by name.
+        by_location (Mapping): The rooms of every location, by id.
+        by_attribute (Mapping): The ids of the rooms having every attribute.
+
+    Methods:
+        with_capacity(min_capacity): Gets the rooms with at least a capacity.
+        search(min_capacity, location, attributes): Gets the rooms matching filters.
+    """
+
+    def __init__(self, version, rooms):
+        self.version = version
+        self.rooms = tuple(sorted(rooms, key=lambda room: room.id))
+        self.by_id = MappingProxyType({room.id: room for room in self.rooms})
+        self.by_name = MappingProxyType({room.room_name: room for room in self.rooms})
+        self._by_capacity = tuple(sorted(self.rooms, key=lambda room: room.capacity))
+        self._capacities = tuple(room.capacity for room in self._by_capacity)
+        by_location = {}
+        by_attribute = {}
+        for room in self.rooms:
+            by_location.setdefault(room.location, []).append(room)
+            for attribute in room.attributes:
+                by_attribute.setdefault(attribute, set()).add(room.id)
+        self.by_location = MappingProxyType(
+            {location: tuple(rooms) for location, rooms in by_location.items()}
+        )
+        self.by_attribute = MappingProxyType(
+            {attribute: frozenset(ids) for attribute, ids in by_attribute.items()}
+        )
+
+    def with_capacity(self, min_capacity):
+        """
+        Get the rooms with at least a capacity.
+
+        Args:
+            min_capacity (int): The minimum capacity.
+
+        Returns:
+            tuple: The rooms, by capacity.
+        """
+        return self._by_capacity[bisect.bisect_left(self._capacities, min_capacity):]
+
+    def search(self, min_capacity=None, location=None, attributes=()):
+        """
+        Get the rooms matching all the given filters.
+
+        The most selective index is read first: the rooms of the location,
+        then the rooms with the capacity, whose ids are intersected with
+        the ids of the rooms of every attribute.
+
+        Args:
+            min_capacity (int, optional): The minimum capacity.
+            location (str, optional): The location.
+            attributes (iterable): The attributes that the rooms must all have.
+
+        Returns:
+            tuple: The matching rooms, by id.
+        """
+        if location is not None:
+            rooms = self.by_location.get(location, ())
+            if min_capacity is not None:
+                rooms = [room for room in rooms if room.capacity >= min_capacity]
+        elif min_capacity is not None:
+            rooms = self.with_capacity(min_capacity)
+        else:
+            rooms = self.rooms
+        for attribute in attributes:
+            ids = self.by_attribute.get(attribute, frozenset())
+            rooms = [room for room in rooms if room.id in ids]
+        return tuple(sorted(rooms, key=lambda room: room.id))
+
+
+class RoomCatalog:
+    """
+    The snapshots of the tenants of the application.
+
+    Attributes:
+        check_interval (float): The seconds between two checks of the version.
+
+    Methods:
+        snapshot(): Gets the snapshot of the current tenant.
+        invalidate(tenant): Drops the snapshot of a tenant.
+        stats(): Gets the versions and sizes of the snapshots.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        # Snapshot and time of the last version check, by tenant
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._loads = 0
+
+    def snapshot(self):
+        """
+        Get the snapshot of the current tenant, loading it if it is missing or outdated.
+
+        Returns:
+            Snapshot: The snapshot.
+        """
+        tenant = tenancy.current_tenant()
+        current = self._snapshots.get(tenant)
+        now = time.monotonic()
+        if current is not None and now - current[1] < self.check_interval:
+            return current[0]
+        version = _read_version()
+        if current is not None and current[0].version == version:
+            self._snapshots[tenant] = (current[0], now)
+            return current[0]
+        with self._lock:
+            # Another thread may have loaded it meanwhile
+            current = self._snapshots.get(tenant)
+            if current is not None and current[0].version == version:
+                return current[0]
+            loaded = _load(version)
+            self._snapshots[tenant] = (loaded, now)
+            self._loads += 1
+            return loaded
+
+    def invalidate(self, tenant):
+        """
+        Drop the snapshot of a tenant, reloaded by the next lookup.
+
+        Args:
+            tenant (str): The tenant, None for the default database.
+
+        Returns:
+            None
+        """
+        self._snapshots.pop(tenant, None)
+
+    def stats(self):
+        """
+        Get the versions and sizes of the snapshots.
+
+        Returns:
+            dict: The number of loads, and the version and room count of every tenant.
+        """
+        return {
+            "loads": self._loads,
+            "snapshots": {
+                str(tenant): {"version": loaded.version, "rooms": len(loaded.rooms)}
+                for tenant, (loaded, _checked) in list(self._snapshots.items())
+            },
+        }
+
+
+def snapshot():
+    """
+    Get the current snapshot of the rooms of the current tenant.
+
+    Returns:
+        Snapshot: The snapshot.
+    """
+    return current_app.extensions["room_catalog"].snapshot()
+
+
+def get(room_id):
+    """
+    Get a room by id.
+
+    Args:
+        room_id (int or str): The id of the room.
+
+    Returns:
+        CachedRoom: The room, None if there is no room with this id.
+    """
+    try:
+        room_id = int(room_id)
+    except (TypeError, ValueError):
+        return None
+    return snapshot().by_id.get(room_id)
+
+
+def stats(app):
+    """
+    Get the state of the catalog of the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        dict: See RoomCatalog.stats.
+    """
+    return app.extensions["room_catalog"].stats()
+
+
+def bump_version(connection):
+    """
+    Increment the version of the rooms catalog, in the transaction of a connection.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        None
+    """
+    table = CatalogVersion.__table__
+    statement = sqlite_insert(table).values(name=CATALOG, version=1)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=["name"], set_={"version": table.c.version + 1}
+        )
+    )
+
+
+def _read_version():
+    """
+    Read the version of the rooms catalog of the current database.
+    """
+    return db.session.execute(
+        select(CatalogVersion.version).where(CatalogVersion.name == CATALOG)
+    ).scalar() or 0
+
+
+def _load(version):
+    """
+    Load the rooms of the current database in a new snapshot.
+    """
+    table = Room.__table__
+    rows = db.session.execute(
+        select(
+            table.c.id, table.c.room_name, table.c.capacity, table.c.max_time, table.c.location
+        )
+    ).all()
+    attributes = {}
+    attribute_table = RoomAttribute.__table__
+    for room_id, name in db.session.execute(
+        select(attribute_table.c.room_id, attribute_table.c.name).order_by(
+            attribute_table.c.name
+        )
+    ):
+        attributes.setdefault(room_id, []).append(name)
+    return Snapshot(
+        version, [CachedRoom(*row, tuple(attributes.get(row[0], ()))) for row in rows]
+    )
+
+
+@event.listens_for(Room, "after_insert")
+@event.listens_for(Room, "after_update")
+@event.listens_for(Room, "after_delete")
+@event.listens_for(RoomAttribute, "after_insert")
+@event.listens_for(RoomAttribute, "after_delete")
+def _room_changed(_mapper, connection, target):
+    """
+    Increment the version of the catalog in the transaction changing a room
+    or its attributes.
+    """
+    bump_version(connection)
+    session = Session.object_session(target)
+    if session is not None and has_app_context():
+        session.info.setdefault("changed_room_catalogs", set()).add(
+            tenancy.current_tenant()
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_changed_snapshots(session):
+    """
+    Drop the snapshots of the catalogs changed by a committed transaction.
+    """
+    changed = session.info.pop("changed_room_catalogs", None)
+    if not changed or not has_app_context():
+        return
+    catalog = current_app.extensions.get("room_catalog")
+    if catalog is not None:
+        for tenant in changed:
+            catalog.invalidate(tenant)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_changes(session):
+    """
+    Forget the room changes of a rolled back transaction.
+    """
+    session.info.pop("changed_room_catalogs", None)
@@ -0,0 +1,470 @@
+"""
+This module contains the scheduler of the background jobs.
+
+Jobs are registered on the application: periodic jobs run every interval
+seconds, and deferred jobs run once after a delay. The scheduler keeps
+them in a heap ordered by due time. Its dispatcher thread sleeps until
+the earliest due time, then hands the due jobs to a pool of
+SCHEDULER_WORKERS threads. A periodic job is put back in the heap when
+its run is finished, so a slow run never overlaps the next one. A
+periodic job can return the number of seconds before its next run, when
+it knows it is due sooner than its interval, and reschedule brings the
+next run of a job forward.
+
+The threads are started lazily by the first request served by the
+process. This way each process (for example each preforked worker) has
+its own scheduler, and importing or creating the application never starts
+any thread.
+
+When several processes serve the same database, a periodic job only runs
+in the leader of that job. Before each run the process takes or renews
+the lease of the job in its job_lock row, with an upsert which only
+succeeds when the lease expired or already belongs to the process. The
+lease lasts two intervals, so another process takes over when the leader
+stops. Each tenant database has its own lock rows.
+
+Every job counts its runs, failures, skipped runs (led by another process)
+and durations. They are returned to the admins by the metrics endpoint.
+
+Classes:
+- Job: A registered job.
+- Scheduler: Runs the due jobs with a pool of threads.
+
+Functions:
+- init_app(app): Creates the scheduler of the application.
+- register_periodic_job(app, name, interval, func, leader=True): Registers a job that runs every interval seconds.
+- schedule(app, name, delay, func): Runs a job once after delay seconds.
+- reschedule(app, name, delay): Brings the next run of a periodic job forward.
+- start(app): Starts the scheduler in the current process.
+- stop(app): Stops the threads of the scheduler.
+- stats(app): Gets the counters of the jobs.
+- acquire_lease(name, seconds, owner=None): Takes or renews the lease of a job.
+- optimize_database(): Lets SQLite update the statistics of the query planner.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import db, tenancy
+from .models import JobLock
+
+logger = logging.getLogger(__name__)
+
+
+def init_app(app):
+    """
+    Create the scheduler of the application and register the optimize job.
+
+    Args:
+        app (Flask): The application the jobs belong to.
+
+    Returns:
+        None
+    """
+    app.extensions["scheduler"] = Scheduler(app, app.config["SCHEDULER_WORKERS"])
+    register_periodic_job(
+        app, "optimize", app.config["OPTIMIZE_INTERVAL"], optimize_database
+    )
+
+    @app.before_request
+    def _start_scheduler():
+        start(app)
+
+
+def register_periodic_job(app, name, interval, func, leader=True):
+    """
+    Register a job that runs every interval seconds inside an application context.
+
+    The job runs once for the default database and once for each tenant
+    (see tenancy.py), each time in its own application context.
+
+    A job with an interval of None or lower than or equal to 0 is disabled
+    and not registered.
+
+    The function may return the number of seconds before its next run: the
+    job then runs again after the shortest one returned for the tenants,
+    or after interval seconds if it is longer.
+
+    Args:
+        app (Flask): The application the job belongs to.
+        name (str): The unique name of the job, used in the logs and the lock rows.
+        interval (float): The most seconds between two runs.
+        func (callable): The function to run, it takes no arguments.
+        leader (bool): False to run the job in every process instead of the leader only.
+
+    Returns:
+        None
+    """
+    if not interval or interval <= 0:
+        return
+    app.extensions["scheduler"].add(Job(name, func, interval, leader))
+
+
+def schedule(app, name, delay, func):
+    """
+    Run a job once after delay seconds, in the process scheduling it.
+
+    Inside an application context, the job runs for the tenant of the
+    context, otherwise for the default database and every tenant.
+
+    Args:
+        app (Flask): The application the job belongs to.
+        name (str): The name of the job, used in the logs and the counters.
+        delay (float): The number of seconds before the run.
+        func (callable): The function to run, it takes no arguments.
+
+    Returns:
+        None
+    """
+    tenant = tenancy.current_tenant()
+    tenants = [tenant] if tenant is not None else None
+    app.extensions["scheduler"].add(Job(name, func, tenants=tenants), delay)
+
+
+def reschedule(app, name, delay):
+    """
+    Bring the next run of a periodic job forward, to delay seconds from now.
+
+    Nothing changes if the job is due sooner, or if it is not registered.
+
+    Args:
+        app (Flask): The application the job belongs to.
+        name (str): The name of the job.
+        delay (float): The number of seconds before the run.
+
+    Returns:
+        None
+    """
+    app.extensions["scheduler"].reschedule(name, delay)
+
+
+def start(app):
+    """
+    Start the scheduler in the current process.
+
+    The threads are only started once per process, later calls do nothing.
+
+    Args:
+        app (Flask): The application whose scheduler is started.
+
+    Returns:
+        None
+    """
+    app.extensions["scheduler"].start()
+
+
+def stop(app):
+    """
+    Stop the threads of the scheduler, after the runs in progress.
+
+    Args:
+        app (Flask): The application whose scheduler is stopped.
+
+    Returns:
+        None
+    """
+    app.extensions["scheduler"].stop()
+
+
+def stats(app):
+    """
+    Get the counters of the jobs of the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        dict: The counters of every job, by job name.
+    """
+    return app.extensions["scheduler"].stats()
+
+
+def acquire_lease(name, seconds, owner=None):
+    """
+    Take or renew the lease of a job in the database of the current tenant.
+
+    Args:
+        name (str): The name of the job.
+        seconds (float): The duration of the lease.
+        owner (str, optional): The owner of the lease, the host and id of
+        the current process by default.
+
+    Returns:
+        bool: True if the process holds the lease and must run the job.
+    """
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    now = time.time()
+    table = JobLock.__table__
+    statement = sqlite_insert(table).values(
+        name=name, owner=owner, expires_at=now + seconds
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"owner": statement.excluded.owner, "expires_at": statement.excluded.expires_at},
+        where=(table.c.expires_at <= now) | (table.c.owner == owner),
+    )
+    acquired = db.session.execute(statement).rowcount == 1
+    db.session.commit()
+    return acquired
+
+
+def optimize_database():
+    """
+    Let SQLite update the statistics of the query planner.
+
+    Returns:
+        None
+    """
+    db.session.execute(text("PRAGMA optimize"))
+    db.session.commit()
+
+
+class Job:
+    # pylint: disable=too-few-public-methods
+    """
+    A registered job.
+
+    Attributes:
+        name (str): The name of the job.
+        func (callable): The function to run.
+        interval (float): The seconds between two runs, None for a deferred job.
+        leader (bool): True if only the leader of the job runs it.
+        tenants (list): The tenants to run the job for, None for all of them.
+        due (float): The monotonic time of the next run of a periodic job in
+        the heap, None while it runs or before the scheduler starts.
+        sooner (float): The monotonic time of a run requested while the
+        job was not in the heap, None if there is none.
+    """
+
+    def __init__(self, name, func, interval=None, leader=False, tenants=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.leader = leader
+        self.tenants = tenants
+        self.due = None
+        self.sooner = None
+
+
+class Scheduler:
+    """
+    Runs the due jobs with a pool of threads.
+
+    Attributes:
+        app (Flask): The application the jobs belong to.
+        workers (int): The number of threads running the jobs.
+
+    Methods:
+        add(job, delay=None): Adds a job, due after delay or its interval.
+        reschedule(name, delay): Brings the next run of a periodic job forward.
+        start(): Starts the threads in the current process.
+        stop(): Stops the threads.
+        stats(): Gets the counters of the jobs.
+    """
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self._condition = threading.Condition()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._periodic = []
+        self._ready = queue.Queue()
+        self._counters = {}
+        self._pid = None
+        self._stopped = False
+
+    def add(self, job, delay=None):
+        """
+        Add a job, due after delay seconds or after its interval.
+
+        The periodic jobs are only put in the heap when the scheduler starts.
+
+        Args:
+            job (Job): The job.
+            delay (float, optional): The seconds before the run of a deferred job.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            self._counters.setdefault(
+                job.name,
+                {"runs": 0, "failures": 0, "skipped": 0, "last_run": None,
+                 "last_duration": None, "total_duration": 0.0},
+            )
+            if job.interval:
+                self._periodic.append(job)
+                if self._pid != os.getpid():
+                    return
+                delay = job.interval
+            self._push(job, delay)
+
+    def reschedule(self, name, delay):
+        """
+        Bring the next run of a periodic job forward, to delay seconds from now.
+
+        Args:
+            name (str): The name of the job.
+            delay (float): The seconds before the run.
+
+        Returns:
+            None
+        """
+        due = time.monotonic() + max(delay, 0)
+        with self._condition:
+            for job in self._periodic:
+                if job.name != name:
+                    continue
+                if job.due is None:
+                    # Running or not started: pushed with it when put back
+                    job.sooner = due if job.sooner is None else min(job.sooner, due)
+                elif due < job.due:
+                    # The entry of the previous due time is skipped
+                    self._push(job, due - time.monotonic())
+
+    def start(self):
+        """
+        Start the dispatcher and the worker threads in the current process.
+
+        Returns:
+            None
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._condition:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            for job in self._periodic:
+                self._push(job, self._next_delay(job, job.interval))
+        threading.Thread(
+            target=self._dispatch, name="scheduler", daemon=True
+        ).start()
+        for number in range(self.workers):
+            threading.Thread(
+                target=self._work, name=f"scheduler-{number}", daemon=True
+            ).start()
+
+    def stop(self):
+        """
+        Stop the dispatcher and the worker threads, after the runs in progress.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        for _ in range(self.workers):
+            self._ready.put(None)
+
+    def stats(self):
+        """
+        Get the counters of the jobs.
+
+        Returns:
+            dict: The runs, failures, skipped runs, time of the last run and
+            durations in seconds of every job, by job name.
+        """
+        with self._condition:
+            return {name: dict(counters) for name, counters in self._counters.items()}
+
+    def _push(self, job, delay):
+        due = time.monotonic() + delay
+        if job.interval:
+            job.due = due
+        heapq.heappush(self._heap, (due, next(self._sequence), job))
+        self._condition.notify()
+
+    @staticmethod
+    def _next_delay(job, delay):
+        """
+        Get the seconds before the next run of a periodic job, taking its
+        requested sooner run. Called with the condition held.
+        """
+        if job.sooner is not None:
+            delay = min(delay, job.sooner - time.monotonic())
+            job.sooner = None
+        return max(delay, 0)
+
+    def _dispatch(self):
+        """
+        Move the due jobs from the heap to the queue of the workers, until stopped.
+        """
+        while True:
+            with self._condition:
+                while not self._stopped and (
+                    not self._heap or self._heap[0][0] > time.monotonic()
+                ):
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                due, _, job = heapq.heappop(self._heap)
+                if job.interval:
+                    if due != job.due:
+                        # Replaced by a sooner run
+                        continue
+                    job.due = None
+            self._ready.put(job)
+
+    def _work(self):
+        """
+        Run the jobs of the queue, until stopped.
+        """
+        while True:
+            job = self._ready.get()
+            if job is None:
+                return
+            delay = self._run(job)
+            if job.interval:
+                with self._condition:
+                    self._push(job, self._next_delay(job, delay))
+
+    def _run(self, job):
+        """
+        Run a job for its tenants, and update its counters.
+
+        Returns:
+            float: The seconds before the next run of a periodic job.
+        """
+        delay = job.interval
+        tenants = job.tenants if job.tenants is not None else tenancy.tenants(self.app)
+        for tenant in tenants:
+            started = time.time()
+            with self.app.app_context():
+                tenancy.use_tenant(tenant)
+                try:
+                    if job.leader and not acquire_lease(job.name, job.interval * 2):
+                        self._count(job, "skipped")
+                        continue
+                    next_run = job.func()
+                    self._count(job, "runs", started)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Background job %s failed for %s", job.name, tenant)
+                    self._count(job, "failures", started)
+                    continue
+            if delay is not None and next_run is not None:
+                delay = min(delay, next_run)
+        return delay
+
+    def _count(self, job, counter, started=None):
+        with self._condition:
+            counters = self._counters[job.name]
+            counters[counter] += 1
+            if started is not None:
+                duration = time.time() - started
+                counters["last_run"] = started
+                counters["last_duration"] = duration
+                counters["total_duration"] += duration
@@ -0,0 +1,251 @@
+"""
+This module contains the coalescing of identical concurrent reads.
+
+When a kiosk fleet refreshes, many identical availability requests arrive
+at the same time. With a singleflight group, the first request with a
+given key computes the result and the concurrent requests with the same
+key wait for it and share it, instead of running the same scan again.
+A result is only shared with the requests that arrived while it was being
+computed, so no request gets a result older than itself.
+
+Within a process the requests wait on a threading.Event. When
+SINGLEFLIGHT_SHARED_DIR is set, the computations are also coalesced
+across the worker processes of the host: each key maps to one of a fixed
+number of slots in that directory, and the process computing a key holds
+the file lock of its slot and leaves the JSON result next to it. A
+process waiting for the lock reuses that result when it was written for
+the same key after its request arrived. The results must then be JSON
+serializable. The slots are locked with fcntl, or with msvcrt on Windows.
+
+The counters of every group are returned by the metrics endpoint.
+
+Classes:
+- Group: Coalesces the concurrent calls with the same key.
+
+Functions:
+- init_app(app): Creates the groups of the application.
+- coalesce(name, key, func): Calls func once for the concurrent calls with the same key.
+- stats(app): Gets the counters of the groups of the application.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    import msvcrt
+
+    fcntl = None
+
+from . import tenancy
+
+GROUPS = ("rooms_available", "reservations")
+
+# Number of lock and result files in SINGLEFLIGHT_SHARED_DIR
+SHARED_SLOTS = 64
+
+
+def init_app(app):
+    """
+    Create the groups of the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    shared_dir = app.config["SINGLEFLIGHT_SHARED_DIR"]
+    if shared_dir:
+        os.makedirs(shared_dir, exist_ok=True)
+    app.extensions["singleflight"] = {name: Group(shared_dir) for name in GROUPS}
+
+
+def coalesce(name, key, func):
+    """
+    Call func once for the concurrent calls with the same key.
+
+    The key is scoped to the tenant of the request.
+
+    Args:
+        name (str): The name of the group.
+        key (tuple): The key identifying the result, made of strings and numbers.
+        func (callable): The function computing the result, without arguments.
+
+    Returns:
+        The result of func.
+    """
+    if not current_app.config["SINGLEFLIGHT_ENABLED"]:
+        return func()
+    group = current_app.extensions["singleflight"][name]
+    return group.do((name, tenancy.current_tenant()) + tuple(key), func)
+
+
+def stats(app):
+    """
+    Get the counters of the groups of the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        dict: The counters of every group, by group name.
+    """
+    return {name: group.stats() for name, group in app.extensions["singleflight"].items()}
+
+
+class _Call:
+    """
+    A computation in flight and the calls waiting for it.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """
+    Coalesces the concurrent calls with the same key.
+
+    Attributes:
+        shared_dir (str): The directory coalescing the processes, None to only coalesce threads.
+
+    Methods:
+        do(key, func): Calls func, or waits for the call in flight with the same key.
+        stats(): Gets the counters of the group.
+    """
+
+    def __init__(self, shared_dir=None):
+        self.shared_dir = shared_dir
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {"computed": 0, "coalesced": 0, "shared": 0}
+
+    def do(self, key, func):
+        """
+        Call func, or wait for the call in flight with the same key.
+
+        Exceptions raised by func are raised in every waiting call.
+
+        Args:
+            key (tuple): The key of the result.
+            func (callable): The function computing the result.
+
+        Returns:
+            The result of func.
+        """
+        arrival = time.time()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                self._counters["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.shared_dir:
+                call.result = self._do_shared(key, func, arrival)
+            else:
+                call.result = self._compute(func)
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """
+        Get the counters of the group.
+
+        Returns:
+            dict: The number of computed results, of calls that waited for
+            a call of the same process (coalesced) and of calls that reused
+            the result of another process (shared), and the calls in flight.
+        """
+        with self._lock:
+            return dict(self._counters, in_flight=len(self._calls))
+
+    def _compute(self, func):
+        result = func()
+        with self._lock:
+            self._counters["computed"] += 1
+        return result
+
+    def _do_shared(self, key, func, arrival):
+        """
+        Compute the result while holding the file lock of the slot of the key.
+        """
+        encoded_key = json.dumps(key)
+        slot = int(hashlib.sha256(encoded_key.encode()).hexdigest(), 16) % SHARED_SLOTS
+        path = os.path.join(self.shared_dir, f"slot-{slot}")
+        with open(path + ".lock", "a", encoding="ascii") as lock_file:
+            _lock_file(lock_file)
+            try:
+                try:
+                    with open(path + ".json", encoding="utf-8") as result_file:
+                        stored = json.load(result_file)
+                    # A result written at the arrival time may predate the request
+                    if stored["key"] == encoded_key and stored["time"] > arrival:
+                        with self._lock:
+                            self._counters["shared"] += 1
+                        return stored["result"]
+                except (OSError, ValueError, KeyError):
+                    pass
+
+                result = self._compute(func)
+                with open(path + ".tmp", "w", encoding="utf-8") as result_file:
+                    json.dump(
+                        {"key": encoded_key, "time": time.time(), "result": result},
+                        result_file,
+                    )
+                os.replace(path + ".tmp", path + ".json")
+                return result
+            finally:
+                _unlock_file(lock_file)
+
+
+def _lock_file(lock_file):
+    """
+    Wait for the exclusive lock of a file.
+    """
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return
+    lock_file.seek(0)
+    while True:
+        try:
+            # Gives up with an OSError after 10 seconds
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_file(lock_file):
+    """
+    Release the lock of a file.
+    """
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
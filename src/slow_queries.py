@@ -0,0 +1,191 @@
+"""
+This module contains the slow query log.
+
+Every statement run by an engine of the application (the default database
+and the tenants) is timed by engine events. A statement taking more than
+SLOW_QUERY_THRESHOLD_MS milliseconds is logged with the count and the
+types of its parameters, never their values (they hold API key hashes and
+personal data), the Flask endpoint which ran it and the output of EXPLAIN QUERY PLAN, run on
+the same connection just after it. The plan tells at once whether a query,
+for example the overlap check of a room with many reservations, scans a
+whole table instead of searching an index: such entries are flagged with
+full_scan.
+
+The last SLOW_QUERY_LOG_SIZE entries of the process are kept in memory for
+the admin endpoint. When SLOW_QUERY_LOG_FILE is set, they are also written
+to it as JSON lines, rotated after SLOW_QUERY_LOG_MAX_BYTES. Set
+SLOW_QUERY_THRESHOLD_MS to None to disable the log.
+
+Functions:
+- init_app(app): Creates the slow query log of the application.
+- entries(app): Gets the last slow queries of the process, newest first.
+- query_plan(dbapi_connection, statement, parameters): Gets the EXPLAIN QUERY PLAN of a statement.
+- is_full_scan(plan): Checks if a query plan scans a whole table.
+- describe_parameters(parameters): Describes the parameters of a statement without their values.
+"""
+
+import collections
+import json
+import logging
+import logging.handlers
+import os
+import time
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Statements which have no query plan
+_SKIPPED_PREFIXES = ("PRAGMA", "EXPLAIN", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+def init_app(app):
+    """
+    Create the slow query log of the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    if app.config["SLOW_QUERY_THRESHOLD_MS"] is None:
+        return
+    file_logger = None
+    if app.config["SLOW_QUERY_LOG_FILE"]:
+        os.makedirs(
+            os.path.dirname(os.path.abspath(app.config["SLOW_QUERY_LOG_FILE"])),
+            exist_ok=True,
+        )
+        handler = logging.handlers.RotatingFileHandler(
+            app.config["SLOW_QUERY_LOG_FILE"],
+            maxBytes=app.config["SLOW_QUERY_LOG_MAX_BYTES"],
+            backupCount=app.config["SLOW_QUERY_LOG_BACKUPS"],
+            encoding="utf-8",
+            delay=True,
+        )
+        # One logger per file, not propagated to the application logs
+        file_logger = logging.getLogger(f"{__name__}.{app.config['SLOW_QUERY_LOG_FILE']}")
+        file_logger.propagate = False
+        file_logger.setLevel(logging.INFO)
+        file_logger.handlers = [handler]
+    app.extensions["slow_queries"] = {
+        "threshold": app.config["SLOW_QUERY_THRESHOLD_MS"] / 1000,
+        "entries": collections.deque(maxlen=app.config["SLOW_QUERY_LOG_SIZE"]),
+        "file_logger": file_logger,
+    }
+
+
+def entries(app):
+    """
+    Get the last slow queries of the process, newest first.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        list: The entries, empty when the log is disabled.
+    """
+    state = app.extensions.get("slow_queries")
+    if state is None:
+        return []
+    return list(reversed(state["entries"]))
+
+
+def query_plan(dbapi_connection, statement, parameters):
+    """
+    Get the EXPLAIN QUERY PLAN of a statement.
+
+    Args:
+        dbapi_connection: The SQLite connection which ran the statement.
+        statement (str): The SQL statement.
+        parameters (tuple): The parameters of the statement.
+
+    Returns:
+        list: The details of the steps of the plan, None if it cannot be explained.
+    """
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def is_full_scan(plan):
+    """
+    Check if a query plan scans a whole table.
+
+    Args:
+        plan (list): The details of the steps of the plan.
+
+    Returns:
+        bool: True if a step scans a table without an index.
+    """
+    return any(
+        detail.startswith("SCAN") and "INDEX" not in detail for detail in plan or []
+    )
+
+
+def describe_parameters(parameters):
+    """
+    Describe the parameters of a statement without their values.
+
+    Args:
+        parameters (tuple or dict): The parameters of the statement.
+
+    Returns:
+        dict: The number of parameters and the name of the type of each one.
+    """
+    if isinstance(parameters, dict):
+        parameters = list(parameters.values())
+    parameters = list(parameters or ())
+    return {
+        "count": len(parameters),
+        "types": [type(value).__name__ for value in parameters],
+    }
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, _cursor, _statement, _parameters, _context, _executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _log_slow_query(conn, cursor, statement, parameters, _context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+    if not has_app_context():
+        return
+    state = current_app.extensions.get("slow_queries")
+    if state is None or elapsed < state["threshold"]:
+        return
+
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    plan = None
+    if not statement.lstrip().upper().startswith(_SKIPPED_PREFIXES):
+        plan = query_plan(cursor.connection, statement, parameters)
+    entry = {
+        "time": time.time(),
+        "duration_ms": round(elapsed * 1000, 3),
+        "endpoint": request.endpoint if has_request_context() else None,
+        "statement": statement,
+        "parameters": describe_parameters(parameters),
+        "executemany": executemany,
+        "query_plan": plan,
+        "full_scan": is_full_scan(plan),
+    }
+    state["entries"].append(entry)
+    if state["file_logger"] is not None:
+        state["file_logger"].info(json.dumps(entry))
+    logger.warning(
+        "Slow query (%.1f ms) in %s: %s", entry["duration_ms"], entry["endpoint"], statement
+    )
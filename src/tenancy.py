@@ -0,0 +1,295 @@
+"""
+This module contains the routing of the requests to per tenant databases.
+
+One deployment serves several campuses (tenants). Each tenant listed in
+the TENANTS setting has its own SQLite file, so the writes of a campus
+never wait for the write lock of another one. The tenant of a request is
+taken from the URL prefix /tenants/<tenant>/, or else from the API key,
+whose tokens are issued as "<tenant>.<token>" by the tenant. Requests
+without a tenant use the default database, SQLALCHEMY_DATABASE_URI.
+
+The session of the application asks TenantSession.get_bind for its
+engine, which returns the engine of the current tenant. The engines are
+kept in an LRU cache of TENANT_ENGINE_CACHE_SIZE entries, and the schema
+of a shard is created and migrated when its engine is opened.
+
+Classes:
+- TenantSession: Session using the engine of the current tenant.
+- TenantPrefixMiddleware: Moves the /tenants/<tenant> URL prefix to the WSGI environment.
+- EngineCache: LRU cache of the engines of the tenants.
+
+Functions:
+- init_app(app): Sets up the tenant routing of the application.
+- request_tenant(): Gets the tenant named by the URL prefix or the API key of the request.
+- current_tenant(): Gets the tenant of the current application context.
+- use_tenant(tenant): Sets the tenant of the current application context.
+- tenants(app): Gets all the databases of the application, as tenants.
+- tenant_token(token): Prefixes an API key token with the current tenant.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from flask import (
+    Response,
+    current_app,
+    g,
+    has_app_context,
+    has_request_context,
+    request,
+)
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+
+TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+PREFIX = re.compile(r"^/tenants/([^/]+)(/.*)?$")
+ENVIRON_KEY = "reservation_system.tenant"
+
+
+def init_app(app):
+    """
+    Set up the tenant routing of the application.
+
+    Nothing changes when no tenant is configured.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    app.extensions["tenant_engines"] = EngineCache(
+        app.config["TENANT_DATABASE_URI"], app.config["TENANT_ENGINE_CACHE_SIZE"]
+    )
+    if not app.config["TENANTS"]:
+        return
+    app.wsgi_app = TenantPrefixMiddleware(app.wsgi_app)
+
+    @app.before_request
+    def _select_tenant():
+        tenant = request_tenant()
+        if tenant is None:
+            return None
+        if tenant not in app.config["TENANTS"]:
+            return Response("Unknown tenant.", status=404)
+        use_tenant(tenant)
+        return None
+
+
+def request_tenant():
+    """
+    Get the tenant named by the URL prefix or the API key of the request.
+
+    Returns:
+        str: The tenant, which may be unknown, None if there is none.
+    """
+    tenant = request.environ.get(ENVIRON_KEY)
+    if tenant is None:
+        token = request.headers.get("Api-key", "")
+        if "." in token:
+            tenant = token.strip().split(".", 1)[0]
+    return tenant
+
+
+def current_tenant():
+    """
+    Get the tenant of the current application context.
+
+    The URL converters run before the tenant of a request is selected, so
+    until then the tenant is taken from the request itself.
+
+    Returns:
+        str: The tenant, None for the default database.
+    """
+    if not has_app_context():
+        return None
+    if "tenant" not in g and has_request_context() and current_app.config["TENANTS"]:
+        tenant = request_tenant()
+        return tenant if tenant in current_app.config["TENANTS"] else None
+    return g.get("tenant")
+
+
+def use_tenant(tenant):
+    """
+    Set the tenant of the current application context.
+
+    It must be set before the session is used in the context.
+
+    Args:
+        tenant (str): The tenant, None for the default database.
+
+    Returns:
+        None
+    """
+    g.tenant = tenant
+
+
+def tenants(app):
+    """
+    Get all the databases of the application, as tenants.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        list: None for the default database, then the configured tenants.
+    """
+    return [None, *app.config["TENANTS"]]
+
+
+def tenant_token(token):
+    """
+    Prefix an API key token with the current tenant, if any.
+
+    Args:
+        token (str): The token.
+
+    Returns:
+        str: The token to give to the user.
+    """
+    tenant = current_tenant()
+    if tenant is None:
+        return token
+    return f"{tenant}.{token}"
+
+
+class TenantSession(Session):
+    """
+    Session using the engine of the current tenant.
+
+    Methods:
+        get_bind(mapper, clause, bind, **kwargs): Selects the engine of a statement.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        """
+        Select the engine of the current tenant, or the default one.
+
+        Returns:
+            Engine: The engine to use.
+        """
+        if bind is None:
+            tenant = current_tenant()
+            if tenant is not None:
+                return current_app.extensions["tenant_engines"].get(tenant)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class TenantPrefixMiddleware:
+    # pylint: disable=too-few-public-methods
+    """
+    Moves the /tenants/<tenant> URL prefix to the WSGI environment.
+
+    The prefix is appended to SCRIPT_NAME, so the routes of the
+    application are the same for all the tenants, and the generated
+    URLs keep the prefix.
+
+    Attributes:
+        wsgi_app (callable): The wrapped WSGI application.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        match = PREFIX.match(environ.get("PATH_INFO", ""))
+        if match:
+            tenant = match.group(1)
+            if not TENANT_ID.match(tenant):
+                return Response("Unknown tenant.", status=404)(
+                    environ, start_response
+                )
+            environ[ENVIRON_KEY] = tenant
+            environ["SCRIPT_NAME"] = (
+                environ.get("SCRIPT_NAME", "") + f"/tenants/{tenant}"
+            )
+            environ["PATH_INFO"] = match.group(2) or "/"
+        return self.wsgi_app(environ, start_response)
+
+
+class EngineCache:
+    """
+    LRU cache of the engines of the tenants.
+
+    Opening an engine creates the tables of the shard and applies the
+    pending migrations. The engine evicted from the cache is disposed:
+    its idle connections are closed, the ones in use are closed when
+    they are given back.
+
+    Attributes:
+        uri (str): The database URI of the shards, with a {tenant} field.
+        size (int): The maximum number of open engines.
+
+    Methods:
+        get(tenant): Gets the engine of a tenant, opening it if needed.
+        dispose(close=True): Disposes all the open engines.
+    """
+
+    def __init__(self, uri, size):
+        self.uri = uri
+        self.size = size
+        self._engines = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tenant):
+        """
+        Get the engine of a tenant, opening it if needed.
+
+        Args:
+            tenant (str): The tenant.
+
+        Returns:
+            Engine: The engine of the tenant.
+        """
+        with self._lock:
+            engine = self._engines.get(tenant)
+            if engine is not None:
+                self._engines.move_to_end(tenant)
+                return engine
+            engine = self._open(tenant)
+            self._engines[tenant] = engine
+            if len(self._engines) > self.size:
+                _, evicted = self._engines.popitem(last=False)
+                evicted.dispose()
+            return engine
+
+    def _open(self, tenant):
+        """
+        Create the engine of a tenant, and its schema if needed.
+
+        Args:
+            tenant (str): The tenant.
+
+        Returns:
+            Engine: The new engine.
+        """
+        # pylint: disable=import-outside-toplevel
+        from . import db, migrations
+
+        if not TENANT_ID.match(tenant):
+            raise ValueError(f"Invalid tenant {tenant!r}")
+        uri = self.uri.format(tenant=tenant)
+        if uri.startswith("sqlite:///"):
+            os.makedirs(os.path.dirname(uri[len("sqlite:///") :]), exist_ok=True)
+        engine = create_engine(uri)
+        db.metadata.create_all(engine)
+        migrations.migrate(engine)
+        return engine
+
+    def dispose(self, close=True):
+        """
+        Dispose all the open engines.
+
+        Args:
+            close (bool): False in a forked process, to drop the connections
+            inherited from the parent without closing them.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose(close=close)
+            self._engines.clear()
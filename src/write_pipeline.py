@@ -0,0 +1,309 @@
+"""
+This module contains the optional write pipeline used for reservation writes.
+
+Every reservation write is expressed as an operation: a function without
+arguments that reads and writes through db.session and returns the
+Response of the request. Operations are run with execute().
+
+When WRITE_PIPELINE_ENABLED is False (the default), execute() runs the
+operation and commits it directly. When it is True, the operations of
+concurrent requests are queued and a single thread runs them in batches:
+each operation runs inside its own SAVEPOINT, so a failing or rejected
+operation is rolled back alone, and the whole batch is committed with a
+single transaction. Under burst load this replaces hundreds of commits
+(and fsyncs) with a few, while every request keeps its own conflict check,
+which sees the writes of the operations queued before it, and its own response.
+Each tenant database (see tenancy.py) has its own queue and thread.
+
+An operation never changes anything outside the database directly: its
+side effects are registered with on_commit() and run once its transaction
+commits. They are dropped with the savepoint of a rejected operation and
+with a rolled back transaction, so a batch run again after a failed
+commit does not apply them twice.
+
+Classes:
+- WritePipeline: Runs queued write operations in batched transactions.
+
+Functions:
+- init_app(app): Creates the pipeline of the application if it is enabled.
+- execute(operation): Runs a write operation and returns its response.
+- on_commit(callback): Runs a side effect of the current operation once it is committed.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import db, nplusone, tenancy
+
+logger = logging.getLogger(__name__)
+
+
+def init_app(app):
+    """
+    Create the pipeline of the application if it is enabled.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    if app.config["WRITE_PIPELINE_ENABLED"]:
+        app.extensions["write_pipeline"] = WritePipeline(
+            app,
+            window=app.config["WRITE_PIPELINE_WINDOW_MS"] / 1000,
+            max_batch=app.config["WRITE_PIPELINE_MAX_BATCH"],
+        )
+
+
+def execute(operation):
+    """
+    Run a write operation and return its response.
+
+    Operations returning an error response (status code 400 or higher)
+    are rolled back.
+
+    Args:
+        operation (callable): The operation to run, it takes no arguments
+        and returns a Response.
+
+    Returns:
+        Response: The response returned by the operation.
+    """
+    pipeline = current_app.extensions.get("write_pipeline")
+    if pipeline is not None:
+        # Give the connection of the request back to the pool while it waits,
+        # the request itself only read through it.
+        db.session.rollback()
+        return pipeline.submit(operation)
+
+    response = operation()
+    if response.status_code >= 400:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return response
+
+
+def on_commit(callback):
+    """
+    Run a side effect of the current write operation once its transaction commits.
+
+    Args:
+        callback (callable): The side effect, it takes no arguments.
+
+    Returns:
+        None
+    """
+    db.session.info.setdefault("on_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_commit_callbacks(session):
+    """
+    Run the side effects of the committed operations.
+    """
+    for callback in session.info.pop("on_commit", ()):
+        try:
+            callback()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Side effect of a committed write failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_commit_callbacks(session):
+    """
+    Drop the side effects of the rolled back operations.
+    """
+    session.info.pop("on_commit", None)
+
+
+class WritePipeline:
+    """
+    Runs queued write operations in batched transactions.
+
+    The worker thread of a tenant is started by its first submitted
+    operation in each process, so the pipeline can be created before forking.
+
+    Attributes:
+        app (Flask): The application the operations run for.
+        window (float): Seconds the worker waits for more operations after the first one.
+        max_batch (int): Maximum number of operations committed together.
+
+    Methods:
+        submit(operation): Queues an operation and waits for its response.
+    """
+
+    def __init__(self, app, window, max_batch):
+        self.app = app
+        self.window = window
+        self.max_batch = max_batch
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, operation):
+        """
+        Queue an operation and wait for its response.
+
+        Args:
+            operation (callable): The operation to run.
+
+        Returns:
+            Response: The response returned by the operation.
+
+        Raises:
+            Exception: The exception raised by the operation or by the commit.
+        """
+        operations = self._ensure_worker(tenancy.current_tenant())
+        future = Future()
+        # The statements of the operation count for the request, see nplusone.py
+        operations.put((nplusone.bind_counters(operation), future))
+        return future.result()
+
+    def _ensure_worker(self, tenant):
+        """
+        Start the worker thread of a tenant if it is not running in this process.
+
+        Args:
+            tenant (str): The tenant, None for the default database.
+
+        Returns:
+            Queue: The queue of the operations of the tenant.
+        """
+        pid = os.getpid()
+        operations = self._queues.get(tenant)
+        if self._pid == pid and operations is not None:
+            return operations
+        with self._lock:
+            if self._pid != pid:
+                self._queues = {}
+                self._pid = pid
+            if tenant not in self._queues:
+                self._queues[tenant] = queue.Queue()
+                threading.Thread(
+                    target=self._work,
+                    args=(tenant, self._queues[tenant]),
+                    name=f"write-pipeline-{tenant or 'default'}",
+                    daemon=True,
+                ).start()
+            return self._queues[tenant]
+
+    def _work(self, tenant, operations):
+        """
+        Collect and run batches of operations of a tenant forever.
+
+        Args:
+            tenant (str): The tenant, None for the default database.
+            operations (Queue): The queue of the operations of the tenant.
+
+        Returns:
+            None
+        """
+        while True:
+            batch = [operations.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(operations.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            with self.app.app_context():
+                tenancy.use_tenant(tenant)
+                try:
+                    self._run_batch(batch)
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.exception("Write pipeline batch failed")
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+
+    def _run_batch(self, batch):
+        """
+        Run a batch of operations in one transaction, one savepoint per operation.
+
+        If the final commit fails, the operations are run again one
+        transaction each, so that only the faulty one gets an error.
+
+        Args:
+            batch (list): The (operation, future) pairs to run.
+
+        Returns:
+            None
+        """
+        self._begin()
+        results = [self._run_operation(operation) for operation, _ in batch]
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            if len(batch) == 1:
+                raise
+            for operation, future in batch:
+                try:
+                    self._run_batch([(operation, future)])
+                except SQLAlchemyError as exc:
+                    db.session.rollback()
+                    future.set_exception(exc)
+            return
+
+        for (_, future), (response, exc) in zip(batch, results):
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(response)
+
+    def _run_operation(self, operation):
+        """
+        Run an operation inside a savepoint.
+
+        The side effects registered by a rolled back operation are dropped
+        with its savepoint.
+
+        Args:
+            operation (callable): The operation to run.
+
+        Returns:
+            tuple: The response of the operation and the exception it raised,
+            one of them is None.
+        """
+        callbacks = db.session.info.setdefault("on_commit", [])
+        registered = len(callbacks)
+        try:
+            with db.session.begin_nested() as savepoint:
+                response = operation()
+                if response.status_code >= 400:
+                    savepoint.rollback()
+                    del callbacks[registered:]
+            return response, None
+        except Exception as exc:  # pylint: disable=broad-except
+            del callbacks[registered:]
+            return None, exc
+
+    @staticmethod
+    def _begin():
+        """
+        Open the batch transaction.
+
+        pysqlite does not start a transaction before a SAVEPOINT, so on
+        SQLite the transaction is opened explicitly, and immediately takes
+        the write lock to avoid lock upgrades in the middle of the batch.
+
+        Returns:
+            None
+        """
+        connection = db.session.connection()
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
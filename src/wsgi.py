@@ -0,0 +1,89 @@
+"""
+This module contains the production entry point of the API.
+
+It is loaded once by the gunicorn master (see gunicorn.conf.py, which
+sets preload_app), before the workers are forked. The application is
+created and warmed up there: the modules are imported, the statements of
+the hot paths are compiled into the statement cache of the engine and
+the OpenAPI spec is built, when Swagger is enabled. Then the objects of the master are moved
+to the permanent generation of the garbage collector with gc.freeze(),
+so that the collections of the workers never write to them and their
+memory pages stay shared with the master after the fork.
+
+Run it with:
+
+    gunicorn -c gunicorn.conf.py src.wsgi:application
+
+Functions:
+- create_application(test_config=None): Creates and warms up the application.
+- warm_up(app): Fills the caches of the application before the fork.
+
+Variables:
+- application: The application served by gunicorn.
+"""
+
+import gc
+import logging
+from datetime import datetime
+
+from . import apispec, db, reads, room_catalog
+from .app_factory import create_api_app
+from .models import ApiKey
+from .resources.reservation import check_overlapping_reservations
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(app):
+    """
+    Fill the caches of the application before the fork.
+
+    The request hooks are not run, so no background thread is started in
+    the master, and its database connections are closed at the end.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    now = datetime.now()
+    with app.app_context():
+        # Compile the statements of the read layer and of the writes
+        reads.api_key_user("")
+        reads.get_user(0)
+        reads.get_usage(0, now)
+        reads.get_reservation(0, now)
+        reads.get_archived_reservation(0)
+        reads.list_reservations(0, now)
+        reads.list_archived_reservations(0)
+        ApiKey.query.filter_by(key="").first()
+        # The room catalog loaded before the fork is shared by the workers
+        for room in room_catalog.snapshot().rooms:
+            check_overlapping_reservations(room, now, now)
+        db.session.remove()
+        db.engine.dispose()
+
+    if "apispec" in app.extensions:
+        apispec.spec_json(app)
+    logger.info("Application warmed up")
+
+
+def create_application(test_config=None):
+    """
+    Create the application, warm it up and freeze the objects of the process.
+
+    Args:
+        test_config (dict, optional): Configuration overriding instance/config.py.
+
+    Returns:
+        Flask: The application.
+    """
+    app = create_api_app(test_config)
+    warm_up(app)
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+application = create_application()
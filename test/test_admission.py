@@ -0,0 +1,112 @@
+import threading
+import time
+from datetime import date, timedelta
+
+from src import db
+from src.admission import LOWEST_PRIORITY, AdmissionController
+from src.models import ApiKey, Room, User
+from test.test_config import app_factory
+
+ADMIN_HEADERS = {"Api-key": "aa"}
+
+
+def start_acquire(controller, name, priority):
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(controller.acquire(name, priority))
+    )
+    thread.start()
+    return thread, results
+
+
+def wait_queued(controller, name, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while controller.stats()[name]["queued"] < count:
+        assert time.monotonic() < deadline, f"{count} {name} requests never queued"
+        time.sleep(0.01)
+
+
+def test_requests_wait_then_get_rejected():
+    controller = AdmissionController({"writes": {"concurrency": 1, "queue": 1}}, 5)
+    assert controller.acquire("writes", 0)
+
+    thread, results = start_acquire(controller, "writes", 0)
+    wait_queued(controller, "writes", 1)
+    # The queue is full
+    assert not controller.acquire("writes", 0)
+
+    controller.release("writes")
+    thread.join()
+    assert results == [True]
+    counters = controller.stats()["writes"]
+    assert counters["active"] == 1
+    assert counters["admitted"] == 2
+    assert counters["rejected"] == 1
+
+
+def test_queue_timeout():
+    controller = AdmissionController({"admin": {"concurrency": 1, "queue": 4}}, 0.05)
+    assert controller.acquire("admin", 1)
+    assert not controller.acquire("admin", 1)
+    assert controller.stats()["admin"]["timeouts"] == 1
+
+
+def test_queued_writes_do_not_block_availability():
+    controller = AdmissionController(
+        {
+            "writes": {"concurrency": 1, "queue": 4},
+            "availability": {"concurrency": 4, "queue": 0},
+        },
+        5,
+    )
+    assert controller.acquire("writes", 0)
+    thread, results = start_acquire(controller, "writes", 0)
+    wait_queued(controller, "writes", 1)
+
+    # The availability class has free places
+    assert controller.acquire("availability", LOWEST_PRIORITY)
+
+    controller.release("writes")
+    thread.join()
+    assert results == [True]
+
+
+def test_authenticated_requests_are_admitted_first():
+    controller = AdmissionController({"writes": {"concurrency": 1, "queue": 4}}, 5)
+    assert controller.acquire("writes", 0)
+    anonymous, anonymous_results = start_acquire(controller, "writes", LOWEST_PRIORITY)
+    wait_queued(controller, "writes", 1)
+    authenticated, authenticated_results = start_acquire(controller, "writes", 0)
+    wait_queued(controller, "writes", 2)
+
+    controller.release("writes")
+    authenticated.join()
+    assert authenticated_results == [True]
+    assert anonymous_results == []
+    assert controller.stats()["writes"]["queued"] == 1
+
+    controller.release("writes")
+    anonymous.join()
+    assert anonymous_results == [True]
+
+
+def test_saturated_route_gets_503(app_factory):
+    app = app_factory(
+        ADMISSION_LIMITS={"availability": {"concurrency": 0, "queue": 0}},
+        ADMISSION_RETRY_AFTER=2,
+    )
+    with app.app_context():
+        admin = User(username="admin", email="admin@example.com")
+        db.session.add(ApiKey(key=ApiKey.key_hash("aa"), user=admin, admin=True))
+        db.session.add(Room(room_name="Room 1", capacity=10, max_time=120))
+        db.session.commit()
+        client = app.test_client()
+        day = (date.today() + timedelta(days=30)).isoformat()
+        response = client.get(f"/api/rooms_available/?date={day}&time=10:00")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+
+        # The other routes are not limited
+        metrics = client.get("/api/metrics/", headers=ADMIN_HEADERS).get_json()
+        assert metrics["admission"]["availability"]["rejected"] == 1
+        assert metrics["admission"]["availability"]["queued"] == 0
@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+from test.test_config import client
+
+from src.app_factory import create_api_app
+
+
+def test_spec_served_with_etag(client):
+    response = client.get("/apispec_1.json")
+    assert response.status_code == 200
+    spec = response.get_json()
+    assert "/api/users/{user_id}/reservations/{reservation_id}/" in spec["paths"]
+    assert response.headers["ETag"]
+
+    revalidated = client.get(
+        "/apispec_1.json", headers={"If-None-Match": response.headers["ETag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+
+
+def test_spec_served_from_file():
+    spec_fd, spec_fname = tempfile.mkstemp(suffix=".json")
+    app = create_api_app({"SWAGGER_SPEC_FILE": spec_fname, "TESTING": True})
+    result = app.test_cli_runner().invoke(args=["build-apispec"])
+    assert result.exit_code == 0
+    with open(spec_fname, encoding="utf-8") as spec_file:
+        assert "paths" in json.load(spec_file)
+
+    with open(spec_fname, "w", encoding="utf-8") as spec_file:
+        spec_file.write('{"paths": {}}')
+    # A new application loads the file instead of parsing the docstrings
+    app = create_api_app({"SWAGGER_SPEC_FILE": spec_fname, "TESTING": True})
+    assert app.test_client().get("/apispec_1.json").get_json() == {"paths": {}}
+
+    os.close(spec_fd)
+    os.unlink(spec_fname)
+
+
+def test_swagger_disabled():
+    app = create_api_app({"SWAGGER_ENABLED": False, "TESTING": True})
+    client = app.test_client()
+    assert client.get("/apispec_1.json").status_code == 404
+    assert client.get("/apidocs/").status_code == 404
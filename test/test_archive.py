@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timedelta
+from test.test_config import client
+
+from src import db
+from src.archive import archive_batch, archive_past_reservations
+from src.models import Reservation, ReservationHistory
+
+from .utils import create_user
+
+
+def add_past_reservation(user_id, days_ago):
+    start_time = datetime.now().replace(second=0, microsecond=0) - timedelta(days=days_ago)
+    reservation = Reservation(
+        room_id=1,
+        user_id=int(user_id),
+        start_time=start_time,
+        end_time=start_time + timedelta(hours=1),
+    )
+    db.session.add(reservation)
+    db.session.commit()
+    return reservation.id
+
+
+def test_archive_moves_old_reservations(client):
+    api_key, user_id = create_user(client)
+    old_id = add_past_reservation(user_id, 60)
+    recent_id = add_past_reservation(user_id, 2)
+
+    assert archive_past_reservations() == 1
+    assert db.session.get(Reservation, recent_id) is not None
+    assert db.session.get(Reservation, old_id) is None
+    assert db.session.get(ReservationHistory, old_id) is not None
+    assert archive_past_reservations() == 0
+
+
+def test_archive_in_batches(client):
+    api_key, user_id = create_user(client)
+    for days_ago in range(40, 45):
+        add_past_reservation(user_id, days_ago)
+
+    cutoff = datetime.now() - timedelta(days=30)
+    assert archive_batch(cutoff, 2) == 2
+    assert archive_batch(cutoff, 2) == 2
+    assert archive_batch(cutoff, 2) == 1
+    assert ReservationHistory.query.count() == 5
+
+
+def test_read_endpoints_include_history_on_request(client):
+    api_key, user_id = create_user(client)
+    headers = {"Api-key": api_key}
+    old_id = add_past_reservation(user_id, 60)
+    archive_past_reservations()
+
+    response = client.get(f"/api/users/{user_id}/reservations/", headers=headers)
+    assert json.loads(response.data) == []
+    response = client.get(
+        f"/api/users/{user_id}/reservations/?include_history=true", headers=headers
+    )
+    reservations = json.loads(response.data)
+    assert [r["id"] for r in reservations] == [old_id]
+    assert reservations[0]["status"] == "archived"
+
+    response = client.get(
+        f"/api/users/{user_id}/reservations/{old_id}/", headers=headers
+    )
+    assert response.status_code == 404
+    response = client.get(
+        f"/api/users/{user_id}/reservations/{old_id}/?include_history=1",
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+
+def test_archived_ids_are_not_reused(client):
+    api_key, user_id = create_user(client)
+    Reservation.query.delete()
+    db.session.commit()
+    old_id = add_past_reservation(user_id, 60)
+    assert archive_past_reservations() == 1
+
+    new_id = add_past_reservation(user_id, 61)
+    assert new_id != old_id
+    assert archive_past_reservations() == 1
+    assert ReservationHistory.query.count() == 2
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from src import db
+from src.asgi import create_asgi_app
+from src.models import ApiKey, Room, RoomAttribute, User
+from test.test_config import app_factory
+
+DATE = (date.today() + timedelta(days=30)).isoformat()
+
+
+@pytest.fixture
+def apps(app_factory):
+    flask_app = app_factory()
+    with flask_app.app_context():
+        for index in range(2):
+            user = User(username=f"user{index}", email=f"user{index}@example.com")
+            db.session.add(ApiKey(key=ApiKey.key_hash(f"token{index}"), user=user))
+        room = Room(room_name="Room 1", capacity=10, max_time=120, location="A")
+        room.attributes = [RoomAttribute(name="projector"), RoomAttribute(name="tv")]
+        db.session.add(room)
+        db.session.add(Room(room_name="Room 2", capacity=20, max_time=60))
+        db.session.commit()
+    return flask_app, create_asgi_app(flask_app)
+
+
+async def request(asgi_app, method, path, api_key=None, body=None):
+    path, _, query_string = path.partition("?")
+    headers = [(b"host", b"testserver")]
+    if api_key is not None:
+        headers.append((b"api-key", api_key.encode()))
+    payload = b""
+    if body is not None:
+        payload = json.dumps(body).encode()
+        headers.append((b"content-type", b"application/json"))
+        headers.append((b"content-length", str(len(payload)).encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": headers,
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 1234),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi_app(scope, receive, send)
+    status = messages[0]["status"]
+    data = b"".join(message.get("body", b"") for message in messages[1:])
+    return status, data
+
+
+def call(asgi_app, method, path, api_key=None, body=None):
+    return asyncio.run(request(asgi_app, method, path, api_key, body))
+
+
+def test_asgi_matches_flask(apps):
+    flask_app, asgi_app = apps
+    client = flask_app.test_client()
+
+    # Writes go through the Flask resources
+    status, _ = call(
+        asgi_app,
+        "POST",
+        "/api/users/1/reservations/",
+        "token0",
+        {"date": DATE, "start-time": "10:00", "end-time": "11:00", "roomId": 1},
+    )
+    assert status == 201
+
+    for path, api_key in (
+        ("/api/users/1/", "token0"),
+        ("/api/users/1/", "token1"),
+        ("/api/users/1/", "wrong"),
+        ("/api/users/x/", "token0"),
+        ("/api/users/3/", "token0"),
+        ("/api/users/1/reservations/", "token0"),
+        ("/api/users/2/reservations/", "token0"),
+        ("/api/users/1/reservations/1/", "token0"),
+        ("/api/users/2/reservations/1/", "token1"),
+        ("/api/users/1/reservations/5/", "token0"),
+        ("/api/users/1/reservations/0/", "token0"),
+        (f"/api/rooms_available/?date={DATE}&time=10:30", None),
+        (f"/api/rooms_available/?date={DATE}&time=11:30&duration=90", None),
+        (f"/api/rooms_available/?date={DATE}&time=12:00&min_capacity=15", None),
+        (f"/api/rooms_available/?date={DATE}&time=12:00&location=A", None),
+        (f"/api/rooms_available/?date={DATE}&time=12:00&attribute=tv&attribute=projector", None),
+        (f"/api/rooms_available/?date={DATE}&time=12:00&attribute=tv&min_capacity=15", None),
+        (f"/api/rooms_available/?date={DATE}&time=12:00&attribute=&attribute=tv", None),
+        (f"/api/rooms_available/?date={DATE}&time=12:00&min_capacity=x", None),
+        (f"/api/rooms_available/?date={DATE}&time=25:00", None),
+        (f"/api/rooms_available/?date={DATE}&time=10:00&duration=-5", None),
+        ("/api/rooms_available/?date=2024-06-30", None),
+    ):
+        status, data = call(asgi_app, "GET", path, api_key)
+        headers = {} if api_key is None else {"Api-key": api_key}
+        response = client.get(path, headers=headers)
+        assert (status, data) == (response.status_code, response.data), path
+
+
+def test_asgi_requests_run_concurrently(apps):
+    flask_app, asgi_app = apps
+    wsgi_app = flask_app.wsgi_app
+    lock = threading.Lock()
+    in_flight = {"current": 0, "peak": 0}
+
+    def slow_wsgi_app(environ, start_response):
+        with lock:
+            in_flight["current"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["current"])
+        try:
+            time.sleep(0.1)
+            return wsgi_app(environ, start_response)
+        finally:
+            with lock:
+                in_flight["current"] -= 1
+
+    flask_app.wsgi_app = slow_wsgi_app
+    path = f"/api/rooms_available/?date={DATE}&time=10:30"
+
+    async def requests():
+        return await asyncio.gather(*(request(asgi_app, "GET", path) for _ in range(8)))
+
+    responses = asyncio.run(requests())
+    assert [status for status, _ in responses] == [200] * 8
+    assert in_flight["peak"] > 1
@@ -4,6 +4,10 @@ from src import db
 from population_script import populate_db
 import os
 import pytest
+from contextlib import ExitStack, contextmanager
+from benchmarks.common import temporary_app
+from src import scheduler
+from src.nplusone import count_queries
 from src.models import User, ApiKey
 
 @pytest.fixture
@@ -19,3 +23,39 @@ def client():
     os.close(db_fd)
     os.unlink(db_fname)
 
+
+
+@pytest.fixture
+def app_factory():
+    """
+    Factory of applications on temporary databases, with their tables created.
+
+    Call it with the configuration values overriding the defaults. The
+    databases are removed at the end of the test.
+    """
+    apps = []
+    with ExitStack() as stack:
+
+        def factory(**config):
+            app = stack.enter_context(temporary_app(**config))
+            apps.append(app)
+            return app
+
+        yield factory
+        for app in apps:
+            scheduler.stop(app)
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Context manager failing when its block runs more SQL statements than a budget.
+    """
+
+    @contextmanager
+    def budget(max_queries):
+        with count_queries() as counter:
+            yield counter
+        assert len(counter) <= max_queries, "\n".join(counter.statements)
+
+    return budget
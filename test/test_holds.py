@@ -0,0 +1,108 @@
+import json
+from datetime import date, datetime, timedelta
+from test.test_config import client
+
+from src import db
+from src.holds import delete_expired_holds, sweep_expired_holds
+from src.models import Reservation
+from src.nplusone import count_queries
+
+from .utils import create_user
+
+DATE = (date.today() + timedelta(days=30)).isoformat()
+
+
+def create_hold(client, api_key, user_id, start_time="10:00", end_time="11:00"):
+    return client.post(
+        f"/api/users/{user_id}/reservations/",
+        json={
+            "date": DATE,
+            "start-time": start_time,
+            "end-time": end_time,
+            "roomId": 1,
+            "hold": True,
+        },
+        headers={"Api-key": api_key},
+    )
+
+
+def expire(reservation_id):
+    reservation = db.session.get(Reservation, int(reservation_id))
+    reservation.expires_at = datetime.now() - timedelta(minutes=1)
+    db.session.commit()
+
+
+def test_hold_blocks_slot(client):
+    api_key, user_id = create_user(client)
+    response = create_hold(client, api_key, user_id)
+    assert response.status_code == 201
+    assert response.text == "Hold created successfully"
+    assert response.headers.get("hold_expires") is not None
+
+    response = create_hold(client, api_key, user_id, "10:30", "11:30")
+    assert response.status_code == 409
+
+    response = client.get(f"/api/rooms_available/?date={DATE}&time=10:00&duration=30")
+    rooms = json.loads(response.data)["available_rooms"]
+    assert [room["id"] for room in rooms] == [2]
+
+
+def test_booking_purges_only_overlapping_expired_holds(client):
+    api_key, user_id = create_user(client)
+    with count_queries() as counter:
+        assert create_hold(client, api_key, user_id).status_code == 201
+    assert not [sql for sql in counter.statements if sql.startswith("DELETE")]
+
+
+def test_expired_hold_frees_slot(client):
+    api_key, user_id = create_user(client)
+    reservation_id = create_hold(client, api_key, user_id).headers.get("reservation_id")
+    expire(reservation_id)
+
+    response = client.get(
+        f"/api/users/{user_id}/reservations/{reservation_id}/",
+        headers={"Api-key": api_key},
+    )
+    assert response.status_code == 404
+
+    # The slot can be booked again before the sweeper deletes the hold
+    response = create_hold(client, api_key, user_id)
+    assert response.status_code == 201
+
+    expire(response.headers.get("reservation_id"))
+    assert delete_expired_holds(datetime.now()) == 1
+    db.session.commit()
+    assert Reservation.query.filter_by(user_id=int(user_id)).count() == 0
+
+
+def test_confirm_hold(client):
+    api_key, user_id = create_user(client)
+    reservation_id = create_hold(client, api_key, user_id).headers.get("reservation_id")
+
+    response = client.put(
+        f"/api/users/{user_id}/reservations/{reservation_id}/",
+        json={"confirm": True},
+        headers={"Api-key": api_key},
+    )
+    assert response.status_code == 200
+    assert response.text == "Reservation confirmed successfully"
+
+    response = client.get(
+        f"/api/users/{user_id}/reservations/{reservation_id}/",
+        headers={"Api-key": api_key},
+    )
+    assert json.loads(response.data)["status"] == "confirmed"
+
+    assert delete_expired_holds(datetime.now() + timedelta(days=1)) == 0
+
+
+def test_sweep_returns_the_next_expiry(client):
+    api_key, user_id = create_user(client)
+    expired = create_hold(client, api_key, user_id).headers.get("reservation_id")
+    expire(expired)
+    create_hold(client, api_key, user_id, "12:00", "13:00")
+
+    delay = sweep_expired_holds()
+    assert db.session.get(Reservation, int(expired)) is None
+    # The next run of the job is due when the other hold expires
+    assert 0 < delay <= 10 * 60
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+from test.test_config import client
+
+from src.idempotency import purge_expired_keys
+from src.models import IdempotencyKey, Reservation, User
+
+from .utils import create_user
+
+
+def test_create_user_retry_returns_stored_response(client):
+    user_data = {"username": "retry_user", "email": "retry_user@example.com"}
+    headers = {"Idempotency-Key": "user-key-1"}
+
+    first = client.post("/api/users/", json=user_data, headers=headers)
+    second = client.post("/api/users/", json=user_data, headers=headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.headers.get("user_id") == first.headers.get("user_id")
+    assert second.headers.get("Idempotent-Replayed") == "true"
+    assert User.query.filter_by(username="retry_user").count() == 1
+
+    # The API key is never stored, the replay issues a new one
+    assert first.headers.get("api_key")
+    record = IdempotencyKey.query.one()
+    assert first.headers["api_key"] not in record.headers
+    assert second.headers.get("api_key") not in (None, first.headers["api_key"])
+
+
+def test_replayed_user_creation_gets_a_usable_api_key(client):
+    user_data = {"username": "lost_key", "email": "lost_key@example.com"}
+    headers = {"Idempotency-Key": "user-key-3"}
+    first = client.post("/api/users/", json=user_data, headers=headers)
+    second = client.post("/api/users/", json=user_data, headers=headers)
+    user_id = second.headers["user_id"]
+
+    response = client.get(
+        f"/api/users/{user_id}/", headers={"Api-key": second.headers["api_key"]}
+    )
+    assert response.status_code == 200
+    assert response.json["username"] == "lost_key"
+    # The key of the lost response no longer works
+    response = client.get(
+        f"/api/users/{user_id}/", headers={"Api-key": first.headers["api_key"]}
+    )
+    assert response.status_code == 401
+
+
+def test_create_reservation_retry_returns_stored_response(client):
+    api_key, user_id = create_user(client)
+    headers = {"Api-key": api_key, "Idempotency-Key": "reservation-key-1"}
+    reservation_data = {
+        "date": (date.today() + timedelta(days=30)).isoformat(),
+        "start-time": "10:00",
+        "end-time": "11:00",
+        "roomId": 1,
+    }
+
+    first = client.post(
+        f"/api/users/{user_id}/reservations/", json=reservation_data, headers=headers
+    )
+    second = client.post(
+        f"/api/users/{user_id}/reservations/", json=reservation_data, headers=headers
+    )
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.text == "Reservation created successfully"
+    assert second.headers.get("reservation_id") == first.headers.get("reservation_id")
+    assert Reservation.query.filter_by(user_id=int(user_id)).count() == 1
+
+
+def test_key_reused_with_different_body(client):
+    headers = {"Idempotency-Key": "user-key-2"}
+    client.post(
+        "/api/users/",
+        json={"username": "first", "email": "first@example.com"},
+        headers=headers,
+    )
+    response = client.post(
+        "/api/users/",
+        json={"username": "second", "email": "second@example.com"},
+        headers=headers,
+    )
+
+    assert response.status_code == 422
+    assert User.query.filter_by(username="second").first() is None
+
+
+def test_purge_expired_keys(client):
+    client.post(
+        "/api/users/",
+        json={"username": "purged", "email": "purged@example.com"},
+        headers={"Idempotency-Key": "user-key-3"},
+    )
+    record = IdempotencyKey.query.first()
+    record.expires_at = 0
+
+    assert purge_expired_keys() == 1
+    assert IdempotencyKey.query.count() == 0
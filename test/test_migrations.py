@@ -0,0 +1,161 @@
+import os
+import tempfile
+from datetime import datetime
+from test.test_config import client
+
+import pytest
+from sqlalchemy import create_engine
+
+from src import db, migrations
+from src.app_factory import create_api_app
+from src.migrations import MIGRATIONS, columns, migrate
+from src.models import (
+    Reservation,
+    ReservationHistory,
+    from_minutes,
+    to_minutes,
+    week_of,
+)
+
+
+def test_minutes_conversion():
+    value = datetime(2024, 6, 30, 14, 45)
+    assert to_minutes(value) == 28662645
+    assert from_minutes(to_minutes(value)) == value
+
+
+def test_migrate_fills_epoch_minutes(client):
+    # Go back to a database written before the minute columns were filled
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE reservation SET start_minute = 0, end_minute = 0")
+        connection.exec_driver_sql("PRAGMA user_version = 0")
+
+    assert migrate(db.engine) == len(MIGRATIONS)
+    # Applied migrations are not run again
+    assert migrate(db.engine) == len(MIGRATIONS)
+
+    db.session.expire_all()
+    reservations = Reservation.query.all()
+    assert reservations
+    for reservation in reservations:
+        assert reservation.start_minute == to_minutes(reservation.start_time)
+        assert reservation.end_minute == to_minutes(reservation.end_time)
+
+
+# The schema of a database created before the migrations
+PRE_SERIES_SCHEMA = [
+    "CREATE TABLE user (id INTEGER NOT NULL, username VARCHAR(100) NOT NULL,"
+    " email VARCHAR(120) NOT NULL, PRIMARY KEY (id), UNIQUE (username), UNIQUE (email))",
+    "CREATE TABLE room (id INTEGER NOT NULL, room_name VARCHAR(100) NOT NULL,"
+    " capacity INTEGER NOT NULL, max_time INTEGER NOT NULL, PRIMARY KEY (id),"
+    " UNIQUE (room_name))",
+    "CREATE TABLE reservation (id INTEGER NOT NULL, room_id INTEGER NOT NULL,"
+    " user_id INTEGER NOT NULL, start_time DATETIME NOT NULL, end_time DATETIME NOT NULL,"
+    " PRIMARY KEY (id), UNIQUE (room_id, start_time, end_time),"
+    " FOREIGN KEY(room_id) REFERENCES room (id) ON DELETE CASCADE,"
+    " FOREIGN KEY(user_id) REFERENCES user (id) ON DELETE CASCADE)",
+    'CREATE TABLE api_key (id INTEGER NOT NULL, "key" VARCHAR(32) NOT NULL, admin BOOLEAN,'
+    " user_id INTEGER NOT NULL, PRIMARY KEY (id), UNIQUE (\"key\"),"
+    " FOREIGN KEY(user_id) REFERENCES user (id))",
+    "INSERT INTO user VALUES (1, 'user', 'user@example.com')",
+    "INSERT INTO room VALUES (1, 'Room 1', 10, 180)",
+    "INSERT INTO reservation VALUES"
+    " (1, 1, 1, '2030-01-07 10:00:00.000000', '2030-01-07 11:00:00.000000')",
+    "INSERT INTO api_key VALUES (1, 'x', 0, 1)",
+    # The key of a user deleted without its keys
+    "INSERT INTO api_key VALUES (2, 'y', 0, 5)",
+]
+
+
+@pytest.fixture
+def pre_series_engine():
+    db_fd, db_fname = tempfile.mkstemp()
+    engine = create_engine("sqlite:///" + db_fname)
+    with engine.begin() as connection:
+        # For the key left by a user deleted without the foreign keys
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        for statement in PRE_SERIES_SCHEMA:
+            connection.exec_driver_sql(statement)
+    yield engine
+    engine.dispose()
+    os.close(db_fd)
+    os.unlink(db_fname)
+
+
+def test_migrate_pre_series_database(pre_series_engine):
+    assert migrate(pre_series_engine) == len(MIGRATIONS)
+    with pre_series_engine.connect() as connection:
+        assert {"start_minute", "expires_at"} <= columns(connection, "reservation")
+        assert columns(connection, "reservation_history")
+        # The rooms are searched in the catalog, not with SQL
+        indexes = connection.exec_driver_sql("PRAGMA index_list(room)").all()
+        assert not [row for row in indexes if row[1].startswith("ix_room_")]
+        usage = connection.exec_driver_sql("SELECT * FROM user_week_usage").all()
+        assert [tuple(row) for row in usage] == [
+            (1, week_of(to_minutes(datetime(2030, 1, 7, 10))), 60, 1)
+        ]
+
+
+def test_failed_migration_changes_nothing(pre_series_engine, monkeypatch):
+    def failing(connection):
+        raise RuntimeError("failed")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS + [failing])
+    with pytest.raises(RuntimeError):
+        migrations.migrate(pre_series_engine)
+    with pre_series_engine.connect() as connection:
+        assert "start_minute" not in columns(connection, "reservation")
+        assert connection.exec_driver_sql("PRAGMA user_version").scalar() == 0
+
+
+def test_migrated_database_serves_availability(pre_series_engine):
+    migrate(pre_series_engine)
+    app = create_api_app(
+        {"SQLALCHEMY_DATABASE_URI": str(pre_series_engine.url), "TESTING": True}
+    )
+    with app.app_context():
+        response = app.test_client().get(
+            "/api/rooms_available/?date=2030-01-07&time=10:30"
+        )
+        assert response.status_code == 200
+        assert response.get_json()["available_rooms"] == []
+        db.engine.dispose()
+
+
+def test_migrate_stops_the_reuse_of_reservation_ids(pre_series_engine):
+    # The reservation 1 was archived, and its id reused by a new reservation
+    ReservationHistory.__table__.create(pre_series_engine)
+    with pre_series_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO reservation_history VALUES (1, 1, 1,"
+            " '2020-01-06 10:00:00.000000', '2020-01-06 11:00:00.000000',"
+            " '2020-03-01 00:00:00.000000')"
+        )
+
+    migrate(pre_series_engine)
+    with pre_series_engine.begin() as connection:
+        sql = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE name = 'reservation'"
+        ).scalar()
+        assert "AUTOINCREMENT" in sql
+        ids = connection.exec_driver_sql("SELECT id FROM reservation").scalars().all()
+        assert ids == [2]
+        connection.exec_driver_sql("DELETE FROM reservation")
+        connection.exec_driver_sql(
+            "INSERT INTO reservation (room_id, user_id, start_time, end_time,"
+            " start_minute, end_minute) VALUES (1, 1, '2030-01-08 10:00:00.000000',"
+            " '2030-01-08 11:00:00.000000', 0, 0)"
+        )
+        assert connection.exec_driver_sql("SELECT id FROM reservation").scalar() == 3
+        # The indexes of the model are created again
+        indexes = connection.exec_driver_sql("PRAGMA index_list(reservation)").all()
+        assert "ix_reservation_room_end_start" in {row[1] for row in indexes}
+
+
+def test_migrate_cascades_user_deletes_to_api_keys(pre_series_engine):
+    migrate(pre_series_engine)
+    with pre_series_engine.begin() as connection:
+        keys = connection.exec_driver_sql("SELECT id FROM api_key").scalars().all()
+        assert keys == [1]
+        connection.exec_driver_sql('DELETE FROM "user" WHERE id = 1')
+        assert connection.exec_driver_sql("SELECT COUNT(*) FROM api_key").scalar() == 0
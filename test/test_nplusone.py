@@ -0,0 +1,140 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from flask import jsonify
+
+from src import db, write_pipeline
+from src.models import ApiKey, Reservation, Room, User, WaitlistEntry
+from src.nplusone import NPlusOneError, QueryCounter, count_queries
+from src.resources.rooms_available import is_room_available
+from test.test_config import app_factory, client, query_budget
+
+DAY = date.today() + timedelta(days=30)
+
+
+def seed(app):
+    # The availability check of every room, one query per room
+    def available_one_by_one():
+        start = datetime.combine(DAY, datetime.min.time())
+        return [is_room_available(room, start, None) for room in Room.query]
+
+    @app.route("/test/rooms_one_by_one/")
+    def rooms_one_by_one():
+        return {"available": available_one_by_one()}
+
+    @app.route("/test/rooms_one_by_one/", methods=["POST"])
+    def rooms_one_by_one_write():
+        return write_pipeline.execute(lambda: jsonify(available=available_one_by_one()))
+
+    with app.app_context():
+        user = User(username="user", email="user@example.com")
+        db.session.add(ApiKey(key=ApiKey.key_hash("token"), user=user))
+        for index in range(8):
+            room = Room(room_name=f"Room {index}", capacity=10, max_time=120)
+            start = datetime.combine(DAY, datetime.min.time()) + timedelta(hours=index)
+            db.session.add(
+                WaitlistEntry(
+                    room=room, user=user, start_time=start, end_time=start + timedelta(hours=1)
+                )
+            )
+            db.session.add(
+                Reservation(
+                    room=room,
+                    user=user,
+                    start_time=start + timedelta(days=1),
+                    end_time=start + timedelta(days=1, hours=1),
+                )
+            )
+        db.session.commit()
+
+
+@pytest.fixture
+def seeded_app(app_factory):
+    app = app_factory()
+    seed(app)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def pipeline_app(app_factory):
+    app = app_factory(WRITE_PIPELINE_ENABLED=True)
+    seed(app)
+    with app.app_context():
+        yield app
+
+
+def test_repeated_statements():
+    counter = QueryCounter()
+    counter.statements = ["SELECT a", "SELECT b", "SELECT a", "SELECT a"]
+    assert len(counter) == 4
+    assert counter.repeated(3) == [("SELECT a", 3)]
+    assert counter.repeated(4) == []
+
+
+def test_count_queries(client):
+    with count_queries() as counter:
+        db.session.query(User).all()
+        db.session.query(Room).all()
+    assert len(counter) == 2
+    db.session.query(User).all()
+    assert len(counter) == 2
+
+
+def test_n_plus_one_raises_in_tests(seeded_app):
+    with pytest.raises(NPlusOneError, match="rooms_one_by_one: 8 times"):
+        seeded_app.test_client().get("/test/rooms_one_by_one/")
+
+
+def test_n_plus_one_logged(seeded_app, caplog):
+    seeded_app.config["N_PLUS_ONE_MODE"] = "log"
+    response = seeded_app.test_client().get("/test/rooms_one_by_one/")
+    assert response.status_code == 200
+    assert "N+1 query in GET rooms_one_by_one" in caplog.text
+
+
+def test_rooms_available_budget(seeded_app, query_budget):
+    client = seeded_app.test_client()
+    # The first request loads the room catalog
+    client.get(f"/api/rooms_available/?date={DAY}&time=09:00")
+    with query_budget(1):
+        response = client.get(f"/api/rooms_available/?date={DAY}&time=10:00")
+    assert response.status_code == 200
+    assert len(response.get_json()["available_rooms"]) == 8
+
+
+def test_waitlist_budget(seeded_app, query_budget):
+    client = seeded_app.test_client()
+    with query_budget(3):
+        response = client.get("/api/users/1/waitlist/", headers={"Api-key": "token"})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 8
+
+
+def test_user_reservations_budget(seeded_app, query_budget):
+    client = seeded_app.test_client()
+    with query_budget(3):
+        response = client.get("/api/users/1/reservations/", headers={"Api-key": "token"})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 8
+
+
+def test_n_plus_one_in_pipeline_write(pipeline_app):
+    # The operation runs in the thread of the pipeline
+    with pytest.raises(NPlusOneError, match="rooms_one_by_one_write: 8 times"):
+        pipeline_app.test_client().post("/test/rooms_one_by_one/")
+
+
+def test_pipeline_booking_budget(pipeline_app, query_budget):
+    client = pipeline_app.test_client()
+    # The first request loads the room catalog
+    client.get(f"/api/rooms_available/?date={DAY}&time=09:00")
+    booking = {"date": DAY.isoformat(), "start-time": "15:00", "end-time": "16:00", "roomId": 1}
+    # The API key, the user, the overlap check, the insert and the usage counters
+    with query_budget(5) as counter:
+        response = client.post(
+            "/api/users/1/reservations/", json=booking, headers={"Api-key": "token"}
+        )
+    assert response.status_code == 201
+    assert any(statement.startswith("INSERT INTO reservation") for statement in counter.statements)
@@ -0,0 +1,59 @@
+import threading
+import time
+from datetime import date, timedelta
+from test.test_config import client
+
+from src.profiling import Sampler, collapse
+
+ADMIN_HEADERS = {"Api-key": "aa"}
+PATH = f"/api/rooms_available/?date={(date.today() + timedelta(days=30)).isoformat()}&time=10:00"
+
+
+def test_admin_profiles_request_with_cprofile(client):
+    response = client.get(PATH, headers={**ADMIN_HEADERS, "X-Profile": "cprofile"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    output = client.get(f"/api/profiles/{profile_id}/", headers=ADMIN_HEADERS)
+    assert output.status_code == 200
+    assert b"function calls" in output.data
+    assert b"find_available_rooms" in output.data
+
+    listed = client.get("/api/profiles/", headers=ADMIN_HEADERS).get_json()
+    assert listed["profiles"][0]["id"] == int(profile_id)
+    assert listed["profiles"][0]["endpoint"] == "roomsavailable"
+
+
+def test_sample_profile_with_query_flag(client):
+    response = client.get(PATH + "&profile=sample", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    output = client.get(f"/api/profiles/{profile_id}/", headers=ADMIN_HEADERS)
+    assert output.status_code == 200
+    assert output.mimetype == "text/plain"
+
+
+def test_flag_ignored_without_admin_key(client):
+    response = client.get(PATH, headers={"X-Profile": "cprofile"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/api/profiles/").status_code == 401
+    assert client.get("/api/profiles/12345/", headers=ADMIN_HEADERS).status_code == 404
+
+
+def test_sampler_collapses_stacks():
+    sampler = Sampler(0.001)
+
+    def busy_loop():
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            pass
+
+    sampler.track(threading.get_ident(), ("route", "busy"))
+    busy_loop()
+    sampler.untrack(threading.get_ident())
+
+    counts = sampler.routes()["busy"]
+    assert sum(counts.values()) > 0
+    assert any(stack.endswith("test_profiling.py:busy_loop") for stack in counts)
+    assert collapse(None) == ""
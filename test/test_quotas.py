@@ -0,0 +1,138 @@
+import json
+from datetime import date, datetime, timedelta
+from test.test_config import client
+
+from src import db
+from src.api import app
+from src.migrations import add_usage_counters
+from src.models import Reservation, UserWeekUsage, to_minutes, week_of
+
+from .utils import create_reservation, create_user
+
+ADMIN_HEADERS = {"Api-key": "aa"}
+# A Monday, so that the reservations of the test are in the same week
+MONDAY = date.today() + timedelta(days=28 - date.today().weekday())
+
+
+def day(offset):
+    return (MONDAY + timedelta(days=offset)).isoformat()
+
+
+def usage(client, api_key, user_id):
+    response = client.get(f"/api/users/{user_id}/", headers={"Api-key": api_key})
+    return json.loads(response.data)["usage"]
+
+
+def week_minutes(user_id):
+    week = week_of(to_minutes(datetime.combine(MONDAY, datetime.min.time())))
+    row = db.session.get(UserWeekUsage, (int(user_id), week))
+    return row.minutes if row else 0
+
+
+def test_counters_follow_the_writes(client):
+    api_key, user_id = create_user(client)
+    assert usage(client, api_key, user_id) == {
+        "active-reservations": 0,
+        "week-minutes": 0,
+    }
+
+    first = create_reservation(client, api_key, user_id, day(0), "10:00", "11:00")
+    create_reservation(client, api_key, user_id, day(1), "10:00", "11:30")
+    assert usage(client, api_key, user_id)["active-reservations"] == 2
+    assert week_minutes(user_id) == 150
+
+    response = client.put(
+        f"/api/users/{user_id}/reservations/{first}/",
+        json={"date": day(0), "start-time": "10:00", "end-time": "10:30", "roomId": 1},
+        headers={"Api-key": api_key},
+    )
+    assert response.status_code == 200
+    assert week_minutes(user_id) == 120
+
+    client.delete(
+        f"/api/users/{user_id}/reservations/{first}/", headers={"Api-key": api_key}
+    )
+    db.session.expire_all()
+    assert usage(client, api_key, user_id)["active-reservations"] == 1
+    assert week_minutes(user_id) == 90
+
+    client.delete(f"/api/reservations/?userId={user_id}", headers=ADMIN_HEADERS)
+    db.session.expire_all()
+    assert usage(client, api_key, user_id)["active-reservations"] == 0
+    assert week_minutes(user_id) == 0
+
+
+def test_reservation_quota(client, monkeypatch):
+    monkeypatch.setitem(app.config, "QUOTA_MAX_RESERVATIONS", 2)
+    api_key, user_id = create_user(client)
+    assert create_reservation(client, api_key, user_id, day(0))
+    assert create_reservation(client, api_key, user_id, day(1))
+
+    response = client.post(
+        f"/api/users/{user_id}/reservations/",
+        json={"date": day(2), "start-time": "10:00", "end-time": "11:00", "roomId": 1},
+        headers={"Api-key": api_key},
+    )
+    assert response.status_code == 409
+    assert "quota" in response.text
+
+
+def test_weekly_minutes_quota(client, monkeypatch):
+    monkeypatch.setitem(app.config, "QUOTA_MAX_WEEKLY_MINUTES", 120)
+    api_key, user_id = create_user(client)
+    reservation_id = create_reservation(
+        client, api_key, user_id, day(0), "10:00", "11:30"
+    )
+    assert create_reservation(client, api_key, user_id, day(1), "10:00", "11:00") is None
+    # The next week has its own quota
+    assert create_reservation(client, api_key, user_id, day(7), "10:00", "11:00")
+
+    # Growing a reservation counts only the added minutes
+    response = client.put(
+        f"/api/users/{user_id}/reservations/{reservation_id}/",
+        json={"date": day(0), "start-time": "10:00", "end-time": "12:00", "roomId": 1},
+        headers={"Api-key": api_key},
+    )
+    assert response.status_code == 200
+    response = client.put(
+        f"/api/users/{user_id}/reservations/{reservation_id}/",
+        json={"date": day(0), "start-time": "10:00", "end-time": "12:30", "roomId": 1},
+        headers={"Api-key": api_key},
+    )
+    assert response.status_code == 409
+
+
+def test_past_reservations_are_not_current(client, monkeypatch):
+    monkeypatch.setitem(app.config, "QUOTA_MAX_RESERVATIONS", 1)
+    api_key, user_id = create_user(client)
+    # A past reservation, not archived yet
+    db.session.add(
+        Reservation(
+            room_id=1,
+            user_id=int(user_id),
+            start_time=datetime(2020, 1, 6, 10),
+            end_time=datetime(2020, 1, 6, 11),
+        )
+    )
+    db.session.commit()
+    assert usage(client, api_key, user_id)["active-reservations"] == 0
+    assert create_reservation(client, api_key, user_id, day(0))
+    assert usage(client, api_key, user_id)["active-reservations"] == 1
+    assert create_reservation(client, api_key, user_id, day(1)) is None
+
+
+def test_migration_recomputes_the_counters(client):
+    api_key, user_id = create_user(client)
+    create_reservation(client, api_key, user_id, day(0), "10:00", "11:00")
+    create_reservation(client, api_key, user_id, day(2), "10:00", "12:00")
+    assert week_minutes(user_id) == 180
+
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "UPDATE user_week_usage SET minutes = 0, reservations = 0"
+        )
+        add_usage_counters(connection)
+    db.session.expire_all()
+
+    assert week_minutes(user_id) == 180
+    assert usage(client, api_key, user_id)["active-reservations"] == 2
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+
+from src import db
+from src.models import ApiKey, Room, User
+from src.recorder import pseudonym, rekey_api_keys, scrub
+from test.test_config import app_factory
+
+
+def test_requests_recorded_with_pseudonyms(app_factory):
+    with tempfile.TemporaryDirectory() as record_dir:
+        record_file = os.path.join(record_dir, "traffic.jsonl")
+        app = app_factory(TRAFFIC_RECORD_FILE=record_file, TRAFFIC_RECORD_SALT="salt")
+        with app.app_context():
+            user = User(username="user", email="user@example.com")
+            db.session.add(ApiKey(key=ApiKey.key_hash("secret-key"), user=user))
+            db.session.add(Room(room_name="Room 1", capacity=10, max_time=120))
+            db.session.commit()
+
+            client = app.test_client()
+            day = (date.today() + timedelta(days=30)).isoformat()
+            client.get(f"/api/rooms_available/?date={day}&time=10:00")
+            booking = {"date": day, "start-time": "10:00", "end-time": "11:00", "roomId": 1}
+            response = client.post(
+                "/api/users/1/reservations/", json=booking, headers={"Api-key": "secret-key"}
+            )
+            assert response.status_code == 201
+            # The tenant prefix is in SCRIPT_NAME
+            client.get("/api/rooms/", environ_overrides={"SCRIPT_NAME": "/tenants/oulu"})
+            response = client.post(
+                "/api/users/", json={"username": "new", "email": "new@example.com"}
+            )
+            assert response.status_code == 201
+
+            with open(record_file, encoding="utf-8") as file:
+                content = file.read()
+            records = [json.loads(line) for line in content.splitlines()]
+            assert "secret-key" not in content
+            assert "new@example.com" not in content
+            assert [record["m"] for record in records] == ["GET", "POST", "GET", "POST"]
+            assert records[0]["p"] == f"/api/rooms_available/?date={day}&time=10:00"
+            assert records[0]["k"] is None and "b" not in records[0]
+            assert records[1]["k"] == pseudonym(ApiKey.key_hash("secret-key"), "salt")
+            assert json.loads(records[1]["b"]) == booking
+            assert records[1]["s"] == 201
+            assert records[1]["d"] > 0
+            assert records[2]["p"] == "/tenants/oulu/api/rooms/"
+            assert json.loads(records[3]["b"]) == {
+                "username": "new",
+                "email": pseudonym(b"new@example.com", "salt") + "@example.com",
+            }
+
+            # On a rekeyed copy, the pseudonym authenticates as the user
+            assert rekey_api_keys("salt") == 2
+            response = client.get("/api/users/1/", headers={"Api-key": records[1]["k"]})
+            assert response.status_code == 200
+            assert client.get("/api/users/1/", headers={"Api-key": "secret-key"}).status_code == 401
+
+
+def test_scrub_sensitive_fields():
+    document = {"user": {"Email": "a@b.fi", "password": "pw"}, "items": [{"token": "t"}]}
+    scrubbed = scrub(document, {"email", "password", "token"}, "salt")
+    assert scrubbed == {
+        "user": {
+            "Email": pseudonym(b"a@b.fi", "salt") + "@example.com",
+            "password": pseudonym(b"pw", "salt"),
+        },
+        "items": [{"token": pseudonym(b"t", "salt")}],
+    }
+    assert scrub("text", {"email"}, "salt") == "text"
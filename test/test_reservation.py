@@ -1,6 +1,6 @@
 import json
-from datetime import datetime, timedelta
-from test.test_config import client
+from datetime import date, datetime, timedelta
+from test.test_config import client, query_budget
 from unittest.mock import patch
 
 import pytest
@@ -547,6 +547,21 @@ def test_get_reservations(client):
     assert response.text == "Incorrect api key."
 
 
+def test_get_reservations_query_budget(client, query_budget):
+    api_key, user_id = create_user(client)
+    for offset in range(6):
+        day = (date.today() + timedelta(days=30 + offset)).isoformat()
+        assert create_reservation(client, api_key, user_id, day, "10:00", "11:00")
+
+    # The statements do not grow with the number of reservations
+    with query_budget(3):
+        response = client.get(
+            f"/api/users/{user_id}/reservations/", headers={"Api-key": api_key}
+        )
+    assert response.status_code == 200
+    assert len(response.json) == 6
+
+
 def test_post_invalid_user_id(client):
     api_key, user_id = create_user(client)
     headers = {"Api-key": api_key}
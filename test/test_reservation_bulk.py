@@ -0,0 +1,116 @@
+import json
+from datetime import date, timedelta
+from test.test_config import client
+
+from src.models import Reservation, WaitlistEntry
+
+from .utils import create_reservation, create_user
+
+ADMIN_HEADERS = {"Api-key": "aa"}
+
+
+def book_days(client, api_key, user_id, days, room_id=1):
+    for day in days:
+        create_reservation(
+            client,
+            api_key,
+            user_id,
+            (date.today() + timedelta(days=day)).isoformat(),
+            "10:00",
+            "11:00",
+            room_id,
+        )
+
+
+def test_admin_cancels_room_in_date_range(client):
+    api_key, user_id = create_user(client)
+    book_days(client, api_key, user_id, [10, 11, 12, 20])
+    book_days(client, api_key, user_id, [11], room_id=2)
+
+    start = (date.today() + timedelta(days=10)).isoformat()
+    end = (date.today() + timedelta(days=12)).isoformat()
+    response = client.delete(
+        f"/api/reservations/?roomId=1&from={start}&to={end}", headers=ADMIN_HEADERS
+    )
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == {"cancelled": 3}
+    assert Reservation.query.filter_by(user_id=int(user_id)).count() == 2
+
+
+def test_admin_needs_a_filter(client):
+    response = client.delete("/api/reservations/", headers=ADMIN_HEADERS)
+    assert response.status_code == 400
+
+
+def test_user_cancels_only_own_reservations(client):
+    api_key, user_id = create_user(client)
+    other_key, other_id = create_user(
+        client, {"username": "other", "email": "other@example.com"}
+    )
+    book_days(client, api_key, user_id, [5, 6])
+    book_days(client, other_key, other_id, [7])
+
+    response = client.delete(
+        f"/api/reservations/?userId={other_id}", headers={"Api-key": api_key}
+    )
+    assert response.status_code == 401
+
+    response = client.delete("/api/reservations/?roomId=1", headers={"Api-key": api_key})
+    assert json.loads(response.data) == {"cancelled": 2}
+    assert Reservation.query.filter_by(user_id=int(other_id)).count() == 1
+
+
+def wait_for_room(client, day):
+    api_key, user_id = create_user(client)
+    create_reservation(client, api_key, user_id, day, "10:00", "11:00")
+    waiting_key, waiting_id = create_user(
+        client, {"username": "waiting", "email": "waiting@example.com"}
+    )
+    response = client.post(
+        f"/api/users/{waiting_id}/waitlist/",
+        json={"date": day, "start-time": "10:00", "end-time": "11:00", "roomId": 1},
+        headers={"Api-key": waiting_key},
+    )
+    assert response.status_code == 201
+    return api_key, user_id, int(waiting_id)
+
+
+def test_bulk_cancel_promotes_waitlist(client):
+    day = (date.today() + timedelta(days=30)).isoformat()
+    api_key, user_id, waiting_id = wait_for_room(client, day)
+
+    response = client.delete(
+        f"/api/reservations/?userId={user_id}&promote=true", headers={"Api-key": api_key}
+    )
+    assert json.loads(response.data) == {"cancelled": 1}
+    assert Reservation.query.filter_by(user_id=waiting_id).count() == 1
+    assert WaitlistEntry.query.filter_by(user_id=waiting_id).count() == 0
+
+
+def test_maintenance_cancel_keeps_waitlist(client):
+    day = (date.today() + timedelta(days=30)).isoformat()
+    _, _, waiting_id = wait_for_room(client, day)
+
+    # The room is closed for the day, nobody gets it
+    response = client.delete(
+        f"/api/reservations/?roomId=1&from={day}&to={day}", headers=ADMIN_HEADERS
+    )
+    assert json.loads(response.data) == {"cancelled": 1}
+    assert Reservation.query.filter_by(user_id=waiting_id).count() == 0
+    assert WaitlistEntry.query.filter_by(user_id=waiting_id).count() == 1
+
+
+def test_bulk_cancel_is_idempotent(client):
+    api_key, user_id = create_user(client)
+    book_days(client, api_key, user_id, [5, 6])
+    headers = {"Api-key": api_key, "Idempotency-Key": "cancel-1"}
+
+    response = client.delete("/api/reservations/?roomId=1", headers=headers)
+    assert json.loads(response.data) == {"cancelled": 2}
+    # The retry gets the stored response
+    response = client.delete("/api/reservations/?roomId=1", headers=headers)
+    assert json.loads(response.data) == {"cancelled": 2}
+    # Other filters are another request
+    response = client.delete("/api/reservations/?roomId=2", headers=headers)
+    assert response.status_code == 422
@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+
+import pytest
+
+from src import db, room_catalog
+from src.models import (
+    ApiKey,
+    Reservation,
+    Room,
+    RoomAttribute,
+    User,
+    UserWeekUsage,
+)
+from src.nplusone import count_queries
+from test.test_config import app_factory
+
+ADMIN = {"Api-key": "admin"}
+USER = {"Api-key": "token"}
+
+
+@pytest.fixture
+def rooms_app(app_factory):
+    app = app_factory(ROOM_CATALOG_CHECK_INTERVAL=3600)
+    with app.app_context():
+        user = User(username="user", email="user@example.com")
+        db.session.add(ApiKey(key=ApiKey.key_hash("token"), user=user))
+        admin = User(username="admin", email="admin@example.com")
+        db.session.add(ApiKey(key=ApiKey.key_hash("admin"), user=admin, admin=True))
+        rooms = [
+            ("Focus", 2, "Building A", ["whiteboard"]),
+            ("Meeting", 8, "Building A", ["projector", "whiteboard"]),
+            ("Board", 20, "Building B", ["projector"]),
+            ("Hall", 60, None, []),
+        ]
+        for name, capacity, location, attributes in rooms:
+            room = Room(room_name=name, capacity=capacity, max_time=120, location=location)
+            room.attributes = [RoomAttribute(name=attribute) for attribute in attributes]
+            db.session.add(room)
+        db.session.commit()
+        yield app
+
+
+def ids(response):
+    return [room["id"] for room in response.get_json()]
+
+
+def test_search_rooms(rooms_app):
+    client = rooms_app.test_client()
+    assert ids(client.get("/api/rooms/")) == [1, 2, 3, 4]
+    assert ids(client.get("/api/rooms/?min_capacity=8")) == [2, 3, 4]
+    assert ids(client.get("/api/rooms/?location=Building A")) == [1, 2]
+    assert ids(client.get("/api/rooms/?location=Building A&min_capacity=5")) == [2]
+    assert ids(client.get("/api/rooms/?attribute=projector")) == [2, 3]
+    assert ids(client.get("/api/rooms/?attribute=projector&attribute=whiteboard")) == [2]
+    assert ids(client.get("/api/rooms/?attribute=coffee")) == []
+    assert client.get("/api/rooms/?min_capacity=x").status_code == 400
+
+    response = client.get("/api/rooms/2/")
+    assert response.status_code == 200
+    assert response.get_json() == db.session.get(Room, 2).serialize()
+    assert response.get_json()["attributes"] == ["projector", "whiteboard"]
+    assert client.get("/api/rooms/99/").status_code == 404
+
+    # The search is served by the catalog
+    client.get("/api/rooms/")
+    with count_queries() as counter:
+        client.get("/api/rooms/?min_capacity=8&attribute=projector")
+    assert len(counter) == 0
+
+
+def test_room_writes(rooms_app):
+    client = rooms_app.test_client()
+    room = {"room_name": "Lab", "capacity": 6, "location": "Building B", "attributes": ["screen"]}
+    assert client.post("/api/rooms/", json=room, headers=USER).status_code == 401
+    assert client.post("/api/rooms/", data="x", headers=ADMIN).status_code == 415
+    response = client.post("/api/rooms/", json={"room_name": "Lab"}, headers=ADMIN)
+    assert response.status_code == 400
+    response = client.post("/api/rooms/", json={**room, "capacity": 0}, headers=ADMIN)
+    assert response.status_code == 400
+
+    response = client.post("/api/rooms/", json=room, headers=ADMIN)
+    assert response.status_code == 201
+    room_id = int(response.headers["room_id"])
+    assert client.post("/api/rooms/", json=room, headers=ADMIN).status_code == 409
+    assert ids(client.get("/api/rooms/?attribute=screen")) == [room_id]
+    assert client.get(f"/api/rooms/{room_id}/").get_json()["max_time"] == 180
+
+    update = {"capacity": 12, "attributes": ["projector"]}
+    response = client.put(f"/api/rooms/{room_id}/", json=update, headers=USER)
+    assert response.status_code == 401
+    response = client.put(f"/api/rooms/{room_id}/", json=update, headers=ADMIN)
+    assert response.status_code == 204
+    assert ids(client.get("/api/rooms/?attribute=screen")) == []
+    assert ids(client.get("/api/rooms/?attribute=projector&min_capacity=10")) == [3, room_id]
+    response = client.put(f"/api/rooms/{room_id}/", json={"room_name": "Hall"}, headers=ADMIN)
+    assert response.status_code == 409
+
+    assert client.delete(f"/api/rooms/{room_id}/", headers=USER).status_code == 401
+    assert client.delete(f"/api/rooms/{room_id}/", headers=ADMIN).status_code == 204
+    assert client.get(f"/api/rooms/{room_id}/").status_code == 404
+    assert db.session.query(RoomAttribute).filter_by(room_id=room_id).count() == 0
+
+
+def test_delete_room_releases_the_quota(rooms_app):
+    client = rooms_app.test_client()
+    day = (date.today() + timedelta(days=30)).isoformat()
+    booking = {"date": day, "start-time": "10:00", "end-time": "11:00", "roomId": 2}
+    response = client.post("/api/users/1/reservations/", json=booking, headers=USER)
+    assert response.status_code == 201
+
+    assert client.delete("/api/rooms/2/", headers=ADMIN).status_code == 204
+    assert db.session.query(Reservation).count() == 0
+    assert all(usage.minutes == 0 for usage in db.session.query(UserWeekUsage))
+
+
+def test_filtered_availability(rooms_app):
+    client = rooms_app.test_client()
+    day = (date.today() + timedelta(days=30)).isoformat()
+    booking = {"date": day, "start-time": "10:00", "end-time": "11:00", "roomId": 2}
+    response = client.post("/api/users/1/reservations/", json=booking, headers=USER)
+    assert response.status_code == 201
+
+    def available(query):
+        response = client.get(f"/api/rooms_available/?date={day}&time=10:30{query}")
+        return [room["id"] for room in response.get_json()["available_rooms"]]
+
+    assert available("") == [1, 3, 4]
+    assert available("&attribute=projector") == [3]
+    assert available("&location=Building A") == [1]
+    assert available("&min_capacity=30") == [4]
+    assert available("&location=Building C") == []
+    response = client.get(f"/api/rooms_available/?date={day}&time=10:30&min_capacity=-1")
+    assert response.status_code == 400
+    snapshot = room_catalog.snapshot()
+    rooms = snapshot.search(location="Building A", attributes=["whiteboard"])
+    assert [room.id for room in rooms] == [1, 2]
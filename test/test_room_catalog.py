@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+import pytest
+
+from src import db, room_catalog
+from src.models import ApiKey, Room, User
+from src.nplusone import count_queries
+from test.test_config import app_factory
+
+
+@pytest.fixture
+def catalog_app(app_factory):
+    app = app_factory(ROOM_CATALOG_CHECK_INTERVAL=3600)
+    with app.app_context():
+        user = User(username="user", email="user@example.com")
+        db.session.add(ApiKey(key=ApiKey.key_hash("token"), user=user))
+        db.session.add(Room(room_name="Small", capacity=4, max_time=60))
+        db.session.add(Room(room_name="Large", capacity=40, max_time=120))
+        db.session.add(Room(room_name="Medium", capacity=12, max_time=90))
+        db.session.commit()
+        yield app
+
+
+def test_snapshot_indexes(catalog_app):
+    snapshot = room_catalog.snapshot()
+    assert [room.id for room in snapshot.rooms] == [1, 2, 3]
+    assert snapshot.by_name["Large"].capacity == 40
+    assert [room.room_name for room in snapshot.with_capacity(10)] == ["Medium", "Large"]
+    assert snapshot.with_capacity(100) == ()
+    assert room_catalog.get("3").serialize() == db.session.get(Room, 3).serialize()
+    assert room_catalog.get(99) is None
+    assert room_catalog.get("x") is None
+
+    # The lookups do not query the database
+    with count_queries() as counter:
+        room_catalog.get(1)
+        room_catalog.snapshot().by_name.get("Small")
+    assert len(counter) == 0
+
+
+def test_room_changes_reload_the_catalog(catalog_app):
+    version = room_catalog.snapshot().version
+    db.session.add(Room(room_name="New", capacity=8, max_time=30))
+    db.session.commit()
+    snapshot = room_catalog.snapshot()
+    assert snapshot.version == version + 1
+    assert snapshot.by_name["New"].max_time == 30
+
+    db.session.get(Room, 1).max_time = 45
+    db.session.commit()
+    assert room_catalog.get(1).max_time == 45
+
+    # The old snapshot is never modified
+    assert snapshot.by_id[1].max_time == 60
+
+
+def test_rollback_keeps_the_catalog(catalog_app):
+    snapshot = room_catalog.snapshot()
+    db.session.add(Room(room_name="Cancelled", capacity=8, max_time=30))
+    db.session.flush()
+    db.session.rollback()
+    assert room_catalog.snapshot() is snapshot
+
+
+def test_version_bump_from_another_process(catalog_app):
+    snapshot = room_catalog.snapshot()
+    # A change made outside the process, then the version bump
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE room SET capacity = 50 WHERE id = 2")
+    assert room_catalog.get(2).capacity == 40
+    with db.engine.begin() as connection:
+        room_catalog.bump_version(connection)
+
+    # Seen at the next check of the version
+    assert room_catalog.snapshot() is snapshot
+    catalog_app.extensions["room_catalog"].check_interval = 0
+    assert room_catalog.get(2).capacity == 50
+    assert room_catalog.stats(catalog_app)["snapshots"]["None"]["version"] == snapshot.version + 1
+
+
+def test_bookings_use_the_catalog(catalog_app):
+    client = catalog_app.test_client()
+    day = (date.today() + timedelta(days=30)).isoformat()
+    booking = {"date": day, "start-time": "10:00", "end-time": "11:30", "roomId": 1}
+    headers = {"Api-key": "token"}
+
+    # Longer than the max time of the room in the catalog
+    response = client.post("/api/users/1/reservations/", json=booking, headers=headers)
+    assert response.status_code == 409
+    booking["roomId"] = 2
+    response = client.post("/api/users/1/reservations/", json=booking, headers=headers)
+    assert response.status_code == 201
+    booking["roomId"] = 9
+    response = client.post("/api/users/1/reservations/", json=booking, headers=headers)
+    assert response.status_code == 404
+
+    response = client.get(f"/api/rooms_available/?date={day}&time=10:30")
+    assert [room["id"] for room in response.get_json()["available_rooms"]] == [1, 3]
+    response = client.get(f"/api/rooms_available/?date={day}&time=09:00&duration=61")
+    assert [room["id"] for room in response.get_json()["available_rooms"]] == [3]
@@ -1,4 +1,4 @@
-from test.test_config import client
+from test.test_config import client, query_budget
 from .utils import create_reservation, delete_reservation, create_user
 import json
 from src.converters import RoomConverter
@@ -70,6 +70,20 @@ def test_correct_request(client):
     assert response.status_code == 200
     assert len(rooms) == 2
 
+def test_rooms_available_query_budget(client, query_budget):
+    api_key, user_id = create_user(client)
+    date = "2030-07-18"
+    for start, end in (("08:00", "09:00"), ("12:00", "13:00"), ("15:00", "16:00")):
+        for room_id in (1, 2):
+            assert create_reservation(client, api_key, user_id, date, start, end, room_id)
+
+    # The rooms come from the catalog, their reservations from one query
+    with query_budget(1):
+        response = client.get(f"/api/rooms_available/?date={date}&time=12:30")
+    assert response.status_code == 200
+    available = [room["id"] for room in json.loads(response.data)["available_rooms"]]
+    assert 1 not in available and 2 not in available
+
 def test_duration_parameter(client):
     # The available time slot will be smaller than the duration during that time slot
     api_key, user_id = create_user(client)
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from src import db, scheduler
+from src.models import JobLock
+from test.test_config import app_factory
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_lease_has_a_single_owner(app):
+    with app.app_context():
+        assert scheduler.acquire_lease("archive", 60, owner="host:1")
+        assert not scheduler.acquire_lease("archive", 60, owner="host:2")
+        # The leader renews its lease
+        assert scheduler.acquire_lease("archive", 60, owner="host:1")
+
+        # An expired lease is taken over
+        assert scheduler.acquire_lease("purge", 0, owner="host:1")
+        assert scheduler.acquire_lease("purge", 60, owner="host:2")
+        assert db.session.get(JobLock, "purge").owner == "host:2"
+
+
+def test_periodic_job_runs_in_leader_only(app):
+    runs = []
+    scheduler.register_periodic_job(app, "leader-job", 0.05, lambda: runs.append(1))
+    scheduler.register_periodic_job(app, "other-job", 0.05, lambda: runs.append(2))
+    with app.app_context():
+        # Another process leads other-job
+        scheduler.acquire_lease("other-job", 60, owner="other-host:1")
+
+    scheduler.start(app)
+    wait_for(lambda: scheduler.stats(app)["leader-job"]["runs"] >= 2)
+    wait_for(lambda: scheduler.stats(app)["other-job"]["skipped"] >= 2)
+
+    assert 2 not in runs
+    counters = scheduler.stats(app)["leader-job"]
+    assert counters["failures"] == 0
+    assert counters["last_duration"] is not None
+
+
+def test_deferred_job_runs_once(app):
+    done = threading.Event()
+    calls = []
+
+    def job():
+        calls.append(1)
+        done.set()
+
+    scheduler.start(app)
+    scheduler.schedule(app, "reminder", 0.05, job)
+    assert done.wait(5)
+    time.sleep(0.1)
+    assert calls == [1]
+    assert scheduler.stats(app)["reminder"]["runs"] == 1
+
+
+def test_failures_are_counted(app):
+    def job():
+        raise RuntimeError("job failed")
+
+    scheduler.start(app)
+    scheduler.schedule(app, "broken", 0, job)
+    wait_for(lambda: scheduler.stats(app)["broken"]["failures"] == 1)
+
+
+def test_periodic_job_runs_sooner(app):
+    runs = []
+
+    def job():
+        runs.append(time.monotonic())
+        # Due again sooner than the interval
+        return 0.05 if len(runs) < 3 else None
+
+    scheduler.register_periodic_job(app, "sooner-job", 3600, job)
+    scheduler.start(app)
+    scheduler.reschedule(app, "sooner-job", 0)
+    wait_for(lambda: len(runs) >= 3)
+    time.sleep(0.1)
+    assert len(runs) == 3
+    assert scheduler.stats(app)["sooner-job"]["runs"] == 3
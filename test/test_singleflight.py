@@ -0,0 +1,115 @@
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from test.test_config import client
+
+import pytest
+
+from src import singleflight
+from src.singleflight import Group
+
+ADMIN_HEADERS = {"Api-key": "aa"}
+
+
+def test_concurrent_calls_share_one_result():
+    group = Group()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait()
+        return ["room"]
+
+    with ThreadPoolExecutor(10) as pool:
+        futures = [pool.submit(group.do, ("key",), compute) for _ in range(10)]
+        while group.stats()["coalesced"] < 9:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == [["room"]] * 10
+    assert len(calls) == 1
+    assert group.stats() == {"computed": 1, "coalesced": 9, "shared": 0, "in_flight": 0}
+
+    # Later calls compute a fresh result
+    assert group.do(("key",), compute) == ["room"]
+    assert len(calls) == 2
+
+
+def test_errors_are_raised_in_every_call():
+    group = Group()
+    release = threading.Event()
+
+    def compute():
+        release.wait()
+        raise ValueError("scan failed")
+
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(group.do, ("key",), compute) for _ in range(2)]
+        while group.stats()["coalesced"] < 1:
+            time.sleep(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_processes_share_results_through_directory():
+    with tempfile.TemporaryDirectory() as shared_dir:
+        # Two groups with the same directory stand for two worker processes
+        first, second = Group(shared_dir), Group(shared_dir)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return {"rooms": [1, 2]}
+
+        with ThreadPoolExecutor(2) as pool:
+            leader = pool.submit(first.do, ("key",), compute)
+            started.wait()
+            waiter = pool.submit(second.do, ("key",), compute)
+            time.sleep(0.1)
+            release.set()
+            assert leader.result() == waiter.result() == {"rooms": [1, 2]}
+
+        assert len(calls) == 1
+        assert second.stats()["shared"] == 1
+        # A result written before the call arrived is not reused
+        assert second.do(("key",), compute) == {"rooms": [1, 2]}
+        assert len(calls) == 2
+
+
+def test_result_written_at_arrival_is_not_reused(tmp_path, monkeypatch):
+    group = Group(str(tmp_path))
+    # The clock does not move between the two calls
+    monkeypatch.setattr(singleflight.time, "time", lambda: 1000.0)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert group.do(("key",), compute) == 1
+    assert group.do(("key",), compute) == 2
+
+
+def test_rooms_available_counted_in_metrics(client):
+    day = (date.today() + timedelta(days=30)).isoformat()
+    before = client.get("/api/metrics/", headers=ADMIN_HEADERS).get_json()
+    response = client.get(f"/api/rooms_available/?date={day}&time=10:00")
+    assert response.status_code == 200
+    assert response.get_json()["available_rooms"]
+
+    after = client.get("/api/metrics/", headers=ADMIN_HEADERS).get_json()
+    computed = after["singleflight"]["rooms_available"]["computed"]
+    assert computed == before["singleflight"]["rooms_available"]["computed"] + 1
+
+
+def test_metrics_require_admin(client):
+    assert client.get("/api/metrics/").status_code == 401
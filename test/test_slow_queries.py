@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from src import db
+from src.models import ApiKey, Room, User
+from src.resources.reservation import check_overlapping_reservations
+from src.slow_queries import describe_parameters, is_full_scan
+from test.test_config import app_factory
+
+ADMIN_HEADERS = {"Api-key": "aa"}
+
+
+def test_slow_queries_logged_with_plan(app_factory):
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_file = os.path.join(log_dir, "slow_queries.log")
+        # Every statement is slow
+        app = app_factory(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_FILE=log_file)
+        with app.app_context():
+            admin = User(username="admin", email="admin@example.com")
+            db.session.add(ApiKey(key=ApiKey.key_hash("aa"), user=admin, admin=True))
+            db.session.add(Room(room_name="Room 1", capacity=10, max_time=120))
+            db.session.commit()
+
+            now = datetime.now()
+            check_overlapping_reservations(db.session.get(Room, 1), now, now)
+
+            client = app.test_client()
+            response = client.get("/api/slow_queries/", headers=ADMIN_HEADERS)
+            assert response.status_code == 200
+            entries = response.get_json()
+
+            overlap = next(
+                entry
+                for entry in entries
+                if "reservation.end_minute >=" in entry["statement"]
+            )
+            assert overlap["query_plan"]
+            assert not overlap["full_scan"]
+            assert any("ix_reservation_room_end_start" in step for step in overlap["query_plan"])
+            # Only the count and the types of the parameters are logged
+            assert overlap["parameters"]["count"] == len(overlap["parameters"]["types"]) > 0
+            key_lookup = next(
+                entry for entry in entries if 'api_key."key" =' in entry["statement"]
+            )
+            assert key_lookup["parameters"]["types"][0] == "memoryview"
+            assert ApiKey.key_hash("aa").hex() not in json.dumps(entries)
+
+            # The API key lookup of the request itself is logged with its endpoint,
+            # the statements of the scheduler threads have none
+            assert any(entry["endpoint"] == "slowqueries" for entry in entries)
+
+            with open(log_file, encoding="utf-8") as log:
+                logged = [json.loads(line) for line in log]
+            assert overlap in logged
+
+            assert client.get("/api/slow_queries/").status_code == 401
+
+
+def test_log_file_is_opt_in(app_factory):
+    app = app_factory()
+    assert app.config["SLOW_QUERY_LOG_FILE"] is None
+    assert app.extensions["slow_queries"]["file_logger"] is None
+
+
+def test_parameters_described_without_values():
+    assert describe_parameters(("secret", 3, None)) == {
+        "count": 3,
+        "types": ["str", "int", "NoneType"],
+    }
+    assert describe_parameters({"key": "secret"}) == {"count": 1, "types": ["str"]}
+    assert describe_parameters(None) == {"count": 0, "types": []}
+
+
+def test_full_scan_flagged():
+    assert is_full_scan(["SCAN reservation"])
+    assert not is_full_scan(["SEARCH reservation USING INDEX ix_reservation_user_start (user_id=?)"])
+    assert not is_full_scan(None)
@@ -0,0 +1,96 @@
+import os
+import tempfile
+
+import pytest
+
+from src import db
+from src.models import ApiKey, Room, User
+from src.tenancy import EngineCache, use_tenant
+from test.test_config import app_factory
+
+
+@pytest.fixture
+def tenant_app(app_factory):
+    with tempfile.TemporaryDirectory() as directory:
+        app = app_factory(
+            TENANTS=["oulu", "espoo"],
+            TENANT_DATABASE_URI="sqlite:///" + os.path.join(directory, "{tenant}.db"),
+        )
+        yield app
+        app.extensions["tenant_engines"].dispose()
+
+
+def create_user(client, prefix, name):
+    response = client.post(
+        f"{prefix}/api/users/",
+        json={"username": name, "email": f"{name}@example.com"},
+    )
+    assert response.status_code == 201
+    return response.headers.get("api_key"), response.headers.get("user_id")
+
+
+def test_tenants_have_separate_databases(tenant_app):
+    client = tenant_app.test_client()
+    api_key, user_id = create_user(client, "/tenants/oulu", "alice")
+    assert api_key.startswith("oulu.")
+    create_user(client, "/tenants/espoo", "bob")
+
+    # The tenant is taken from the API key without the URL prefix
+    response = client.get(f"/api/users/{user_id}/", headers={"Api-key": api_key})
+    assert response.status_code == 200
+    assert response.json["username"] == "alice"
+
+    with tenant_app.app_context():
+        assert User.query.count() == 0
+    for tenant, usernames in (("oulu", ["alice"]), ("espoo", ["bob"])):
+        with tenant_app.app_context():
+            use_tenant(tenant)
+            assert [user.username for user in User.query] == usernames
+
+
+def test_unknown_tenant(tenant_app):
+    client = tenant_app.test_client()
+    assert client.get("/tenants/tampere/api/users/").status_code == 404
+    assert client.get("/tenants/../api/users/").status_code == 404
+    response = client.get("/api/users/1/", headers={"Api-key": "tampere.token"})
+    assert response.status_code == 404
+
+
+def test_room_urls_use_the_tenant(tenant_app):
+    rooms = {None: ["Default room"], "oulu": ["Oulu room", "Oulu hall"], "espoo": []}
+    for tenant, names in rooms.items():
+        with tenant_app.app_context():
+            use_tenant(tenant)
+            admin = User(username="admin", email="admin@example.com")
+            token = "admin" if tenant is None else f"{tenant}.admin"
+            db.session.add(ApiKey(key=ApiKey.key_hash(token), user=admin, admin=True))
+            db.session.add_all(Room(room_name=name, capacity=10) for name in names)
+            db.session.commit()
+    client = tenant_app.test_client()
+
+    assert client.get("/tenants/oulu/api/rooms/1/").json["room_name"] == "Oulu room"
+    assert client.get("/tenants/oulu/api/rooms/2/").json["room_name"] == "Oulu hall"
+    response = client.get("/api/rooms/1/", headers={"Api-key": "oulu.admin"})
+    assert response.json["room_name"] == "Oulu room"
+    assert client.get("/api/rooms/2/").status_code == 404
+    assert client.get("/tenants/espoo/api/rooms/1/").status_code == 404
+
+    headers = {"Api-key": "oulu.admin"}
+    response = client.put("/tenants/oulu/api/rooms/1/", json={"capacity": 4}, headers=headers)
+    assert response.status_code == 204
+    assert client.delete("/tenants/oulu/api/rooms/2/", headers=headers).status_code == 204
+    assert client.get("/tenants/oulu/api/rooms/1/").json["capacity"] == 4
+    assert client.get("/tenants/oulu/api/rooms/2/").status_code == 404
+    default = client.get("/api/rooms/1/").json
+    assert (default["room_name"], default["capacity"]) == ("Default room", 10)
+
+
+def test_engine_cache_evicts_least_recently_used(tmp_path):
+    engines = EngineCache("sqlite:///" + str(tmp_path / "{tenant}.db"), 2)
+    first = engines.get("a")
+    engines.get("b")
+    assert engines.get("a") is first
+    engines.get("c")
+    assert engines.get("a") is first
+    assert "b" not in engines._engines
+    engines.dispose()
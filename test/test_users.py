@@ -1,11 +1,11 @@
 import json
-from test.test_config import client
+from test.test_config import client, query_budget
 
 import pytest
 
-from src.models import ApiKey, User
+from src.models import ApiKey, Reservation, User
 
-from .utils import create_user
+from .utils import create_reservation, create_user
 
 
 # Test case to create a user
@@ -70,6 +70,20 @@ def test_delete_user(client):
     assert deleted_user is None
 
 
+# Test case for the database cascade of a deleted user
+def test_delete_user_cascades(client):
+    user_data = {"username": "test_user", "email": "test_user@example.com"}
+    api_key, user_id = create_user(client, user_data)
+    create_reservation(client, api_key, user_id, "2999-01-01", "10:00", "11:00")
+    create_reservation(client, api_key, user_id, "2999-01-02", "10:00", "11:00")
+    assert Reservation.query.filter_by(user_id=user_id).count() == 2
+
+    response = client.delete(f"/api/users/{user_id}/", headers={"api_key": api_key})
+    assert response.status_code == 200
+    assert Reservation.query.filter_by(user_id=user_id).count() == 0
+    assert ApiKey.query.filter_by(user_id=user_id).count() == 0
+
+
 # Test case for trying to get a non-existent user with a fake api
 def test_get_nonexistent_user_non_existent_api(client):
     user_data = {"username": "test_user", "email": "test_user@example.com"}
@@ -169,6 +183,17 @@ def test_get_all_users(client):
     assert len(users) >= 2  # At least the admin and one regular user
 
 
+def test_get_all_users_query_budget(client, query_budget):
+    for index in range(6):
+        create_user(client, {"username": f"user{index}", "email": f"user{index}@example.com"})
+
+    # The statements do not grow with the number of users
+    with query_budget(2):
+        response = client.get("/api/users/", headers={"Api-key": "aa"})
+    assert response.status_code == 200
+    assert len(json.loads(response.data)) >= 6
+
+
 def test_get_all_users_normal_api_key(client):
     """Test creating an admin user and then retrieving all users."""
     user_data = {"username": "test_user", "email": "test_user@example.com"}
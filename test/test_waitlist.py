@@ -0,0 +1,81 @@
+import json
+from datetime import date, timedelta
+from test.test_config import client
+
+from src.models import Reservation, WaitlistEntry
+
+from .utils import create_reservation, create_user
+
+DATE = (date.today() + timedelta(days=30)).isoformat()
+
+
+def join_waitlist(client, api_key, user_id, start_time, end_time, room_id=1):
+    return client.post(
+        f"/api/users/{user_id}/waitlist/",
+        json={
+            "date": DATE,
+            "start-time": start_time,
+            "end-time": end_time,
+            "roomId": room_id,
+        },
+        headers={"Api-key": api_key},
+    )
+
+
+def test_join_waitlist_requires_taken_slot(client):
+    api_key, user_id = create_user(client)
+    response = join_waitlist(client, api_key, user_id, "10:00", "11:00")
+    assert response.status_code == 409
+    assert response.text == "The time slot is available, book it instead."
+
+
+def test_promotion_on_delete(client):
+    owner_key, owner_id = create_user(client)
+    reservation_id = create_reservation(
+        client, owner_key, owner_id, DATE, "10:00", "12:00"
+    )
+
+    first_key, first_id = create_user(
+        client, {"username": "first", "email": "first@example.com"}
+    )
+    second_key, second_id = create_user(
+        client, {"username": "second", "email": "second@example.com"}
+    )
+    assert join_waitlist(client, first_key, first_id, "10:30", "11:30").status_code == 201
+    assert join_waitlist(client, second_key, second_id, "11:00", "12:00").status_code == 201
+
+    response = client.get(
+        f"/api/users/{first_id}/waitlist/", headers={"Api-key": first_key}
+    )
+    assert len(json.loads(response.data)) == 1
+
+    response = client.delete(
+        f"/api/users/{owner_id}/reservations/{reservation_id}/",
+        headers={"Api-key": owner_key},
+    )
+    assert response.status_code == 200
+
+    # The first user in the queue gets the slot, the second one keeps waiting
+    assert Reservation.query.filter_by(user_id=int(first_id)).count() == 1
+    assert Reservation.query.filter_by(user_id=int(second_id)).count() == 0
+    assert WaitlistEntry.query.filter_by(user_id=int(first_id)).count() == 0
+    assert WaitlistEntry.query.filter_by(user_id=int(second_id)).count() == 1
+
+
+def test_promotion_on_update(client):
+    owner_key, owner_id = create_user(client)
+    reservation_id = create_reservation(
+        client, owner_key, owner_id, DATE, "10:00", "11:00"
+    )
+    waiter_key, waiter_id = create_user(
+        client, {"username": "waiter", "email": "waiter@example.com"}
+    )
+    join_waitlist(client, waiter_key, waiter_id, "10:00", "11:00")
+
+    response = client.put(
+        f"/api/users/{owner_id}/reservations/{reservation_id}/",
+        json={"start-time": "14:00", "end-time": "15:00"},
+        headers={"Api-key": owner_key},
+    )
+    assert response.status_code == 200
+    assert Reservation.query.filter_by(user_id=int(waiter_id)).count() == 1
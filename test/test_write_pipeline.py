@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+
+import pytest
+from flask import Response
+
+from benchmarks.common import seed
+from src import db, write_pipeline
+from src.models import Reservation
+from test.test_config import app_factory
+
+
+@pytest.fixture
+def pipeline_app(app_factory):
+    app = app_factory(WRITE_PIPELINE_ENABLED=True, WRITE_PIPELINE_WINDOW_MS=20)
+    seed(app, users=4)
+    return app
+
+
+def post_reservation(app, index, start_time, end_time):
+    with app.test_client() as client:
+        return client.post(
+            f"/api/users/{index + 1}/reservations/",
+            json={
+                "date": (date.today() + timedelta(days=30)).isoformat(),
+                "start-time": start_time,
+                "end-time": end_time,
+                "roomId": 1,
+            },
+            headers={"Api-key": f"token{index}"},
+        )
+
+
+def test_concurrent_conflicting_writes(pipeline_app):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(
+            executor.map(
+                lambda index: post_reservation(pipeline_app, index, "10:00", "11:00"),
+                range(4),
+            )
+        )
+
+    codes = sorted(response.status_code for response in responses)
+    assert codes == [201, 409, 409, 409]
+    with pipeline_app.app_context():
+        assert Reservation.query.count() == 1
+
+
+def test_concurrent_independent_writes(pipeline_app):
+    slots = [("08:00", "08:30"), ("09:00", "09:30"), ("12:00", "13:00"), ("14:00", "15:00")]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(
+            executor.map(
+                lambda index: post_reservation(pipeline_app, index, *slots[index]),
+                range(4),
+            )
+        )
+
+    assert [response.status_code for response in responses] == [201] * 4
+    ids = {response.headers.get("reservation_id") for response in responses}
+    assert len(ids) == 4
+
+    with pipeline_app.test_client() as client:
+        response = client.delete(
+            f"/api/users/1/reservations/{responses[0].headers.get('reservation_id')}/",
+            headers={"Api-key": "token0"},
+        )
+    assert response.status_code == 200
+    with pipeline_app.app_context():
+        assert Reservation.query.count() == 3
+
+
+def test_side_effects_run_after_commit(pipeline_app):
+    applied = []
+
+    def operation(status):
+        write_pipeline.on_commit(partial(applied.append, status))
+        return Response(status=status)
+
+    with pipeline_app.test_request_context():
+        assert write_pipeline.execute(partial(operation, 409)).status_code == 409
+        assert write_pipeline.execute(partial(operation, 201)).status_code == 201
+    # The side effect of the rolled back operation is dropped
+    assert applied == [201]